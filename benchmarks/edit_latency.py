@@ -0,0 +1,81 @@
+"""Time from an edit of a large file to its diagnostics in `inka2 serve`, compared with
+tokenizing the whole file again after every edit.
+
+Edits are words typed character by character into questions of random cards.
+
+Usage:
+    python benchmarks/edit_latency.py [--sections N] [--cards N]
+"""
+
+import argparse
+import random
+import statistics
+import time
+from typing import Callable, List, Tuple
+
+from parser_throughput import generate_file
+
+from inka2.models.live_document import LiveDocument
+
+WORD = " typed"
+
+
+def publish(document: LiveDocument) -> int:
+    """Convert diagnostics to positions in the editor, as the server does"""
+    diagnostics = document.get_diagnostics()
+    for diagnostic in diagnostics:
+        document.get_position(diagnostic.start)
+        document.get_position(diagnostic.end)
+    return len(diagnostics)
+
+
+def measure(
+    edit: Callable[[int, str], None], edits: List[Tuple[int, str]]
+) -> List[float]:
+    """Milliseconds each edit took"""
+    times = []
+    for offset, character in edits:
+        start = time.perf_counter()
+        edit(offset, character)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main() -> None:
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument("--sections", type=int, default=200)
+    args.add_argument("--cards", type=int, default=40)
+    options = args.parse_args()
+
+    text = generate_file(options.sections)
+    rng = random.Random(0)
+    edits = []
+    for _ in range(options.cards):
+        offset = text.find("?", rng.randrange(len(text)))
+        offset = offset if offset >= 0 else text.find("?")
+        edits += [(offset + index, character) for index, character in enumerate(WORD)]
+
+    document = LiveDocument(text, "Default")
+
+    def incremental(offset: int, character: str) -> None:
+        document.edit(offset, offset, character)
+        publish(document)
+
+    full_text = text
+
+    def full(offset: int, character: str) -> None:
+        nonlocal full_text
+        full_text = full_text[:offset] + character + full_text[offset:]
+        publish(LiveDocument(full_text, "Default"))
+
+    print(f"{len(text) / 1024 / 1024:.2f} MB, {text.count(chr(10)) + 1} lines")
+    for name, edit in (("full", full), ("incremental", incremental)):
+        times = measure(edit, edits)
+        print(
+            f"{name:>12}: {statistics.median(times):.2f} ms median,"
+            f" {max(times):.2f} ms max"
+        )
+
+
+if __name__ == "__main__":
+    main()
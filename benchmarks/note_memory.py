@@ -0,0 +1,98 @@
+"""Memory taken by each note of a large file after it was parsed and converted to html.
+
+Notes are slotted, share interned tags and deck names, and drop their markdown copies
+once html is produced. For comparison, the same notes are also kept the way they were before:
+with attributes in a __dict__ and with the markdown copies.
+
+Usage:
+    python benchmarks/note_memory.py [--sections N]
+"""
+
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List
+
+import mistune  # type: ignore
+from parser_throughput import generate_file
+
+from inka2.mistune_plugins.mathjax3 import plugin_mathjax3
+from inka2.models import converter, img_handler
+from inka2.models.config import Config
+from inka2.models.document import Document
+from inka2.models.notes.cloze_note import ClozeNote
+from inka2.models.notes.note import Note
+from inka2.models.parser import Parser
+
+
+class DictNote:
+    """Note with the same attributes in a __dict__, as notes were kept before they were slotted"""
+
+    def __init__(self, note: Note):
+        for cls in type(note).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                setattr(self, name, getattr(note, name))
+
+
+def convert(notes: List[Note], md: mistune.Markdown) -> List[Note]:
+    """Convert notes to html the same way as collect does"""
+    converter.convert_cloze_deletions_to_anki_format(
+        note for note in notes if isinstance(note, ClozeNote)
+    )
+    img_handler.update_image_links_in(notes)
+    converter.convert_notes_to_html(notes, md)
+    return notes
+
+
+def drop_updated_fields(notes: List[Note]) -> List[Note]:
+    for note in notes:
+        note.drop_updated_fields()
+    return notes
+
+
+def measure(action: Callable[[], list]) -> float:
+    """Bytes per note allocated by the action that are still taken by the notes it returns"""
+    tracemalloc.start()
+    try:
+        notes = action()
+        return tracemalloc.get_traced_memory()[0] / len(notes)
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument("--sections", type=int, default=2000)
+    options = args.parse_args()
+
+    md = mistune.create_markdown(
+        plugins=["strikethrough", "footnotes", "table", plugin_mathjax3]
+    )
+    with tempfile.TemporaryDirectory() as folder:
+        config = Config(Path(folder) / "config.ini")
+        path = Path(folder) / "notes.md"
+        path.write_text(generate_file(options.sections), encoding="utf-8")
+        document = Document.load(path, "blake2b")
+        parser = Parser(config, path, "Default")
+
+        def parse() -> List[Note]:
+            return parser.collect_notes(document=document)
+
+        # Caches of the parser and of the converter are filled before measuring
+        notes = convert(parse(), md)
+        print(f"{len(document.content) / 1024 / 1024:.2f} MB, {len(notes)} notes")
+        del notes
+        results = {
+            "parsed": measure(parse),
+            "html, before": measure(
+                lambda: [DictNote(note) for note in convert(parse(), md)]
+            ),
+            "html, after": measure(lambda: drop_updated_fields(convert(parse(), md))),
+        }
+        for name, size in results.items():
+            print(f"{name:>14}: {size:.0f} bytes per note")
+
+
+if __name__ == "__main__":
+    main()
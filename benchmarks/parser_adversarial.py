@@ -0,0 +1,127 @@
+"""Parsing time of adversarial files, each of which must be parsed within the time limit.
+
+Every file is parsed at full and at half size. Parsing takes linear time,
+so the full size must take about twice as long as the half, not four times.
+
+Usage:
+    python benchmarks/parser_adversarial.py [--size BYTES] [--limit SECONDS]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+from inka2.models.config import Config
+from inka2.models.document import Document
+from inka2.models.parser import Parser
+
+
+def list_items(size: int) -> str:
+    """Numbered list without answers or braces, so no item becomes a note"""
+    count = size // 100
+    items = (
+        f"{number}. Item of a long list{' with more words' * 2}\n"
+        for number in range(count)
+    )
+    return "---\n" + "".join(items) + "---\n"
+
+
+def unmatched_braces(size: int) -> str:
+    """Numbered list in which every item opens a brace that is never closed"""
+    count = size // 40
+    items = (f"{number}. Item with {{ stray brace\n" for number in range(count))
+    return "---\n" + "".join(items) + "---\n"
+
+
+def closing_brace_at_end(size: int) -> str:
+    """Unmatched braces followed by a single closing one at the end of the section"""
+    return unmatched_braces(size)[: -len("---\n")] + "}\n---\n"
+
+
+def quote_block(size: int) -> str:
+    """Single note with a megabyte-long answer"""
+    lines = "> Line of the answer that goes on\n" * (size // 34)
+    return "---\n1. Question\n" + lines + "---\n"
+
+
+def quote_block_without_question(size: int) -> str:
+    """Long quote block that isn't preceded by a question"""
+    return "---\n" + "> Quoted line\n" * (size // 14) + "---\n"
+
+
+def long_line(size: int) -> str:
+    """Single line full of braces and starts of ID comments"""
+    return "---\n1. " + "{<!--ID:" * (size // 8) + "\n---\n"
+
+
+def long_id(size: int) -> str:
+    """ID comment that never ends"""
+    return "---\n<!--ID:" + "1" * size + "\n1. Question\n> Answer\n---\n"
+
+
+def delimiters(size: int) -> str:
+    """Section delimiters without sections between them"""
+    return "---\n" * (size // 4)
+
+
+CASES: Dict[str, Callable[[int], str]] = {
+    "list items": list_items,
+    "unmatched braces": unmatched_braces,
+    "closing brace at end": closing_brace_at_end,
+    "quote block": quote_block,
+    "quote without question": quote_block_without_question,
+    "long line": long_line,
+    "long ID": long_id,
+    "delimiters": delimiters,
+}
+
+
+def parse(parser: Parser, document: Document) -> None:
+    """Collect notes of the file and run the note helpers that Writer uses on all of it"""
+    parser.collect_notes(document=document)
+    parser.get_question(document.text)
+    parser.get_answer(document.text)
+    parser.get_id(document.text)
+    parser._is_basic_note_str(document.text)
+    parser._is_cloze_note_str(document.text)
+
+
+def measure(config: Config, path: Path, text: str) -> float:
+    """Time of parsing the text in seconds"""
+    path.write_text(text, encoding="utf-8")
+    document = Document.load(path, "blake2b")
+    parser = Parser(config, path, "Default")
+
+    start = time.perf_counter()
+    parse(parser, document)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument("--size", type=int, default=1024 * 1024)
+    args.add_argument("--limit", type=float, default=2.0)
+    options = args.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as folder:
+        config = Config(Path(folder) / "config.ini")
+        path = Path(folder) / "notes.md"
+        for name, generate in CASES.items():
+            half = measure(config, path, generate(options.size // 2))
+            full = measure(config, path, generate(options.size))
+            result = "ok" if full <= options.limit else "TOO SLOW"
+            failed |= full > options.limit
+            print(
+                f"{name:>24}: {full:.3f} s, {full / half:.1f}x of half size, {result}"
+            )
+
+    if failed:
+        sys.exit(f"Parsing took longer than {options.limit} s")
+
+
+if __name__ == "__main__":
+    main()
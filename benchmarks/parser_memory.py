@@ -0,0 +1,53 @@
+"""Peak memory of collecting all notes of a large file compared with iterating over them.
+
+Memory is measured with tracemalloc, so pages of the memory-mapped file,
+which the system can drop at any time, aren't counted.
+
+Usage:
+    python benchmarks/parser_memory.py [--sections N]
+"""
+
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from parser_throughput import generate_file
+
+from inka2.models.config import Config
+from inka2.models.parser import Parser
+
+
+def measure(action: Callable[[], int]) -> float:
+    """Peak memory in MB allocated while running the action"""
+    tracemalloc.start()
+    try:
+        action()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument("--sections", type=int, default=2000)
+    options = args.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        config = Config(Path(folder) / "config.ini")
+        path = Path(folder) / "notes.md"
+        path.write_text(generate_file(options.sections), encoding="utf-8")
+        parser = Parser(config, path, "Default")
+
+        print(f"{path.stat().st_size / 1024 / 1024:.2f} MB")
+        results = {
+            "collect_notes": measure(lambda: len(parser.collect_notes())),
+            "iter_notes": measure(lambda: sum(1 for _ in parser.iter_notes())),
+        }
+        for name, megabytes in results.items():
+            print(f"{name:>14}: {megabytes:.2f} MB at peak")
+
+
+if __name__ == "__main__":
+    main()
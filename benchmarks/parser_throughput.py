@@ -0,0 +1,341 @@
+"""Throughput of Parser compared with the regular expressions it used before the tokenizer.
+
+Usage:
+    python benchmarks/parser_throughput.py [--sections N] [--repeat N]
+"""
+
+import argparse
+import random
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Union
+
+from inka2.helpers import parse_str_to_bool
+from inka2.models.config import Config
+from inka2.models.document import Document
+from inka2.models.notes.basic_note import BasicNote
+from inka2.models.notes.cloze_note import ClozeNote
+from inka2.models.notes.note import Note
+from inka2.models.parser import Parser
+
+
+class RegexParser:
+    """Parser that finds sections, notes and their fields with a cascade of regular expressions.
+    Copied from Parser as it was before the tokenizer, so the baseline doesn't change with it."""
+
+    _section_regex = re.compile(
+        r"^---\n" r"(.+?)" r"^---$",  # start of section  # contents  # end of section
+        re.MULTILINE | re.DOTALL,
+    )
+    _deck_name_regex = re.compile(r"(?<=^Deck:)(.*?)$", re.MULTILINE)
+    _tags_regex = re.compile(r"(?<=^Tags:)(.*?)$", re.MULTILINE)
+    _all_notes_regex = re.compile(
+        r"(?:^<!--ID:\S+-->\n)?"  # optional ID
+        r"^\d+\.[\s\S]*?"  # card contents (optionally contains answer)
+        r"(?=<!--ID:\S+-->|^\d+\.|\Z|^---$)",  # card ends before ID, start of next card, end of string, end of section
+        re.MULTILINE,
+    )
+    _basic_note_regex = re.compile(
+        r"(?:^<!--ID:\S+-->\n)?"
+        r"^\d+\.[\s\S]+?"
+        r"(?:^>.*?(?:\n|$))+",  # optional ID  # card question  # card answer
+        re.MULTILINE,
+    )
+    _cloze_note_regex = re.compile(
+        r"(?:^<!--ID:\S+-->\n)?"  # optional ID
+        r"^\d+\.[\s\S]*?{[\s\S]*?}[\s\S]*?"  # contents that must have '{' and '}' symbols
+        r"(?=<!--ID:\S+-->|^\d+\.|\Z|^---$)",  # card ends before ID, start of next card, end of string, end of section
+        re.MULTILINE,
+    )
+    _id_regex = re.compile(r"^<!--ID:(\S+)-->$", re.MULTILINE)
+    _question_regex = re.compile(
+        r"^\d+\."
+        r"([\s\S]+?)"
+        r"(?=^>|\Z)",  # question start  # contents  # answer start or end of string
+        re.MULTILINE,
+    )
+    _answer_regex = re.compile(r"(?:^>.*?(?:\n|$))+", re.MULTILINE)
+
+    def __init__(
+        self,
+        config: Config,
+        file_path: Union[str, Path],
+        default_deck: str,
+    ):
+        self._config = config
+        self._file_path = file_path
+        self._default_deck = default_deck
+
+    def collect_notes(
+        self,
+        section_filter: Optional[Callable[[str], bool]] = None,
+        document: Optional[Document] = None,
+    ) -> List[Note]:
+        """Get all notes from the file which path was passed to the Parser
+
+        Args:
+            section_filter: if passed, only sections for which it returns True are parsed
+            document: already read contents of the file. If not passed, the file is read.
+        """
+        if document:
+            file_string = document.text
+        else:
+            with open(self._file_path, mode="rt", encoding="utf-8") as f:
+                file_string = f.read()
+
+        question_sections = self.get_sections(file_string)
+
+        notes = []
+        for section in question_sections:
+            if section_filter and not section_filter(section):
+                continue
+            notes.extend(self._get_notes_from_section(section))
+
+        return notes
+
+    def _get_notes_from_section(self, section: str) -> List[Note]:
+        """Get all Notes from the section string"""
+        tags = self._get_tags(section)
+        deck_name = self._get_deck_name(section)
+
+        note_strings = self.get_note_strings(section)
+
+        # Create note objects
+        notes: List[Note] = []
+        for string in note_strings:
+            anki_id = self.get_id(string)
+
+            # we check in this order because is_cloze_note_str can match front/back note if it contains curly braces
+            if self._is_basic_note_str(string):
+                question = self.get_question(string)
+                answer = self._get_cleaned_answer(string)
+                if not question or not answer:
+                    continue
+
+                notes.append(
+                    BasicNote(
+                        front_md=question,
+                        back_md=self._add_filename_to_text(answer),
+                        tags=tags,
+                        deck_name=deck_name,
+                        anki_id=anki_id,
+                    )
+                )
+            elif self._is_cloze_note_str(string):
+                text = self.get_question(string)
+                if not text:
+                    continue
+
+                notes.append(
+                    ClozeNote(
+                        text_md=self._add_filename_to_text(text),
+                        tags=tags,
+                        deck_name=deck_name,
+                        anki_id=anki_id,
+                    )
+                )
+        return notes
+
+    # wrapper to add string to end of text
+    def _add_filename_to_text(self, text: str) -> str:
+        """Add filename to the end of the text"""
+        path_string = (
+            f"""<span style="font-size: 9pt;">File: {self._file_path}</span>"""
+        )
+        if not parse_str_to_bool(
+            self._config.get_option_value("defaults", "add_filename")
+        ):
+            return text
+        return f"{text}\n\n{path_string}"
+
+    def _get_deck_name(self, section: str) -> str:
+        """Get deck name specified for this section"""
+        matches = re.findall(RegexParser._deck_name_regex, section)
+
+        # If no deck name
+        if not matches:
+            if not self._default_deck:
+                raise ValueError(f"couldn't find deck name in section:\n{section}")
+
+            return self._default_deck
+
+        if len(matches) > 1:
+            raise ValueError(f"more than one deck name field in section:\n{section}")
+
+        deck_name = matches[0].strip()
+        if not deck_name:
+            raise ValueError(f"empty deck name field in section:\n{section}")
+
+        return deck_name
+
+    @classmethod
+    def get_sections(cls, file_contents: str) -> List[str]:
+        """Get all sections (groups of notes) from the file string"""
+        return re.findall(cls._section_regex, file_contents)
+
+    @classmethod
+    def get_note_strings(cls, section: str) -> List[str]:
+        """Get all strings of notes from section"""
+        return re.findall(cls._all_notes_regex, section)
+
+    @classmethod
+    def get_id(cls, text: str) -> Optional[int]:
+        """Get note's ID from text. Returns None if id wasn't found or if it is incorrect."""
+        id_match = re.search(cls._id_regex, text)
+        if id_match:
+            try:
+                return int(id_match.group(1))
+            except ValueError:
+                return None
+
+        return None
+
+    @classmethod
+    def get_question(cls, text: str) -> Optional[str]:
+        """Get clean question string from text
+        (without digit followed by period and trailing whitespace)"""
+        question_match = re.search(cls._question_regex, text)
+        if question_match:
+            return question_match.group(1).strip()
+
+        return None
+
+    @classmethod
+    def get_answer(cls, text: str) -> Optional[str]:
+        """Get answer string from text"""
+        answer_match = re.search(cls._answer_regex, text)
+        if answer_match:
+            return answer_match.group()
+        return None
+
+    @classmethod
+    def _get_tags(cls, section: str) -> List[str]:
+        """Get tags specified for this section"""
+        matches = re.findall(cls._tags_regex, section)
+        if not matches:
+            return []
+
+        if len(matches) > 1:
+            raise ValueError(f"more than one tag field in section:\n{section}")
+
+        tags = matches[0].strip().split()
+        return tags
+
+    @classmethod
+    def _is_basic_note_str(cls, string: str) -> bool:
+        """Check if note string contains basic note type"""
+        match = re.search(cls._basic_note_regex, string)
+        if not match:
+            return False
+        return True
+
+    @classmethod
+    def _is_cloze_note_str(cls, string: str) -> bool:
+        """Check if note string contains cloze note type. Matches basic note type if it contains curly braces"""
+        match = re.search(cls._cloze_note_regex, string)
+        if not match:
+            return False
+        return True
+
+    @classmethod
+    def _get_cloze_note_strings(cls, section: str) -> List[str]:
+        """Get all strings from section with only question and an (optional) ID"""
+        return re.findall(cls._cloze_note_regex, section)
+
+    @classmethod
+    def _get_cleaned_answer(cls, text: str) -> Optional[str]:
+        """Get clean answer string from text (without '>' and trailing whitespace)"""
+        # Remove '>' and first whitespace char after it (if there is any)
+        answer = cls.get_answer(text)
+        if not answer:
+            return None
+
+        lines = answer.splitlines()
+        cleaned_lines = []
+        # Remove '>' and whitespace after it
+        for line in lines:
+            if len(line) > 1 and line[1].isspace():
+                cleaned_lines.append(line[2:].rstrip())
+            else:
+                cleaned_lines.append(line[1:].rstrip())
+
+        # cleaned_answer = "\n\n".join(cleaned_lines)
+        cleaned_answer = "\n".join(cleaned_lines)
+
+        def replace_newlines(s: re.Match) -> str:
+            return re.sub("\n\n", "\n", s.group(0))
+
+        # change newlines in code blocks
+        # cleaned_answer = re.sub(r"```[\s\S]*?```", replace_newlines, cleaned_answer)
+
+        # change newlines in math blocks
+        # cleaned_answer = re.sub(BLOCK_MATH, replace_newlines, cleaned_answer)
+
+        return cleaned_answer
+
+
+def generate_file(sections: int, seed: int = 0) -> str:
+    """Markdown file with sections of basic and cloze notes, with and without IDs"""
+    rng = random.Random(seed)
+    parts = []
+    for section in range(sections):
+        lines = ["---", f"Deck: Deck {section}", "", "Tags: one two", ""]
+        for number in range(1, rng.randint(5, 30)):
+            if rng.random() < 0.5:
+                lines.append(f"<!--ID:{rng.randrange(10**12, 10**13)}-->")
+            if rng.random() < 0.7:
+                lines += [f"{number}. Question {number}?", "", "More context.", ""]
+                lines += ["> Answer line"] * rng.randint(1, 5)
+            else:
+                lines += [f"{number}. Some {{{{c1::cloze}}}} text.", "", "Extra line."]
+            lines.append("")
+        lines += ["---", "", "Text between sections.", ""]
+        parts.append("\n".join(lines))
+    return "\n".join(parts)
+
+
+def measure(
+    parser: Union[Parser, RegexParser], document: Document, repeat: int
+) -> float:
+    """Best time of parsing the document in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser.collect_notes(document=document)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument("--sections", type=int, default=2000)
+    args.add_argument("--repeat", type=int, default=5)
+    options = args.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        config = Config(Path(folder) / "config.ini")
+        path = Path(folder) / "notes.md"
+        path.write_text(generate_file(options.sections), encoding="utf-8")
+        document = Document.load(path, "blake2b")
+        megabytes = len(document.content) / 1024 / 1024
+
+        tokenizer = Parser(config, path, "Default")
+        regex = RegexParser(config, path, "Default")
+        notes = tokenizer.collect_notes(document=document)
+        if notes != regex.collect_notes(document=document):
+            raise SystemExit("Parsers found different notes")
+
+        print(f"{megabytes:.2f} MB, {len(notes)} notes")
+        results = {
+            "regex": measure(regex, document, options.repeat),
+            "tokenizer": measure(tokenizer, document, options.repeat),
+        }
+        for name, seconds in results.items():
+            print(f"{name:>10}: {seconds:.3f} s, {megabytes / seconds:.2f} MB/s")
+        print(f"   speedup: {results['regex'] / results['tokenizer']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
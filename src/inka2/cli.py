@@ -1,9 +1,27 @@
+import hashlib
 import logging
 import os
+import re
+import signal
+import sqlite3
 import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
 from pathlib import Path
 from subprocess import call
-from typing import Iterable, List, Set
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
 
 import click
 import mistune  # type: ignore
@@ -12,9 +30,16 @@ from rich.prompt import Confirm, Prompt
 from rich.traceback import install
 
 from . import __version__
-from .exceptions import AnkiApiError, HighlighterError
+from .exceptions import (
+    AnkiApiError,
+    GitError,
+    HighlighterError,
+    StateStoreError,
+    StateStoreLockedError,
+)
 from .helpers import (
     CONSOLE,
+    parse_duration,
     parse_str_to_bool,
     print_action,
     print_error,
@@ -30,11 +55,25 @@ from .models import converter, highlighter, img_handler
 from .models.anki_api import AnkiApi
 from .models.anki_media import AnkiMedia
 from .models.config import Config
-from .models.hasher import Hasher
+from .models.document import Document
+from .models.file_walker import FileWalker
+from .models.file_watcher import (
+    FileWatcher,
+    InotifyWatcher,
+    PollingWatcher,
+    is_inotify_supported,
+)
+from .models.ignore_rules import IgnoreRules
+from .models.language_server import LanguageServer
+from .models.git_tracker import GitTracker
+from .models.hasher import DEFAULT_HASH_ALGORITHM, FileHash, Hasher, hash_text
 from .models.notes.basic_note import BasicNote
 from .models.notes.cloze_note import ClozeNote
 from .models.notes.note import Note
+from .models.parse_cache import ParseCache, dump_notes
 from .models.parser import Parser
+from .models.scheduler import ORDER_BY_MTIME, ORDER_BY_PATH, ORDERS, Scheduler
+from .models.state_store import StateStore
 from .models.writer import Writer
 
 ROOT_DIR = Path(__file__).parent.parent.parent.absolute()
@@ -46,8 +85,25 @@ DEFAULT_ANKI_FOLDERS = {
     "darwin": "~/Library/Application Support/Anki2",
 }
 
+DEFAULT_STATE_FOLDERS = {
+    "win32": r"~\AppData\Local\inka2",
+    "linux": "~/.local/state/inka2",
+    "darwin": "~/Library/Application Support/inka2",
+}
+
 FILE_EXTENSIONS = [".md", ".markdown"]
+# Hashes are committed after this many files or seconds, and at the end of the run
+HASHES_FLUSH_EVERY = 50
+HASHES_FLUSH_INTERVAL = 5.0
+# Max number of bytes taken by cached notes of parsed files
+PARSE_CACHE_MAX_SIZE = 32 * 1024 * 1024
+# Files read and submitted to worker processes ahead of the synced one, per process
+PREPARE_AHEAD_PER_JOB = 2
+# Seconds without changes after which watched files are synced, and between checks when polling
+WATCH_DEBOUNCE = 1.0
+WATCH_POLL_INTERVAL = 2.0
 CONFIG_PATH = f"{os.path.dirname(__file__)}/config.ini"
+# Datafile of previous versions, it is imported into the state database once
 HASHES_PATH = f"{os.path.dirname(__file__)}/hashes.json"
 
 CONFIG = Config(CONFIG_PATH)
@@ -60,21 +116,219 @@ MD = mistune.create_markdown(
 install(console=CONSOLE)
 
 
-def get_notes_from_file(file_path: str) -> List[Note]:
-    print_sub_step("Getting cards from the file...")
-    # We need to change working directory because images in file can have relative path
-    os.chdir(os.path.dirname(file_path))
+class FileTask(NamedTuple):
+    """Changed file read by the main process with everything needed to prepare its notes"""
+
+    document: Document
+    # Digests of sections synced before, their notes are skipped. None if all notes are parsed.
+    synced_sections: Optional[Set[str]]
+    # Fingerprints of notes at the time of the last sync by their IDs
+    synced_fingerprints: Dict[int, str]
+    # Notes loaded from the parse cache or None if the file has to be parsed
+    cached_notes: Optional[List[Note]]
+    # Key under which parsed notes are cached, None if they aren't cached
+    cache_key: Optional[str]
+
+
+class PreparedFile(NamedTuple):
+    """Notes of the file converted to html, which only have to be sent to Anki"""
+
+    # Contents of the file as it was read
+    document: Document
+    # Text of the file after cloze deletions were converted in it. The main process writes it,
+    # spans of the notes point into it.
+    text: str
+    notes: List[Note]
+    # Notes that changed since the last sync, only they are converted to html
+    changed_notes: List[Note]
+    # Fingerprints of the notes, in the same order
+    fingerprints: List[str]
+    cache_key: Optional[str]
+    # Notes as they were parsed, serialized for the parse cache, or None if they came from it
+    parsed_notes: Optional[bytes]
+
+
+def read_changed_file(
+    file_path: str,
+    full_sync: bool,
+    hasher: Hasher,
+    file_hash: Optional[FileHash] = None,
+    parse_cache: Optional[ParseCache] = None,
+) -> Optional[FileTask]:
+    """Read the file and get everything needed to prepare its notes from the state database.
+    Returns None if the file hasn't changed since the last sync. With full sync
+    the file is always read and notes are loaded from parse_cache if the contents were parsed before.
+    If file_hash is passed, the file is known to be changed and isn't checked again."""
+    if file_hash is None and not full_sync:
+        signature = hasher.get_stat_signature(file_path)
+        if hasher.is_unchanged_by_stat(file_path, signature):
+            return None
+
+    document = hasher.read_document(file_path)
+    if file_hash is None and not full_sync:
+        if not hasher.has_changed(file_path, document.digest):
+            # Remember new stat signature so the file won't be read next time
+            hasher.update_hash(file_path, document.digest, document.signature)
+            return None
+
+    if full_sync:
+        # Every section is parsed, so notes can come from the cache
+        cache_key = cached_notes = None
+        if parse_cache:
+            default_deck = CONFIG.get_option_value("defaults", "deck")
+            cache_key = parse_cache.get_key(file_path, default_deck, document)
+            cached_notes = parse_cache.get_notes(cache_key)
+        return FileTask(document, None, {}, cached_notes, cache_key)
+
+    # Notes from sections that haven't changed since last sync are skipped.
+    # Fingerprints are looked up for all ID lines, as notes aren't parsed yet.
+    return FileTask(
+        document,
+        hasher.get_section_hashes(file_path),
+        hasher.get_note_fingerprints(Parser.get_ids(document.text)),
+        None,
+        None,
+    )
+
+
+def prepare_file(task: FileTask) -> PreparedFile:
+    """Parse notes of the file, convert cloze deletions in them and in the file, update
+    image links and convert notes that changed since the last sync to html.
+    Runs in worker processes, so it neither prints nor uses the state database, Anki or
+    the file system: the text with converted cloze deletions is returned, not written."""
+    document = task.document
+    notes, parsed_notes = task.cached_notes, None
+    if notes is None:
+        default_deck = CONFIG.get_option_value("defaults", "deck")
+        synced_sections = task.synced_sections
+        notes = Parser(CONFIG, document.path, default_deck).collect_notes(
+            None
+            if synced_sections is None
+            else lambda section: (
+                hash_text(section, document.algorithm) not in synced_sections
+            ),
+            document,
+        )
+        if task.cache_key:
+            parsed_notes = dump_notes(notes)
+    if not notes:
+        return PreparedFile(
+            document, document.text, [], [], [], task.cache_key, parsed_notes
+        )
+
+    converter.convert_cloze_deletions_to_anki_format(
+        note for note in notes if isinstance(note, ClozeNote)
+    )
+    writer = Writer(document.path, notes, document)
+    writer.update_cloze_notes(save=False)
+
+    # Images are copied by the main process, from links in the raw fields.
+    # Links are updated first, so fingerprints cover the fields sent to Anki.
+    img_handler.update_image_links_in(notes)
+
+    # Notes that are the same as at the last sync are neither converted nor sent to Anki
+    fingerprints = [note.get_fingerprint(CONFIG) for note in notes]
+    changed_notes = [
+        note
+        for note, fingerprint in zip(notes, fingerprints)
+        if not note.anki_id or task.synced_fingerprints.get(note.anki_id) != fingerprint
+    ]
+    converter.convert_notes_to_html(changed_notes, MD)
+    # Markdown copies aren't needed once fingerprints and html are made
+    for note in notes:
+        note.drop_updated_fields()
+    return PreparedFile(
+        document,
+        writer.text,
+        notes,
+        changed_notes,
+        fingerprints,
+        task.cache_key,
+        parsed_notes,
+    )
+
+
+def submit_file(
+    executor: Executor,
+    file_path: str,
+    full_sync: bool,
+    hasher: Hasher,
+    file_hash: Optional[FileHash] = None,
+    parse_cache: Optional[ParseCache] = None,
+) -> "Future[Optional[PreparedFile]]":
+    """Read the file and prepare its notes in a worker process. The future has no result
+    if the file hasn't changed. Errors of reading are raised by the future, like errors of preparing."""
+    future: "Future[Optional[PreparedFile]]" = Future()
+    try:
+        task = read_changed_file(file_path, full_sync, hasher, file_hash, parse_cache)
+    except Exception as e:
+        future.set_exception(e)
+        return future
+
+    if task is None:
+        future.set_result(None)
+        return future
+    return executor.submit(prepare_file, task)
+
+
+def prepare_files_ahead(
+    files: Iterable[Tuple[str, Optional[FileHash]]],
+    executor: Executor,
+    ahead: int,
+    full_sync: bool,
+    hasher: Hasher,
+    parse_cache: Optional[ParseCache] = None,
+) -> Iterator[Tuple[str, Optional[FileHash], "Future[Optional[PreparedFile]]"]]:
+    """Lazily submit files to worker processes in their order, keeping up to ahead files
+    in progress after the yielded one, so workers prepare them while it is synced"""
+    submitted: Deque[
+        Tuple[str, Optional[FileHash], "Future[Optional[PreparedFile]]"]
+    ] = deque()
+    for file_path, file_hash in files:
+        future = submit_file(
+            executor, file_path, full_sync, hasher, file_hash, parse_cache
+        )
+        submitted.append((file_path, file_hash, future))
+        if len(submitted) > ahead:
+            yield submitted.popleft()
+    yield from submitted
+
 
-    default_deck = CONFIG.get_option_value("defaults", "deck")
-    notes = Parser(CONFIG, file_path, default_deck).collect_notes()
-    # TODO: add filename
-    notes_num = len(notes)
+def get_prepared_file(
+    file_path: str,
+    full_sync: bool,
+    hasher: Hasher,
+    file_hash: Optional[FileHash] = None,
+    parse_cache: Optional[ParseCache] = None,
+    prepared: Optional["Future[Optional[PreparedFile]]"] = None,
+) -> Optional[PreparedFile]:
+    """Read the file and prepare its notes, or wait for them if they are prepared by a worker
+    process. Notes parsed from the file are cached and cloze deletions converted in it are saved.
+    Returns None if the file hasn't changed."""
+    prepared_file: Optional[PreparedFile]
+    if prepared is None:
+        print_sub_step("Reading the file...")
+        task = read_changed_file(file_path, full_sync, hasher, file_hash, parse_cache)
+        if task is None:
+            return None
+        print_sub_step("Getting cards from the file and converting them to the html...")
+        prepared_file = prepare_file(task)
+    else:
+        print_sub_step("Waiting for cards prepared by worker processes...")
+        prepared_file = prepared.result()
+        if prepared_file is None:
+            return None
+
+    if parse_cache and prepared_file.cache_key and prepared_file.parsed_notes:
+        parse_cache.update_notes(prepared_file.cache_key, prepared_file.parsed_notes)
+    # Workers don't write files, spans of the notes point into the converted text
+    prepared_file.document.write(prepared_file.text)
+    notes_num = len(prepared_file.notes)
     if notes_num == 0:
         print_sub_step("Cards weren't found!")
     else:
         print_sub_step(f'Found {notes_num} {"cards" if notes_num > 1 else "card"}!')
-
-    return notes
+    return prepared_file
 
 
 def create_notes_from_file(
@@ -84,78 +338,110 @@ def create_notes_from_file(
     anki_media: AnkiMedia,
     hasher: Hasher,
     force: bool = False,
+    file_hash: Optional[FileHash] = None,
+    parse_cache: Optional[ParseCache] = None,
+    prepared: Optional["Future[Optional[PreparedFile]]"] = None,
 ) -> None:
-    """Get all notes from file and send them to Anki"""
+    """Get all notes from file and send them to Anki.
+    If file_hash is passed, the file is known to be changed and isn't checked again.
+    The file is read once, all stages work with the same document.
+    With full sync, notes are loaded from parse_cache if the contents were parsed before.
+    If prepared is passed, the file was already read and is prepared by a worker process."""
     print_step(f'Collecting cards from "{file_path}"!')
 
-    print_sub_step("Calculating hash...")
-    curr_hash = hasher.calculate_hash(file_path)
-    if not (full_sync or hasher.has_changed(file_path, curr_hash)):
+    prepared_file = get_prepared_file(
+        file_path, full_sync, hasher, file_hash, parse_cache, prepared
+    )
+    if prepared_file is None:
         print_sub_step("The file hasn't changed since last sync!")
         return
 
-    notes = get_notes_from_file(file_path)
+    document, notes, changed_notes = (
+        prepared_file.document,
+        prepared_file.notes,
+        prepared_file.changed_notes,
+    )
     if not notes:
         print_sub_step("Updating information on file hash...")
-        hasher.update_hash(file_path, curr_hash)
+        update_file_hashes(document, hasher)
         return
 
-    converter.convert_cloze_deletions_to_anki_format(
-        note for note in notes if isinstance(note, ClozeNote)
-    )
-    writer = Writer(file_path, notes)
-    writer.update_cloze_notes()
-
     print_sub_step("Handling images...")
-    img_handler.handle_images_in(notes, anki_media, force=force)
-
-    print_sub_step("Converting cards to the html...")
-    converter.convert_notes_to_html(notes, MD)
+    # Images in the file can have paths relative to it
+    img_handler.copy_images_in(
+        changed_notes,
+        anki_media,
+        force=force,
+        base_dir=os.path.dirname(os.path.abspath(file_path)),
+    )
 
     print_sub_step("Synchronizing changes and adding new cards...")
-    for note in notes:
+    fingerprints = {
+        id(note): fingerprint
+        for note, fingerprint in zip(notes, prepared_file.fingerprints)
+    }
+    added, updated = 0, 0
+    for note in changed_notes:
         try:
             if note.anki_id:
                 anki_api.update_note(note)
-                continue
-
-            note.anki_id = anki_api.add_note(note)
+                updated += 1
+            else:
+                note.anki_id = anki_api.add_note(note)
+                added += 1
         except AnkiApiError as e:
-            print_error(str(e), note=e.note)
+            # Location of the note comes from the parser, the file isn't searched
+            location = f"{file_path}:{note.span.line}: " if note.span else ""
+            print_error(f"{location}{e}", note=e.note)
+            continue
+
+        hasher.update_note_fingerprint(note.anki_id, file_path, fingerprints[id(note)])
+    print_sub_step(
+        f"Added: {added}, updated: {updated}, "
+        f"skipped as unchanged: {len(notes) - len(changed_notes)}"
+    )
 
     print_sub_step("Adding IDs to cards in file...")
-    writer.update_note_ids()
+    Writer(file_path, notes, document).update_note_ids()
 
     print_sub_step("Updating information on file hash...")
-    hasher.update_hash(file_path, hasher.calculate_hash(file_path))
+    update_file_hashes(document, hasher)
     print_sub_step("Finished!")
 
 
-def update_note_ids_in_file(file_path: str, anki_api: AnkiApi, anki_media: AnkiMedia):
-    """Update IDs of notes in file by getting their IDs from Anki"""
-    print_step(f'Updating IDs of cards in "{file_path}"!')
+def update_file_hashes(document: Document, hasher: Hasher) -> None:
+    """Save hashes of the file and of its sections.
+    Both come from the document, so they always describe the same contents."""
+    file_path = str(document.path)
+    hasher.update_hash(file_path, document.digest, document.signature)
+    hasher.update_section_hashes(file_path, Parser.get_sections(document.text))
 
-    notes = get_notes_from_file(file_path)
-    if not notes:
-        return
 
-    converter.convert_cloze_deletions_to_anki_format(
-        [note for note in notes if isinstance(note, ClozeNote)]
-    )
-    writer = Writer(file_path, notes)
-    writer.update_cloze_notes()
-
-    print_sub_step("Handling images...")
-    img_handler.handle_images_in(notes, anki_media, copy_images=False)
+def update_note_ids_in_file(
+    file_path: str,
+    anki_api: AnkiApi,
+    anki_media: AnkiMedia,
+    hasher: Hasher,
+    parse_cache: Optional[ParseCache] = None,
+    prepared: Optional["Future[Optional[PreparedFile]]"] = None,
+):
+    """Update IDs of notes in file by getting their IDs from Anki.
+    Notes are loaded from parse_cache if the contents were parsed before.
+    If prepared is passed, the file was already read and is prepared by a worker process."""
+    print_step(f'Updating IDs of cards in "{file_path}"!')
 
-    print_sub_step("Converting cards to the html...")
-    converter.convert_notes_to_html(notes, MD)
+    # All notes are prepared as if they were never synced
+    prepared_file = get_prepared_file(
+        file_path, True, hasher, parse_cache=parse_cache, prepared=prepared
+    )
+    if not prepared_file or not prepared_file.notes:
+        return
 
     print_sub_step("Getting card IDs from Anki...")
-    anki_api.update_note_ids(notes)
+    anki_api.update_note_ids(prepared_file.notes)
 
     print_sub_step("Adding IDs to cards in file...")
-    writer.update_note_ids()
+    Writer(file_path, prepared_file.notes, prepared_file.document).update_note_ids()
     print_sub_step("Finished!")
 
 
@@ -166,42 +452,331 @@ def sync(anki_api: AnkiApi) -> None:
         print_sub_warning(f"{e}. Skipping...")
 
 
-def get_file_paths_from_directory(dir_path: str, search_recursive: bool) -> Set[str]:
-    os.chdir(dir_path)
+def get_files_changed_in_git(
+    paths: Set[str], since: str, store: StateStore
+) -> Tuple[Optional[GitTracker], Optional[str], Optional[Callable[[str], bool]]]:
+    """Get files that changed in git since the commit (or since the last synced commit if it's empty).
 
-    paths_to_files = set()
-    sub_directories = []
-    for item in os.scandir():
-        # Get markdown files
-        extension = os.path.splitext(item.name)[1]
-        if item.is_file() and extension in FILE_EXTENSIONS:
-            paths_to_files.add(os.path.realpath(item.path))
-        # And all directories
-        elif search_recursive and item.is_dir():
-            sub_directories.append(os.path.realpath(item.path))
+    Returns:
+        Git tracker, current commit and function that checks if the file should be synced.
+        Function is None if git can't be used and all files should be checked.
+    """
+    full_paths = [os.path.realpath(path) for path in paths]
+    directory = os.path.commonpath(full_paths)
+    if not os.path.isdir(directory):
+        directory = os.path.dirname(directory)
 
-    # Get all markdown files from each sub directory
-    for directory in sub_directories:
-        paths_to_files |= get_file_paths_from_directory(directory, search_recursive)
-        os.chdir(dir_path)
+    try:
+        tracker = GitTracker(directory)
+        head = tracker.get_head()
+    except GitError as e:
+        print_sub_warning(f"{e}. Checking all files...")
+        return None, None, None
+
+    since = since or tracker.get_last_synced_commit(store) or ""
+    if not since:
+        print_sub_warning("No synced commit recorded yet. Checking all files...")
+        return tracker, head, None
+    try:
+        changed_files = tracker.get_changed_files(since)
+    except GitError as e:
+        # E.g. the synced commit is gone after a rebase, the commit is recorded again
+        # after all files are checked
+        print_sub_warning(f"{e}. Checking all files...")
+        return tracker, head, None
+
+    # Files outside the repository can't be checked with git
+    root = os.path.join(tracker.root, "")
+    return (
+        tracker,
+        head,
+        lambda file: file in changed_files or not file.startswith(root),
+    )
 
-    return paths_to_files
 
+def create_file_walker(
+    recursive: bool,
+    include: Iterable[str],
+    exclude: Iterable[str],
+    file_filter: Optional[Callable[[str], bool]] = None,
+    cache: Optional[StateStore] = None,
+) -> FileWalker:
+    """Create walker with patterns from the config options defaults.include and defaults.exclude
+    (separated by commas) and patterns passed as arguments"""
+    config_include = CONFIG.get_option_value_or_default("defaults", "include", "")
+    config_exclude = CONFIG.get_option_value_or_default("defaults", "exclude", ".git/")
+    return FileWalker(
+        FILE_EXTENSIONS,
+        recursive,
+        file_filter,
+        include=IgnoreRules([*map(str.strip, config_include.split(",")), *include]),
+        exclude=IgnoreRules([*map(str.strip, config_exclude.split(",")), *exclude]),
+        cache=cache,
+    )
 
-def get_paths_to_files(paths: Set[str], recursive: bool) -> Set[str]:
-    paths_to_files = set()
-    initial_directory = os.getcwd()
-    for path in paths:
-        full_path = os.path.realpath(path)
 
-        if os.path.isdir(full_path):
-            paths_to_files |= get_file_paths_from_directory(full_path, recursive)
-            os.chdir(initial_directory)
-            continue
+def list_found_files(walker: FileWalker, paths: Iterable[str]) -> None:
+    """Print files found by the walker and statistics of the search"""
+    print_action("Searching Markdown files...")
+    start = time.perf_counter()
+    for file in walker.walk(paths):
+        print_result(file)
+    elapsed = time.perf_counter() - start
+
+    for error in walker.errors:
+        print_sub_warning(f"Couldn't search {error.filename}: {error.strerror}")
+    print_sub_step(
+        f"Found {walker.files_yielded} file(s), pruned {walker.entries_pruned} "
+        f"file(s) and directories in {elapsed:.3f}s"
+    )
+
+
+def get_vault_root(paths: Iterable[str]) -> str:
+    """Get the folder whose files share one state database: the default folder from the config
+    if all paths are inside it, otherwise the closest git repository containing all paths,
+    otherwise the closest folder containing all paths"""
+    full_paths = [os.path.realpath(path) for path in paths]
+    directory = os.path.commonpath(full_paths)
+    if not os.path.isdir(directory):
+        directory = os.path.dirname(directory)
+
+    default_folder = CONFIG.get_option_value("defaults", "folder")
+    if default_folder:
+        default_folder = os.path.realpath(os.path.expanduser(default_folder))
+        if os.path.commonpath([default_folder, directory]) == default_folder:
+            return default_folder
+
+    folder = directory
+    while True:
+        if os.path.exists(os.path.join(folder, ".git")):
+            return folder
+        parent = os.path.dirname(folder)
+        if parent == folder:
+            return directory
+        folder = parent
+
+
+def get_state_path(vault_root: str, profile: str) -> str:
+    """Get path to the state database of the vault synced with the profile, creating its folder if needed"""
+    state_folder = os.getenv("XDG_STATE_HOME") if sys.platform == "linux" else None
+    if state_folder:
+        state_folder = os.path.join(state_folder, "inka2")
+    else:
+        state_folder = os.path.expanduser(DEFAULT_STATE_FOLDERS[sys.platform])
+    state_folder = os.path.join(state_folder, "vaults")
+    os.makedirs(state_folder, exist_ok=True)
+
+    # Readable prefix helps to find the database, the digest makes it unique
+    digest = hashlib.sha1(f"{vault_root}\0{profile}".encode("utf-8")).hexdigest()
+    name = re.sub(r"[^\w.-]", "_", f"{os.path.basename(vault_root)}-{profile}")
+    return os.path.join(state_folder, f"{name}-{digest[:12]}.db")
 
-        paths_to_files.add(full_path)
 
-    return paths_to_files
+def open_state_store(vault_root: str, profile: str) -> StateStore:
+    """Open and lock the state database of the vault synced with the profile.
+    Hashes of files from the vault are imported from the old datafile if it wasn't done yet."""
+    try:
+        store = StateStore(get_state_path(vault_root, profile), vault_root, lock=True)
+    except StateStoreLockedError:
+        print_error(
+            f'"{vault_root}" is being synced with profile "{profile}" by another inka2 process!'
+        )
+        sys.exit(1)
+    except (sqlite3.Error, StateStoreError) as e:
+        print_error(f"couldn't open the state database: {e}")
+        sys.exit(1)
+
+    imported = store.import_hashes_json(HASHES_PATH)
+    if imported:
+        print_sub_step(f"Imported {imported} file hashes from {HASHES_PATH}")
+    return store
+
+
+def get_paths_to_collect(paths: Iterable[str]) -> Set[str]:
+    """Get paths passed as arguments or, if there are none, the path from config option 'defaults.folder'"""
+    paths = set(paths)
+    if paths:
+        return paths
+
+    default_path = os.path.expanduser(CONFIG.get_option_value("defaults", "folder"))
+    if not default_path:
+        print_error(
+            "default folder is not specified in the config!\n"
+            "You must pass the path to a file or a folder as an argument."
+        )
+        sys.exit(1)
+
+    if not os.path.exists(default_path):
+        print_error(f'default folder "{default_path}" does not exist!')
+        sys.exit(1)
+
+    return {default_path}
+
+
+def open_anki(prompt_profile: bool) -> Tuple[AnkiApi, str, str]:
+    """Find Anki folder and the profile to sync with.
+
+    Returns:
+        AnkiApi, path to Anki folder and name of the profile
+    """
+    # Get path to Anki folder
+    anki_path = CONFIG.get_option_value("anki", "path")
+    if not anki_path:
+        anki_path = os.path.expanduser(DEFAULT_ANKI_FOLDERS[sys.platform])
+    log.debug(f"Anki path: {anki_path}")
+
+    # Create instance of AnkiApi. Throws an error if path to anki is incorrect
+    try:
+        anki_api = AnkiApi(CONFIG, Path(anki_path))
+    except AnkiApiError as e:
+        print_error(str(e))
+        sys.exit(1)
+
+    # Get name of profile and select it in Anki
+    print_action("Getting profile...")
+    profile = get_profile(prompt_profile, anki_api)
+    log.debug(f"{profile=}")
+    return anki_api, anki_path, profile
+
+
+def load_profile(anki_api: AnkiApi, anki_path: str, profile: str) -> AnkiMedia:
+    """Load collection of the profile, get changes from AnkiWeb and check note types"""
+    # Load collection of a profile
+    print_action("Loading profile...")
+    try:
+        anki_api.load_collection(profile)
+    except AnkiApiError as e:
+        print_error(str(e), pause=False)
+        sys.exit(1)
+
+    # Sync changes with AnkiWeb
+    print_action("Getting changes from AnkiWeb...")
+    sync(anki_api)
+
+    # Check correctness of note types
+    anki_media = AnkiMedia(profile, anki_path)
+    check_note_types(anki_media, anki_api)
+    return anki_media
+
+
+def create_hasher(store: StateStore, paranoid: bool) -> Hasher:
+    try:
+        return Hasher(
+            store,
+            algorithm=CONFIG.get_option_value_or_default(
+                "defaults", "hash_algorithm", DEFAULT_HASH_ALGORITHM
+            ),
+            paranoid=paranoid,
+            flush_every=HASHES_FLUSH_EVERY,
+            flush_interval=HASHES_FLUSH_INTERVAL,
+        )
+    except ValueError as e:
+        print_error(f"{e}. Please check the option defaults.hash_algorithm")
+        sys.exit(1)
+
+
+def parse_time_budget(
+    ctx: click.Context, param: click.Parameter, value: Optional[str]
+) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return parse_duration(value)
+    except ValueError:
+        raise click.BadParameter(f'"{value}" is not a duration such as 20s or 2m')
+
+
+def remember_files(files: Iterable[str], seen: Set[str]) -> Iterator[str]:
+    """Lazily pass files through, adding each of them to seen"""
+    for file in files:
+        seen.add(file)
+        yield file
+
+
+def run_reporting_errors(action: Callable[[], None], pause: bool) -> bool:
+    """Run processing of a file, printing its errors instead of raising them.
+    Returns False if processing failed."""
+    try:
+        action()
+        return True
+    except (
+        OSError,
+        ValueError,
+        FileNotFoundError,
+        FileExistsError,
+    ) as e:
+        print_error(
+            f"{e}\nSkipping file! Consider re-running with --force.",
+            pause=pause,
+        )
+    except AnkiApiError as e:
+        print_error(f"{e}\nSkipping file!", pause=pause, note=e.note)
+    return False
+
+
+def print_left_files(
+    left: Dict[str, Optional[FileHash]],
+    total: int,
+    time_budget: Optional[float],
+    scheduler: Scheduler,
+) -> None:
+    """Report files left for the next run after the time budget was spent"""
+    estimate = scheduler.estimate(left)
+    work = f", about {estimate:.1f}s of work" if estimate is not None else ""
+    print_sub_warning(
+        f"Time budget of {time_budget:g}s spent: {len(left)} of {total} file(s) "
+        f"left for the next run{work}"
+    )
+
+
+def sync_changed_files(
+    files: Iterable[str],
+    anki_api: AnkiApi,
+    anki_media: AnkiMedia,
+    hasher: Hasher,
+    scheduler: Scheduler,
+) -> None:
+    """Collect notes from files that changed since the last sync, without pausing on errors"""
+    for file, file_hash in scheduler.schedule(hasher.get_changed_files(files)):
+        start = time.perf_counter()
+        synced = run_reporting_errors(
+            lambda: create_notes_from_file(
+                file, False, anki_api, anki_media, hasher, file_hash=file_hash
+            ),
+            pause=False,
+        )
+        if synced:
+            scheduler.record(file, time.perf_counter() - start)
+    hasher.flush()
+
+
+def create_file_watcher(
+    walker: FileWalker,
+    paths: Iterable[str],
+    list_files: Callable[[], Iterable[str]],
+    recursive: bool,
+    polling: bool,
+    poll_interval: float,
+) -> FileWatcher:
+    """Create inotify watcher for directories found by the walker (and directories of paths to files),
+    or polling watcher if inotify can't be used"""
+    if not polling and is_inotify_supported():
+        directories = set(walker.walked_directories)
+        directories.update(
+            os.path.dirname(os.path.realpath(path))
+            for path in paths
+            if not os.path.isdir(path)
+        )
+        try:
+            return InotifyWatcher(directories, FILE_EXTENSIONS, recursive)
+        except OSError as e:
+            print_sub_warning(f"{e}. Falling back to polling...")
+
+    return PollingWatcher(list_files, poll_interval)
+
+
+def stop_on_signal(signum, frame) -> None:
+    raise KeyboardInterrupt
 
 
 def handle_code_highlight(anki_api: AnkiApi, anki_media: AnkiMedia) -> None:
@@ -499,6 +1074,70 @@ def config(list_options: bool, reset: bool, edit: bool, name: str, value: str) -
     is_flag=True,
     help="Copy images to Anki Media folder even if they already exist, i.e. overwrite.",
 )
+@click.option(
+    "--paranoid",
+    "paranoid",
+    is_flag=True,
+    help="Always hash file contents instead of trusting unchanged file size and modification time.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    "jobs",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of threads used to look for changed files, chosen automatically by default. "
+    "If more than one, also the number of processes that parse cards and convert them to html.",
+)
+@click.option(
+    "--since-git",
+    "since_git",
+    is_flag=False,
+    flag_value="",
+    default=None,
+    metavar="[REF]",
+    help="Only check files changed in git since REF (passed as --since-git=REF) or, if REF is omitted, "
+    "since the last synced commit. Untracked and modified files are always checked.",
+)
+@click.option(
+    "--include",
+    "include",
+    metavar="PATTERN",
+    multiple=True,
+    help='Only collect files matching gitignore-style PATTERN from directories, e.g. "notes/" for files inside notes folders. Can be passed multiple times.',
+)
+@click.option(
+    "--exclude",
+    "exclude",
+    metavar="PATTERN",
+    multiple=True,
+    help="Skip files and directories matching gitignore-style PATTERN, in addition to .inkaignore files. "
+    "Can be passed multiple times.",
+)
+@click.option(
+    "--list-files",
+    "list_files",
+    is_flag=True,
+    help="Only list files that would be collected, with statistics of the search.",
+)
+@click.option(
+    "--order",
+    "order",
+    type=click.Choice(ORDERS),
+    default=ORDER_BY_PATH,
+    show_default=True,
+    help="Order in which files are processed: by path, the longest to process first "
+    "(estimated from previous runs and file sizes) or the most recently modified first.",
+)
+@click.option(
+    "--time-budget",
+    "time_budget",
+    metavar="DURATION",
+    default=None,
+    callback=parse_time_budget,
+    help="Stop starting new files after DURATION, e.g. 20s or 2m. "
+    "Changed files that are left are processed first by the next run.",
+)
 @click.argument(
     "paths", metavar="[PATH]...", nargs=-1, type=click.Path(exists=True), required=False
 )
@@ -509,6 +1148,14 @@ def collect(
     ignore_errors: bool,
     full_sync: bool,
     force: bool,
+    paranoid: bool,
+    jobs: Optional[int],
+    since_git: Optional[str],
+    include: Tuple[str, ...],
+    exclude: Tuple[str, ...],
+    list_files: bool,
+    order: str,
+    time_budget: Optional[float],
     paths: Iterable[str],
 ) -> None:
     """Get flashcards from files and add them to Anki. If flashcard already exists in Anki, the changes will be synced.
@@ -523,92 +1170,278 @@ def collect(
 
            Get cards from all Markdown files in the directory:\n
                inka collect path/to/directory
-    """
-    # If no path specified as an argument, search for default path in config
-    paths = set(paths)
-    if not paths:
-        default_path = os.path.expanduser(CONFIG.get_option_value("defaults", "folder"))
-        if not default_path:
-            print_error(
-                "default folder is not specified in the config!\n"
-                "You must pass the path to a file or a folder as an argument."
-            )
-            sys.exit(1)
 
-        if not os.path.exists(default_path):
-            print_error(f'default folder "{default_path}" does not exist!')
-            sys.exit(1)
+           Get cards from the directory and its subdirectories, skipping attachments:\n
+               inka collect -r --exclude "attachments/" path/to/directory
 
-        paths.add(default_path)
+           Sync for at most 20 seconds, leaving the rest for the next run:\n
+               inka collect -r --time-budget 20s path/to/directory
+    """
+    if time_budget is not None and (update_ids or full_sync):
+        raise click.UsageError(
+            "--time-budget can't be used together with --update-ids or --full-sync"
+        )
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    paths = get_paths_to_collect(paths)
+    if list_files:
+        list_found_files(create_file_walker(recursive, include, exclude), paths)
+        sys.exit(0)
 
-    # Get path to Anki folder
-    anki_path = CONFIG.get_option_value("anki", "path")
-    if not anki_path:
-        anki_path = os.path.expanduser(DEFAULT_ANKI_FOLDERS[sys.platform])
-    log.debug(f"Anki path: {anki_path}")
+    anki_api, anki_path, profile = open_anki(prompt)
+    # State is kept per vault and profile, so other vaults and profiles can be synced in parallel
+    vault_root = get_vault_root(paths)
+    log.debug(f"{vault_root=}")
+    store = open_state_store(vault_root, profile)
+    anki_media = load_profile(anki_api, anki_path, profile)
 
-    # Create instance of AnkiApi. Throws an error if path to anki is incorrect
+    # Perform action on notes from each file
+    hasher = create_hasher(store, paranoid)
+    parse_cache = ParseCache(store, CONFIG, PARSE_CACHE_MAX_SIZE)
+    executor: Optional[ProcessPoolExecutor] = None
+    git_tracker, git_head, is_changed_in_git = None, None, None
+    if since_git is not None and not (update_ids or full_sync):
+        print_action("Getting changed files from git...")
+        git_tracker, git_head, is_changed_in_git = get_files_changed_in_git(
+            paths, since_git, store
+        )
+
+    has_errors = False
     try:
-        anki_api = AnkiApi(CONFIG, Path(anki_path))
-    except AnkiApiError as e:
-        print_error(str(e))
-        sys.exit(1)
+        # Files are found lazily, so they are checked while the search goes on
+        print_action("Searching Markdown files...")
+        # Listings of unchanged directories are reused unless stat data isn't trusted
+        walker = create_file_walker(
+            recursive,
+            include,
+            exclude,
+            is_changed_in_git,
+            cache=None if paranoid else store,
+        )
+        walked_files: Set[str] = set()
+        files = remember_files(walker.walk(paths), walked_files)
+        files_to_process: Dict[str, Optional[FileHash]]
+        if update_ids or full_sync:
+            files_to_process = dict.fromkeys(files)
+        else:
+            files_to_process = hasher.get_changed_files(files, jobs)
+
+        for error in walker.errors:
+            print_sub_warning(f"Couldn't search {error.filename}: {error.strerror}")
+        if not walker.files_found:
+            print_sub_warning("Markdown files not found!")
+            sys.exit(0)
+        log.debug(f"files={list(files_to_process)}")
+        print_sub_step(
+            f"{walker.directories_scanned} directories scanned, "
+            f"{walker.directories_cached} unchanged"
+        )
+        if is_changed_in_git:
+            print_sub_step(
+                f"{walker.files_yielded} of {walker.files_found} file(s) changed in git"
+            )
+        if not (update_ids or full_sync):
+            print_sub_step(
+                f"{len(files_to_process)} of {walker.files_yielded} file(s) changed"
+            )
 
-    # Get name of profile and select it in Anki
-    print_action("Getting profile...")
-    profile = get_profile(prompt, anki_api)
-    log.debug(f"{profile=}")
+        # Changed files left by the previous run are resumed first
+        pending = store.get_pending_files()
+        resumed = {file for file in pending if file in files_to_process}
+        if resumed:
+            print_sub_step(f"{len(resumed)} file(s) left by the previous run go first")
+
+        # Files are found in the order of directory listings, which differs between runs
+        scheduler = Scheduler(order, store)
+        scheduled = scheduler.schedule(files_to_process, first=resumed)
+        left: Dict[str, Optional[FileHash]] = {}
+        # Notes of the next files are prepared in worker processes while a file is synced.
+        # Otherwise each file is prepared right before it is synced.
+        prepared_files: Iterable[
+            Tuple[str, Optional[FileHash], Optional["Future[Optional[PreparedFile]]"]]
+        ] = ((file, file_hash, None) for file, file_hash in scheduled)
+        if jobs and jobs > 1:
+            executor = ProcessPoolExecutor(jobs)
+            prepared_files = prepare_files_ahead(
+                scheduled,
+                executor,
+                jobs * PREPARE_AHEAD_PER_JOB,
+                update_ids or full_sync,
+                hasher,
+                parse_cache,
+            )
+        for index, (file, file_hash, prepared) in enumerate(prepared_files):
+            # At least one file is processed, so every run makes progress
+            if deadline is not None and index and time.monotonic() >= deadline:
+                left = dict(scheduled[index:])
+                break
 
-    # Load collection of a profile
-    print_action("Loading profile...")
-    try:
-        anki_api.load_collection(profile)
-    except AnkiApiError as e:
-        print_error(str(e), pause=False)
-        sys.exit(1)
+            start = time.perf_counter()
+            if update_ids:
+                synced = run_reporting_errors(
+                    lambda: update_note_ids_in_file(
+                        file, anki_api, anki_media, hasher, parse_cache, prepared
+                    ),
+                    pause=not ignore_errors,
+                )
+            else:
+                synced = run_reporting_errors(
+                    lambda: create_notes_from_file(
+                        file,
+                        full_sync,
+                        anki_api,
+                        anki_media,
+                        hasher,
+                        force=force,
+                        file_hash=file_hash,
+                        parse_cache=parse_cache,
+                        prepared=prepared,
+                    ),
+                    pause=not ignore_errors,
+                )
+            has_errors = has_errors or not synced
+            if synced and not update_ids:
+                scheduler.record(file, time.perf_counter() - start)
+
+        if not (update_ids or full_sync):
+            # Files outside of the searched paths stay queued for the run that searches them
+            store.set_pending_files(
+                [file for file in pending if file not in walked_files] + list(left)
+            )
+        if left:
+            print_left_files(left, len(files_to_process), time_budget, scheduler)
+
+        # Skipped files must stay in the git diff of the next run
+        if git_tracker and git_head and not has_errors and not left:
+            git_tracker.set_last_synced_commit(store, git_head)
+    finally:
+        if executor:
+            # Files prepared ahead of the deadline are left for the next run
+            executor.shutdown(cancel_futures=True)
+        hasher.flush()
+        store.close()
+    print_sub_step(
+        f"{hasher.stat_hits} file(s) unchanged by stat check, "
+        f"{hasher.content_hashes} file(s) hashed"
+    )
 
     # Sync changes with AnkiWeb
-    print_action("Getting changes from AnkiWeb...")
+    print_action("Synchronizing changes with AnkiWeb...")
     sync(anki_api)
 
-    # Check correctness of note types
-    anki_media = AnkiMedia(profile, anki_path)
-    check_note_types(anki_media, anki_api)
+    # Close collection to save changes
+    anki_api.close()
+    print_action("Everything is done!")
 
-    # Get paths to all files
-    print_action("Searching Markdown files...")
-    files = get_paths_to_files(paths, recursive)
-    if not files:
-        print_sub_warning("Markdown files not found!")
-        sys.exit(0)
-    log.debug(f"{files=}")
 
-    # Perform action on notes from each file
-    hasher = Hasher(HASHES_PATH)
-    initial_directory = os.getcwd()
-    for file in files:
-        try:
-            if update_ids:
-                update_note_ids_in_file(file, anki_api, anki_media)
-                continue
+@cli.command()
+@click.option("-r", "--recursive", is_flag=True, help="Watch files in subdirectories.")
+@click.option(
+    "-p",
+    "--prompt",
+    is_flag=True,
+    help="Show prompt for profile name even if config contains default profile.",
+)
+@click.option(
+    "--include",
+    "include",
+    metavar="PATTERN",
+    multiple=True,
+    help='Only watch files matching gitignore-style PATTERN, e.g. "notes/" for files inside notes folders. Can be passed multiple times.',
+)
+@click.option(
+    "--exclude",
+    "exclude",
+    metavar="PATTERN",
+    multiple=True,
+    help="Don't watch files and directories matching gitignore-style PATTERN. Can be passed multiple times.",
+)
+@click.option(
+    "--debounce",
+    "debounce",
+    type=click.FloatRange(min=0),
+    default=WATCH_DEBOUNCE,
+    show_default=True,
+    help="Seconds without changes after which changed files are synced.",
+)
+@click.option(
+    "--polling",
+    "polling",
+    is_flag=True,
+    help="Check files periodically instead of getting events from the system.",
+)
+@click.option(
+    "--poll-interval",
+    "poll_interval",
+    type=click.FloatRange(min=0.1),
+    default=WATCH_POLL_INTERVAL,
+    show_default=True,
+    help="Seconds between checks of files when polling.",
+)
+@click.argument(
+    "paths", metavar="[PATH]...", nargs=-1, type=click.Path(exists=True), required=False
+)
+def watch(
+    recursive: bool,
+    prompt: bool,
+    include: Tuple[str, ...],
+    exclude: Tuple[str, ...],
+    debounce: float,
+    polling: bool,
+    poll_interval: float,
+    paths: Iterable[str],
+) -> None:
+    """Watch files and sync flashcards from them with Anki whenever they are saved.
 
-            create_notes_from_file(
-                file, full_sync, anki_api, anki_media, hasher, force=force
-            )
-        except (
-            OSError,
-            ValueError,
-            FileNotFoundError,
-            FileExistsError,
-        ) as e:
-            print_error(
-                f"{e}\nSkipping file! Consider re-running with --force.",
-                pause=(not ignore_errors),
-            )
-        except AnkiApiError as e:
-            print_error(f"{e}\nSkipping file!", pause=(not ignore_errors), note=e.note)
-        finally:
-            os.chdir(initial_directory)
+    The collection is opened once, and only changed files are synced. Stop with Ctrl+C.
+
+    If no PATH argument is passed, the program will use the path from config option 'defaults.folder'.
+
+       [PATH]... - paths to files and/or directories
+
+       Examples:\n
+           Watch all Markdown files in the directory and its subdirectories:\n
+               inka watch -r path/to/directory
+    """
+    paths = get_paths_to_collect(paths)
+    anki_api, anki_path, profile = open_anki(prompt)
+    store = open_state_store(get_vault_root(paths), profile)
+    anki_media = load_profile(anki_api, anki_path, profile)
+    hasher = create_hasher(store, paranoid=False)
+    # The file that was just saved is the one the user waits for
+    scheduler = Scheduler(ORDER_BY_MTIME, store)
+
+    def list_files() -> Iterable[str]:
+        return create_file_walker(recursive, include, exclude, cache=store).walk(paths)
+
+    signal.signal(signal.SIGTERM, stop_on_signal)
+    watcher = None
+    try:
+        print_action("Syncing files changed since the last sync...")
+        walker = create_file_walker(recursive, include, exclude, cache=store)
+        sync_changed_files(walker.walk(paths), anki_api, anki_media, hasher, scheduler)
+
+        watcher = create_file_watcher(
+            walker, paths, list_files, recursive, polling, poll_interval
+        )
+        print_action("Watching for changes. Press Ctrl+C to stop.")
+        while True:
+            changes = watcher.wait_for_changes(debounce)
+            # Changed files are checked against patterns without walking the paths again.
+            # They are walked if some events were lost (changes are None)
+            # or files are in directories created or moved since the last walk.
+            files: Optional[Iterable[str]] = None
+            if changes is not None:
+                files = walker.select({os.path.realpath(path) for path in changes})
+            if files is None:
+                files = walker.walk(paths)
+            sync_changed_files(files, anki_api, anki_media, hasher, scheduler)
+    except KeyboardInterrupt:
+        print_action("Stopping...")
+    finally:
+        if watcher:
+            watcher.close()
+        hasher.flush()
+        store.close()
 
     # Sync changes with AnkiWeb
     print_action("Synchronizing changes with AnkiWeb...")
@@ -617,3 +1450,31 @@ def collect(
     # Close collection to save changes
     anki_api.close()
     print_action("Everything is done!")
+
+
+@cli.command()
+@click.option(
+    "--stdio",
+    "stdio",
+    is_flag=True,
+    help="Talk to the editor over standard input and output.",
+)
+def serve(stdio: bool) -> None:
+    """Run a language server that checks flashcards while files are edited.
+
+    Editors with Language Server Protocol support start it and send changes of open Markdown
+    files. Only changed sections are tokenized again, and problems like cards without answers,
+    duplicate IDs or incorrect cloze deletions are shown right away. Nothing is sent to Anki.
+
+       Examples:\n
+           Command that the editor runs:\n
+               inka serve --stdio
+    """
+    if not stdio:
+        raise click.UsageError("--stdio is the only supported transport")
+    server = LanguageServer(
+        sys.stdin.buffer,
+        sys.stdout.buffer,
+        CONFIG.get_option_value("defaults", "deck"),
+    )
+    sys.exit(server.run())
@@ -11,3 +11,15 @@ class AnkiApiError(Exception):
 
 class HighlighterError(Exception):
     pass
+
+
+class StateStoreError(Exception):
+    pass
+
+
+class GitError(Exception):
+    pass
+
+
+class StateStoreLockedError(StateStoreError):
+    pass
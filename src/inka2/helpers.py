@@ -5,12 +5,29 @@ from rich.console import Console
 from inka2.models.notes.note import Note
 
 CONSOLE = Console()
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 60 * 60}
 
 
 def parse_str_to_bool(string_value: str) -> bool:
     return string_value.strip().lower() == "true"
 
 
+def parse_duration(string_value: str) -> float:
+    """Parse duration such as "20s", "1.5m", "2h" or "90" (seconds) into seconds
+
+    Raises:
+        ValueError: if the string isn't a positive duration
+    """
+    string_value = string_value.strip().lower()
+    multiplier = _DURATION_UNITS.get(string_value[-1:])
+    if multiplier:
+        string_value = string_value[:-1]
+    seconds = float(string_value) * (multiplier or 1)
+    if not 0 < seconds < float("inf"):
+        raise ValueError(f'duration must be positive: "{string_value}"')
+    return seconds
+
+
 def print_result(msg: str) -> None:
     CONSOLE.print(f"{msg}", style="green")
 
@@ -39,10 +39,6 @@ class AnkiApi:
 
     def load_collection(self, profile: str) -> None:
         """Select profile in Anki and load collection"""
-        # opening collection changes current directory so
-        # we need to rollback it to initial
-        initial_dir = os.getcwd()
-
         try:
             self._profile_manager.load(profile)
             self._collection = anki.collection.Collection(
@@ -54,8 +50,6 @@ class AnkiApi:
                 "You need to either close Anki or switch to a different profile."
             )
 
-        os.chdir(initial_dir)
-
     def sync(self):
         """Sync collection to AnkiWeb"""
         # todo: handle case when to sync we need user decision (download or upload)
@@ -75,10 +69,7 @@ class AnkiApi:
             raise AnkiApiError("Please check your internet connection")
 
         # Perform media sync
-        initial_dir = os.getcwd()
-        os.chdir(self._collection.media.dir())
         self._collection.sync_media(auth)
-        os.chdir(initial_dir)
 
     def add_note(self, note: Note) -> int:
         model = self._collection.models.by_name(note.get_anki_note_type(self._cfg))
@@ -9,7 +9,10 @@ class AnkiMedia:
     """Class for working with files in Anki Media folder"""
 
     def __init__(self, anki_profile: str, anki_path: str) -> None:
-        self._anki_media_path = f"{anki_path}/{anki_profile}/collection.media"
+        # Absolute, so the media folder doesn't depend on the working directory
+        self._anki_media_path = os.path.abspath(
+            f"{anki_path}/{anki_profile}/collection.media"
+        )
 
     def exists(self, file_name: str) -> bool:
         """Check if file exists in Anki Media folder
@@ -22,6 +22,9 @@ class Config:
     _default_inline_code_color = "#fa4545"
     _default_escape_html = False
     _add_filename = False
+    _default_hash_algorithm = "blake2b"
+    _default_include = ""
+    _default_exclude = ".git/"
 
     def __init__(self, config_path: Union[str, Path]):
         self._config = configparser.ConfigParser()
@@ -46,6 +49,9 @@ class Config:
                 "folder": self._default_folder,
                 "escape_html": self._default_escape_html,
                 "add_filename": self._add_filename,
+                "hash_algorithm": self._default_hash_algorithm,
+                "include": self._default_include,
+                "exclude": self._default_exclude,
             },
             "anki": {
                 "path": self._default_path,
@@ -0,0 +1,84 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+
+def decode_text(content: bytes) -> str:
+    """Decode raw contents of the file, translating newlines the same way as in files opened in text mode"""
+    return content.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+class Document:
+    """Contents of the Markdown file shared by all stages of processing,
+    so the file is read only once and its hash always matches its text"""
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        content: bytes,
+        algorithm: str,
+        signature: Optional[Tuple[int, int, int]] = None,
+    ):
+        """
+        Args:
+            path: path to the file
+            content: raw contents of the file
+            algorithm: name of hashlib algorithm used to calculate digest
+            signature: (st_mtime_ns, st_size, st_ino) of the file taken before it was read
+        """
+        self.path = path
+        self.signature = signature
+        self._algorithm = algorithm
+        self._digest: Optional[str] = None
+        self._set_content(content)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], algorithm: str) -> "Document":
+        """Read the file. Stat signature is taken before reading, so a concurrent edit can't be missed"""
+        stat = os.stat(path)
+        with open(path, mode="rb") as f:
+            content = f.read()
+        return cls(
+            path, content, algorithm, (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        )
+
+    @property
+    def algorithm(self) -> str:
+        return self._algorithm
+
+    @property
+    def content(self) -> bytes:
+        return self._content
+
+    @property
+    def text(self) -> str:
+        """Decoded text with newlines translated the same way as in files opened in text mode"""
+        return self._text
+
+    @property
+    def digest(self) -> str:
+        if self._digest is None:
+            self._digest = hashlib.new(self._algorithm, self._content).hexdigest()
+        return self._digest
+
+    def write(self, text: str) -> None:
+        """Save new text into the file. Digest is calculated from the written content."""
+        if text == self._text:
+            return
+
+        content = text.replace("\n", os.linesep).encode("utf-8")
+        with open(self.path, mode="wb") as f:
+            f.write(content)
+
+        # File can be changed by someone else right after writing, so its stat can't be trusted
+        self.signature = None
+        self._set_content(content)
+
+    def _set_content(self, content: bytes) -> None:
+        self._content = content
+        self._text = decode_text(content)
+        self._digest = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}(path={self.path!r})"
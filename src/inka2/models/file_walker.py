@@ -0,0 +1,251 @@
+import os
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .hasher import RACY_WINDOW_NS
+from .ignore_rules import IGNORE_FILE_NAME, IgnoreRules
+from .state_store import DirectoryState, StateStore
+
+# Ignore rules together with the path of the current directory relative to the folder of the rules
+_ScopedRules = Tuple[Tuple[IgnoreRules, str], ...]
+
+
+class FileWalker:
+    """Class for finding files in directories without changing the working directory"""
+
+    def __init__(
+        self,
+        extensions: Iterable[str],
+        recursive: bool = False,
+        file_filter: Optional[Callable[[str], bool]] = None,
+        include: Optional[IgnoreRules] = None,
+        exclude: Optional[IgnoreRules] = None,
+        cache: Optional[StateStore] = None,
+    ):
+        """
+        Args:
+            extensions: extensions of files that are searched in directories, e.g. ".md"
+            recursive: if True, subdirectories are searched too
+            file_filter: if passed, only files for which it returns True are yielded
+            include: if passed, only files that match these patterns are yielded from directories
+            exclude: files and directories that are skipped in addition to those from .inkaignore files.
+                These patterns take precedence over .inkaignore files.
+            cache: if passed, listings of directories are kept in it, and directories whose
+                modification time hasn't changed since the last walk are not scanned again
+
+        Patterns are matched against paths relative to the searched directory.
+        Excluded directories are never scanned.
+        """
+        self._extensions = frozenset(extensions)
+        self._recursive = recursive
+        self._file_filter = file_filter
+        self._include = include or None
+        self._exclude = exclude or None
+        self._cache = cache
+        self.files_found = 0  # Files found before filtering
+        self.files_yielded = 0
+        self.entries_pruned = 0  # Files and directories skipped by patterns
+        self.directories_scanned = 0
+        # Directories whose listing was taken from the cache
+        self.directories_cached = 0
+        self.walked_directories: List[str] = []
+        self.errors: List[OSError] = []  # Directories that couldn't be read
+        # Paths relative to the searched directory and rules of directories walked last time,
+        # and paths to files passed to the last walk
+        self._walked_rules: Dict[str, Tuple[str, _ScopedRules]] = {}
+        self._walked_files: Set[str] = set()
+
+    def walk(self, paths: Iterable[str]) -> Iterator[str]:
+        """Lazily yield resolved absolute paths to files, each file only once.
+
+        Paths to files are yielded regardless of their extension,
+        directories are searched for files with the extensions.
+        """
+        yielded: Set[str] = set()
+        # Directories are identified by (st_dev, st_ino), so symlink loops are walked only once
+        visited: Set[Tuple[int, int]] = set()
+        self.walked_directories = []
+        self._walked_rules = {}
+        self._walked_files = set()
+
+        for path in paths:
+            full_path = os.path.realpath(path)
+            if os.path.isdir(full_path):
+                files = self._walk_directory(full_path, visited)
+            else:
+                self._walked_files.add(full_path)
+                files = iter((full_path,))
+
+            for file in files:
+                if file in yielded:
+                    continue
+                yielded.add(file)
+
+                self.files_found += 1
+                if self._file_filter and not self._file_filter(file):
+                    continue
+                self.files_yielded += 1
+                yield file
+
+    def select(self, files: Iterable[str]) -> Optional[List[str]]:
+        """Get those of the resolved absolute paths to files that the last walk would yield
+        if they existed then, without walking again. Rules of .inkaignore files are the same
+        as during the walk.
+
+        Returns:
+            Selected files or None if some file is in a directory that wasn't walked,
+            e.g. one created after the walk, and the paths have to be walked again
+        """
+        selected = []
+        for file in files:
+            if file not in self._walked_files:
+                directory, name = os.path.split(file)
+                walked = self._walked_rules.get(directory)
+                if walked is None:
+                    return None
+                relative_path, rules = walked
+                if os.path.splitext(name)[1] not in self._extensions:
+                    continue
+                if self._is_excluded(name, relative_path, rules, False):
+                    continue
+            if self._file_filter and not self._file_filter(file):
+                continue
+            selected.append(file)
+        return selected
+
+    def _walk_directory(
+        self, root: str, visited: Set[Tuple[int, int]]
+    ) -> Iterator[str]:
+        """Walk the directory iteratively. Only subdirectories are stat'ed,
+        types of other entries are taken from directory listings."""
+        stat = os.stat(root)
+        if (stat.st_dev, stat.st_ino) in visited:
+            return
+        visited.add((stat.st_dev, stat.st_ino))
+
+        # Directory, its modification time, its path relative to the root
+        # and rules from .inkaignore files that apply to it
+        directories: List[Tuple[str, int, str, _ScopedRules]] = [
+            (root, stat.st_mtime_ns, "", ())
+        ]
+        while directories:
+            directory, mtime_ns, relative_path, rules = directories.pop()
+            listing = self._list_directory(directory, mtime_ns)
+            if listing is None:
+                continue
+            self.walked_directories.append(directory)
+
+            if listing.has_ignore_file:
+                rules = self._add_ignore_file(directory, rules)
+            self._walked_rules[directory] = (relative_path, rules)
+            for name, is_symlink in listing.files:
+                if self._is_excluded(name, relative_path, rules, False):
+                    self.entries_pruned += 1
+                    continue
+                yield self._resolve(os.path.join(directory, name), is_symlink)
+
+            if not self._recursive:
+                continue
+            for name, is_symlink in listing.subdirectories:
+                if self._is_excluded(name, relative_path, rules, True):
+                    self.entries_pruned += 1
+                    continue
+
+                path = self._resolve(os.path.join(directory, name), is_symlink)
+                try:
+                    stat = os.stat(path)
+                except OSError as e:
+                    self.errors.append(e)
+                    continue
+                if (stat.st_dev, stat.st_ino) in visited:
+                    continue
+                visited.add((stat.st_dev, stat.st_ino))
+
+                directories.append(
+                    (
+                        path,
+                        stat.st_mtime_ns,
+                        f"{relative_path}{name}/",
+                        tuple((r, f"{p}{name}/") for r, p in rules),
+                    )
+                )
+
+    def _list_directory(
+        self, directory: str, mtime_ns: int
+    ) -> Optional[DirectoryState]:
+        """Get listing of the directory from the cache if the directory hasn't changed,
+        otherwise scan it. Returns None if the directory couldn't be read."""
+        cached = self._cache.get_directory(directory) if self._cache else None
+        if cached and cached.mtime_ns == mtime_ns:
+            self.directories_cached += 1
+            return cached
+
+        try:
+            with os.scandir(directory) as entries:
+                listing = self._scan(entries, mtime_ns)
+        except OSError as e:
+            self.errors.append(e)
+            return None
+        self.directories_scanned += 1
+
+        if self._cache and cached:
+            current = {name for name, _ in listing.subdirectories}
+            self._cache.delete_directories(
+                os.path.join(directory, name)
+                for name, _ in cached.subdirectories
+                if name not in current
+            )
+        # Directory modified this recently can still change within the same mtime tick
+        if self._cache and time.time_ns() - mtime_ns >= RACY_WINDOW_NS:
+            self._cache.update_directory(directory, listing)
+        return listing
+
+    def _scan(self, entries: Iterable[os.DirEntry], mtime_ns: int) -> DirectoryState:
+        listing = DirectoryState(mtime_ns, [], [], False)
+        for entry in entries:
+            extension = os.path.splitext(entry.name)[1]
+            if extension in self._extensions and entry.is_file():
+                listing.files.append((entry.name, entry.is_symlink()))
+            elif entry.is_dir():
+                listing.subdirectories.append((entry.name, entry.is_symlink()))
+            elif entry.name == IGNORE_FILE_NAME and entry.is_file():
+                listing = listing._replace(has_ignore_file=True)
+        return listing
+
+    def _add_ignore_file(self, directory: str, rules: _ScopedRules) -> _ScopedRules:
+        """Add rules from .inkaignore file of the directory"""
+        try:
+            ignore_rules = IgnoreRules.from_file(
+                os.path.join(directory, IGNORE_FILE_NAME)
+            )
+        except OSError as e:
+            self.errors.append(e)
+            return rules
+        return rules + ((ignore_rules, ""),)
+
+    def _is_excluded(
+        self, name: str, relative_path: str, rules: _ScopedRules, is_dir: bool
+    ) -> bool:
+        excluded = None
+        if self._exclude:
+            excluded = self._exclude.match(relative_path + name, is_dir)
+        # Rules of nested folders take precedence over the outer ones
+        for ignore_rules, path in reversed(rules):
+            if excluded is not None:
+                break
+            excluded = ignore_rules.match(path + name, is_dir)
+
+        if excluded:
+            return True
+        if self._include and not is_dir:
+            # Files are included by patterns of the directories they are in as well
+            return not self._include.match_file(relative_path + name)
+        return False
+
+    @staticmethod
+    def _resolve(path: str, is_symlink: bool) -> str:
+        """Paths inside resolved directories are already resolved unless they are symlinks"""
+        return os.path.realpath(path) if is_symlink else path
+
+    def __repr__(self):
+        return f"{type(self).__name__}(extensions={sorted(self._extensions)!r}, recursive={self._recursive!r})"
@@ -0,0 +1,196 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from .hasher import Hasher, StatSignature
+
+# Flags from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+# struct inotify_event without the name that follows it
+_EVENT_HEADER = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+
+class FileWatcher(ABC):
+    """Base class for waiting for changes of files"""
+
+    @abstractmethod
+    def read_changes(self, timeout: Optional[float]) -> Optional[Set[str]]:
+        """Wait up to timeout seconds (forever if None) for changed files.
+
+        Returns:
+            Paths to created or modified files, empty if nothing changed.
+            None if some changes were lost and all files must be checked.
+        """
+
+    def wait_for_changes(self, debounce: float) -> Optional[Set[str]]:
+        """Wait for changed files. Changes are collected until there are none for debounce seconds,
+        so a burst of saves is returned at once."""
+        changes: Set[str] = set()
+        while not changes:
+            new_changes = self.read_changes(None)
+            if new_changes is None:
+                return None
+            changes = new_changes
+
+        while True:
+            new_changes = self.read_changes(debounce)
+            if new_changes is None:
+                return None
+            if not new_changes:
+                return changes
+            changes |= new_changes
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher(FileWatcher):
+    """Watcher that gets events from Linux kernel. Subdirectories created later are watched too."""
+
+    def __init__(
+        self, directories: Iterable[str], extensions: Iterable[str], recursive: bool
+    ):
+        """
+        Args:
+            directories: directories to watch
+            extensions: extensions of files whose changes are reported
+            recursive: if True, directories created inside watched ones are watched too
+        Raises:
+            OSError: if inotify isn't available or watch limit is reached
+        """
+        libc_name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._extensions = frozenset(extensions)
+        self._recursive = recursive
+        self._directories: Dict[
+            int, str
+        ] = {}  # Watch descriptors and their directories
+
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            self._raise_errno("inotify_init1")
+        try:
+            for directory in directories:
+                self._add_watch(directory)
+        except OSError:
+            self.close()
+            raise
+
+    def read_changes(self, timeout: Optional[float]) -> Optional[Set[str]]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changes: Set[str] = set()
+        data = os.read(self._fd, _READ_SIZE)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if mask & IN_IGNORED:
+                self._directories.pop(wd, None)
+                continue
+
+            directory = self._directories.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if self._recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files could be created before the watch was added
+                    changes |= self._add_directory_tree(path)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                if os.path.splitext(name)[1] in self._extensions:
+                    changes.add(path)
+        return changes
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _add_directory_tree(self, root: str) -> Set[str]:
+        """Watch new directory and its subdirectories. Returns files that are already inside."""
+        files = set()
+        directories = [root]
+        while directories:
+            directory = directories.pop()
+            try:
+                self._add_watch(directory)
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            directories.append(entry.path)
+                        elif os.path.splitext(entry.name)[1] in self._extensions:
+                            files.add(entry.path)
+            except OSError:
+                continue  # Directory was removed right after creation
+        return files
+
+    def _add_watch(self, directory: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            self._raise_errno(f'watching "{directory}"')
+        self._directories[wd] = directory
+
+    @staticmethod
+    def _raise_errno(action: str) -> None:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{action} failed: {os.strerror(errno)}")
+
+
+class PollingWatcher(FileWatcher):
+    """Watcher that periodically compares stat signatures of files"""
+
+    def __init__(self, list_files: Callable[[], Iterable[str]], interval: float):
+        """
+        Args:
+            list_files: function that returns all watched files
+            interval: seconds between checks
+        """
+        self._list_files = list_files
+        self._interval = interval
+        self._signatures = self._get_signatures()
+
+    def read_changes(self, timeout: Optional[float]) -> Optional[Set[str]]:
+        time.sleep(self._interval if timeout is None else timeout)
+
+        signatures = self._get_signatures()
+        changes = {
+            path
+            for path, signature in signatures.items()
+            if self._signatures.get(path) != signature
+        }
+        self._signatures = signatures
+        return changes
+
+    def _get_signatures(self) -> Dict[str, StatSignature]:
+        signatures = {}
+        for path in self._list_files():
+            try:
+                signatures[path] = Hasher.get_stat_signature(path)
+            except OSError:
+                continue
+        return signatures
+
+
+def is_inotify_supported() -> bool:
+    return sys.platform.startswith("linux")
@@ -0,0 +1,82 @@
+import os
+import subprocess
+from typing import List, Optional, Set
+
+from ..exceptions import GitError
+from .state_store import StateStore
+
+LAST_SYNCED_COMMIT_KEY = "git_last_synced_commit"
+
+
+class GitTracker:
+    """Class for getting changed files from the git repository the notes are stored in"""
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: any directory inside the repository
+        Raises:
+            GitError: if git isn't installed or directory isn't inside a repository
+        """
+        self._root = os.path.realpath(
+            self._git(["rev-parse", "--show-toplevel"], cwd=directory).strip()
+        )
+
+    @property
+    def root(self) -> str:
+        return self._root
+
+    def get_head(self) -> str:
+        """Get hash of the current commit"""
+        return self._git(["rev-parse", "--verify", "HEAD"]).strip()
+
+    def get_changed_files(self, since: str) -> Set[str]:
+        """Get absolute paths to files that differ from the commit 'since':
+        changed in later commits, staged, modified in the working tree or untracked.
+
+        Raises:
+            GitError: if 'since' isn't a valid commit
+        """
+        commit = self._git(["rev-parse", "--verify", f"{since}^{{commit}}"]).strip()
+        changed = self._git_paths(["diff", "--name-only", "--no-renames", "-z", commit])
+        untracked = self._git_paths(
+            ["ls-files", "--others", "--exclude-standard", "-z"]
+        )
+        return {os.path.join(self._root, path) for path in changed + untracked}
+
+    def get_last_synced_commit(self, store: StateStore) -> Optional[str]:
+        """Get commit which was synced by the last successful run"""
+        return store.get_meta(self._meta_key)
+
+    def set_last_synced_commit(self, store: StateStore, commit: str) -> None:
+        store.set_meta(self._meta_key, commit)
+
+    @property
+    def _meta_key(self) -> str:
+        return f"{LAST_SYNCED_COMMIT_KEY}:{self._root}"
+
+    def _git_paths(self, args: List[str]) -> List[str]:
+        """Run git command with NUL-separated output and return paths relative to repository root"""
+        return [path for path in self._git(args).split("\0") if path]
+
+    def _git(self, args: List[str], cwd: Optional[str] = None) -> str:
+        try:
+            result = subprocess.run(
+                ["git", *args],
+                cwd=cwd or self._root,
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                # Paths that aren't UTF-8 are decoded the same way os.walk() decodes them
+                errors="surrogateescape",
+                check=True,
+            )
+        except FileNotFoundError:
+            raise GitError("git executable was not found")
+        except subprocess.CalledProcessError as e:
+            raise GitError(e.stderr.strip() or f"git {args[0]} failed")
+
+        return result.stdout
+
+    def __repr__(self):
+        return f"{type(self).__name__}(root={self._root!r})"
@@ -1,40 +1,247 @@
 import hashlib
-import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, NamedTuple, Optional, Set, Tuple
+
+from .document import Document
+from .state_store import LEGACY_HASH_ALGORITHM, FileState, StateStore
+
+# (st_mtime_ns, st_size, st_ino)
+StatSignature = Tuple[int, int, int]
+
+
+class FileHash(NamedTuple):
+    """Hash of the file contents together with stat signature taken before hashing"""
+
+    digest: str
+    signature: StatSignature
+
+
+DEFAULT_HASH_ALGORITHM = "blake2b"
+# Size of chunks in which files are read while hashing
+CHUNK_SIZE = 1024 * 1024
+
+# Files modified this recently can still change within the same mtime tick,
+# so their stat signature is not trusted (same idea as git's "racy clean" check)
+RACY_WINDOW_NS = 2_000_000_000
 
 
 class Hasher:
-    def __init__(self, path: str):
-        self._path = path
-        try:
-            with open(path, mode="rt", encoding="utf-8") as f:
-                self._hashes = json.load(f)
-        except FileNotFoundError:
-            self._hashes = {}
+    def __init__(
+        self,
+        store: StateStore,
+        algorithm: str = DEFAULT_HASH_ALGORITHM,
+        paranoid: bool = False,
+        flush_every: int = 1,
+        flush_interval: Optional[float] = None,
+    ):
+        """
+        Args:
+            store: state database in which hashes are kept
+            algorithm: name of hashlib algorithm used to calculate new hashes
+            paranoid: if True, stat signatures are never trusted
+            flush_every: number of updated hashes after which they are committed to the database
+            flush_interval: seconds after which pending updates are committed regardless of their number
+        """
+        if algorithm not in hashlib.algorithms_available:
+            raise ValueError(f'unknown hash algorithm "{algorithm}"')
+        # SHAKE algorithms have no fixed digest size, so hexdigest() needs a length
+        if hashlib.new(algorithm).digest_size == 0:
+            raise ValueError(
+                f'hash algorithm "{algorithm}" has variable length and isn\'t supported'
+            )
 
-    def update_hash(self, filepath: str, new_hash: str) -> None:
-        """Update hash value for this filepath in the datafile"""
-        self._hashes[filepath] = new_hash
-        self._save()
+        self._store = store
+        self._algorithm = algorithm
+        self._paranoid = paranoid
+        self._flush_every = flush_every
+        self._flush_interval = flush_interval
+        self._pending = 0  # Updates that are not committed yet
+        self._last_flush = time.monotonic()
+        self.stat_hits = 0  # Files recognized as unchanged without being read
+        self.content_hashes = 0  # Files whose content had to be hashed
+
+    def update_hash(
+        self, filepath: str, new_hash: str, signature: Optional[StatSignature] = None
+    ) -> None:
+        """Update hash value (and optionally stat signature) for this filepath in the database"""
+        if signature is not None and self._is_racy(signature):
+            signature = None
+        self._store.update_file(filepath, new_hash, self._algorithm, signature)
+        self._pending += 1
+        self._maybe_flush()
 
     def has_changed(self, filepath: str, curr_hash: str) -> bool:
         """Check if the hash of this file changed. Returns True if file doesn't have previous hash value"""
-        try:
-            return self._hashes[filepath] != curr_hash
-        except KeyError:
+        state = self._store.get_file(filepath)
+        if state is None:
             return True
 
+        if state.algorithm != self._algorithm:
+            # Stored hash was calculated with another algorithm (e.g. MD5 by previous versions).
+            # Compare using that algorithm, the next update_hash stores the new one.
+            if state.algorithm == LEGACY_HASH_ALGORITHM:
+                # Previous versions hashed the text read with newlines translated
+                text = self.read_document(filepath).text
+                return state.digest != hash_text(text, LEGACY_HASH_ALGORITHM)
+            return state.digest != self.hash_file(filepath, state.algorithm)
+
+        return state.digest != curr_hash
+
+    def is_unchanged_by_stat(self, filepath: str, signature: StatSignature) -> bool:
+        """Check if the file is unchanged judging only by its stat signature.
+        Always returns False in paranoid mode."""
+        if self._paranoid:
+            return False
+
+        state = self._store.get_file(filepath)
+        if state is None or state.signature != tuple(signature):
+            return False
+
+        self.stat_hits += 1
+        return True
+
+    def get_changed_files(
+        self, filepaths: Iterable[str], jobs: Optional[int] = None
+    ) -> Dict[str, Optional[FileHash]]:
+        """Find files that changed since the last sync, hashing them concurrently.
+
+        Args:
+            filepaths: paths to files that will be checked
+            jobs: max number of threads used for hashing (None - chosen by ThreadPoolExecutor)
+        Returns:
+            Changed files (in order of filepaths) with their hashes.
+            Hash is None if file couldn't be read, the error will surface when the file is processed.
+        """
+        # Database is accessed only from this thread, workers only stat and read files
+        states = ((path, self._store.get_file(path)) for path in filepaths)
+
+        if jobs == 1:
+            results: Iterable = map(self._check_file, states)
+            return self._collect_changed_files(results)
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = executor.map(self._check_file, states)
+            return self._collect_changed_files(results)
+
+    def _check_file(
+        self, path_and_state: Tuple[str, Optional[FileState]]
+    ) -> Tuple[str, Optional[StatSignature], Optional[str]]:
+        """Get stat signature of the file and its hash if it can't be trusted (runs in worker threads)"""
+        path, state = path_and_state
+        try:
+            signature = self.get_stat_signature(path)
+            if (
+                not self._paranoid
+                and state is not None
+                and state.signature == signature
+            ):
+                return path, signature, None
+
+            return path, signature, self.calculate_hash(path, self._algorithm)
+        except OSError:
+            return path, None, None
+
+    def _collect_changed_files(
+        self, results: Iterable[Tuple[str, Optional[StatSignature], Optional[str]]]
+    ) -> Dict[str, Optional[FileHash]]:
+        changed_files: Dict[str, Optional[FileHash]] = {}
+        for path, signature, digest in results:
+            if signature is None:
+                changed_files[path] = None
+                continue
+
+            if digest is None:
+                self.stat_hits += 1
+                continue
+
+            self.content_hashes += 1
+            if self.has_changed(path, digest):
+                changed_files[path] = FileHash(digest, signature)
+                continue
+
+            # Remember new stat signature so the file won't be read next time
+            self.update_hash(path, digest, signature)
+
+        return changed_files
+
+    def get_section_hashes(self, filepath: str) -> Set[str]:
+        """Get hashes of sections of the file at the time of the last sync"""
+        return self._store.get_section_digests(filepath)
+
+    def update_section_hashes(self, filepath: str, sections: Iterable[str]) -> None:
+        """Replace hashes of sections of the file. Committed together with file hash."""
+        self._store.update_section_digests(
+            filepath, {self.hash_text(section) for section in sections}
+        )
+
+    def get_note_fingerprints(self, anki_ids: Iterable[int]) -> Dict[int, str]:
+        """Get fingerprints of notes at the time of the last sync"""
+        return self._store.get_note_fingerprints(anki_ids)
+
+    def update_note_fingerprint(
+        self, anki_id: int, filepath: str, fingerprint: str
+    ) -> None:
+        """Save fingerprint of the note synced with Anki. Committed together with file hash."""
+        self._store.update_note_fingerprint(anki_id, filepath, fingerprint)
+
+    def hash_text(self, text: str) -> str:
+        """Calculate hash of the text"""
+        return hash_text(text, self._algorithm)
+
+    def read_document(self, filepath: str) -> Document:
+        """Read the file into a document which is hashed with this hasher's algorithm"""
+        self.content_hashes += 1
+        return Document.load(filepath, self._algorithm)
+
+    def hash_file(self, filepath: str, algorithm: Optional[str] = None) -> str:
+        """Calculate hash for the file and count it in the statistics"""
+        self.content_hashes += 1
+        return self.calculate_hash(filepath, algorithm or self._algorithm)
+
     def reset_hashes(self) -> None:
-        """Remove all hashes from the file"""
-        self._hashes = {}
-        self._save()
+        """Remove all hashes from the database"""
+        self._store.delete_files()
+        self.flush()
+
+    def flush(self) -> None:
+        """Commit pending updates to the database"""
+        self._store.commit()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def _maybe_flush(self) -> None:
+        """Commit pending updates if there are enough of them or if they are too old"""
+        if self._pending >= self._flush_every or (
+            self._flush_interval is not None
+            and time.monotonic() - self._last_flush >= self._flush_interval
+        ):
+            self.flush()
+
+    @staticmethod
+    def _is_racy(signature: StatSignature) -> bool:
+        return time.time_ns() - signature[0] < RACY_WINDOW_NS
 
-    def _save(self) -> None:
-        with open(self._path, mode="wt", encoding="utf-8") as f:
-            json.dump(self._hashes, f)
+    @staticmethod
+    def get_stat_signature(filepath: str) -> StatSignature:
+        """Get (st_mtime_ns, st_size, st_ino) of the file"""
+        stat = os.stat(filepath)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
 
     @staticmethod
-    def calculate_hash(filepath: str) -> str:
-        """Calculate MD5 hash for the file"""
-        with open(filepath, mode="rt", encoding="utf-8") as f:
-            encoded_text = f.read().encode("utf-8")
-        return hashlib.md5(encoded_text).hexdigest()
+    def calculate_hash(filepath: str, algorithm: str = DEFAULT_HASH_ALGORITHM) -> str:
+        """Calculate hash of the file contents, reading the file in binary chunks"""
+        with open(filepath, mode="rb") as f:
+            if hasattr(hashlib, "file_digest"):  # Python 3.11+
+                return hashlib.file_digest(f, algorithm).hexdigest()
+
+            file_hash = hashlib.new(algorithm)
+            while chunk := f.read(CHUNK_SIZE):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+
+def hash_text(text: str, algorithm: str = DEFAULT_HASH_ALGORITHM) -> str:
+    """Calculate hash of the text, the same as Hasher with this algorithm calculates"""
+    return hashlib.new(algorithm, text.encode("utf-8")).hexdigest()
@@ -0,0 +1,115 @@
+import re
+from typing import Iterable, List, NamedTuple, Optional, Pattern
+
+IGNORE_FILE_NAME = ".inkaignore"
+
+
+class _Rule(NamedTuple):
+    regex: Pattern[str]
+    negated: bool
+    dir_only: bool
+
+
+class IgnoreRules:
+    """Gitignore-style patterns matched against paths relative to the folder they belong to"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._rules: List[_Rule] = [
+            rule for rule in map(self._parse, patterns) if rule is not None
+        ]
+
+    @classmethod
+    def from_file(cls, path: str) -> "IgnoreRules":
+        with open(path, mode="rt", encoding="utf-8") as f:
+            return cls(f.read().splitlines())
+
+    def __bool__(self) -> bool:
+        return bool(self._rules)
+
+    def match(self, path: str, is_dir: bool) -> Optional[bool]:
+        """Check the path relative to the folder of the rules.
+
+        Returns:
+            True if the path is matched by the last matching pattern, False if that pattern is negated,
+            None if no pattern matches.
+        """
+        for rule in reversed(self._rules):
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.fullmatch(path):
+                return not rule.negated
+        return None
+
+    def match_file(self, path: str) -> Optional[bool]:
+        """Check the path of a file relative to the folder of the rules. If no pattern matches it,
+        directories the file is in are checked from the innermost one, so patterns of directories,
+        e.g. "notes/", match files inside them.
+
+        Returns:
+            Same as match() for the file or for the innermost matched directory
+        """
+        matched = self.match(path, False)
+        directory = path
+        while matched is None and "/" in directory:
+            directory = directory.rsplit("/", 1)[0]
+            matched = self.match(directory, True)
+        return matched
+
+    @classmethod
+    def _parse(cls, pattern: str) -> Optional[_Rule]:
+        pattern = pattern.rstrip()
+        if not pattern or pattern.startswith("#"):
+            return None
+
+        negated = pattern.startswith("!")
+        if negated:
+            pattern = pattern[1:]
+        elif pattern.startswith("\\"):  # Escaped "#" or "!"
+            pattern = pattern[1:]
+
+        dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        if not pattern:
+            return None
+
+        # Patterns with a slash are relative to the folder, others match at any depth
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+        regex = cls._translate(pattern)
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+
+        return _Rule(re.compile(regex), negated, dir_only)
+
+    @staticmethod
+    def _translate(pattern: str) -> str:
+        """Translate glob pattern into regular expression"""
+        regex = []
+        i = 0
+        while i < len(pattern):
+            if pattern.startswith("**/", i):
+                regex.append("(?:.*/)?")
+                i += 3
+            elif pattern.startswith("**", i):
+                regex.append(".*")
+                i += 2
+            elif pattern[i] == "*":
+                regex.append("[^/]*")
+                i += 1
+            elif pattern[i] == "?":
+                regex.append("[^/]")
+                i += 1
+            elif pattern[i] == "[" and "]" in pattern[i + 2 :]:
+                end = pattern.index("]", i + 2)
+                chars = pattern[i + 1 : end]
+                if chars.startswith("!"):
+                    chars = "^" + chars[1:]
+                regex.append(f"[{chars}]")
+                i = end + 1
+            else:
+                regex.append(re.escape(pattern[i]))
+                i += 1
+        return "".join(regex)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(rules={len(self._rules)})"
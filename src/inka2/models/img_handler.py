@@ -1,6 +1,7 @@
 import os
 import re
-from typing import Dict, Iterable, List, Optional
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
 
 from .anki_media import AnkiMedia
 from .notes.note import Note
@@ -11,6 +12,7 @@ def handle_images_in(
     anki_media: AnkiMedia,
     copy_images: bool = True,
     force: bool = False,
+    base_dir: Optional[Union[str, Path]] = None,
 ) -> None:
     """
     Copy images used in Notes fields to Anki Media folder and change source in their
@@ -21,16 +23,43 @@ def handle_images_in(
         anki_media: AnkiMedia object that will be used to copy images
         copy_images: copy images to Anki media folder or not
         force: if True, files will be copied even if files with the same name already exists in Anki Media folder
+        base_dir: directory relative to which image paths are resolved, usually the directory of the notes file.
+            Current working directory if not passed.
+    """
+    if copy_images:
+        copy_images_in(notes, anki_media, force=force, base_dir=base_dir)
+
+    update_image_links_in(notes)
+
+
+def copy_images_in(
+    notes: List[Note],
+    anki_media: AnkiMedia,
+    force: bool = False,
+    base_dir: Optional[Union[str, Path]] = None,
+) -> None:
+    """Copy images used in Notes fields to Anki Media folder, without changing the Notes.
+
+    Args:
+        notes: Notes in which image links will be searched for
+        anki_media: AnkiMedia object that will be used to copy images
+        force: if True, files will be copied even if files with the same name already exists in Anki Media folder
+        base_dir: directory relative to which image paths are resolved (current working directory if not passed)
     """
-    # Find all unique image links in the notes
     image_links = _fetch_image_links(notes)
+    _copy_images_to(
+        anki_media, list(image_links.keys()), force=force, base_dir=base_dir
+    )
 
-    # Copy images to Anki Media folder
-    if copy_images:
-        _copy_images_to(anki_media, list(image_links.keys()), force=force)
 
-    # Update image links in notes
-    _update_image_links_in_notes(image_links)
+def update_image_links_in(notes: List[Note]) -> None:
+    """Change source in image links in Notes fields to be just filename (for Anki to find them).
+    Images aren't touched, so this can be done without access to Anki Media folder.
+
+    Args:
+        notes: Notes in which image links will be searched for and then updated
+    """
+    _update_image_links_in_notes(_fetch_image_links(notes))
 
 
 def _fetch_image_links(notes: List[Note]) -> Dict[str, List[Note]]:
@@ -78,19 +107,23 @@ def _update_image_links_in_notes(image_links: Dict[str, List[Note]]) -> None:
 
 
 def _copy_images_to(
-    anki_media: AnkiMedia, image_links: Iterable[str], force: bool = False
+    anki_media: AnkiMedia,
+    image_links: Iterable[str],
+    force: bool = False,
+    base_dir: Optional[Union[str, Path]] = None,
 ) -> None:
     """Copy images to Anki Media folder.
 
     Args:
         anki_media: AnkiMedia object that will be used to copy images
         image_links: list of markdown links to images
+        base_dir: directory relative to which image paths are resolved
     Raises:
         FileNotFoundError: if path to image in markdown link is incorrect
         FileExistsError: if different file with the same name already exists in Anki Media folder
     """
     for link in image_links:
-        abs_path = _get_abs_path_from(link)
+        abs_path = _get_abs_path_from(link, base_dir)
         if not abs_path:
             continue
 
@@ -117,11 +150,14 @@ def _get_path_from(image_link: str) -> Optional[str]:
     return match.group(0)
 
 
-def _get_abs_path_from(image_link: str) -> Optional[str]:
+def _get_abs_path_from(
+    image_link: str, base_dir: Optional[Union[str, Path]] = None
+) -> Optional[str]:
     """Get absolute path to image from markdown's image link
 
     Args:
         image_link: markdown image link
+        base_dir: directory relative to which the path is resolved (current working directory if not passed)
     Returns:
         String with the absolute path to image
     """
@@ -129,6 +165,8 @@ def _get_abs_path_from(image_link: str) -> Optional[str]:
     if not path:
         return None
 
+    if base_dir is not None:
+        path = os.path.join(base_dir, path)
     return os.path.realpath(path)
 
 
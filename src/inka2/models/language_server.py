@@ -0,0 +1,210 @@
+import json
+import logging
+from typing import Any, BinaryIO, Callable, Dict, Optional
+
+from .. import __version__
+from .live_document import LiveDocument
+
+log = logging.getLogger(__name__)
+
+# Error codes of JSON-RPC and of the Language Server Protocol
+PARSE_ERROR = -32700
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+SERVER_NOT_INITIALIZED = -32002
+# Documents are synced by sending ranges of changed text
+_INCREMENTAL_SYNC = 2
+_CONTENT_LENGTH = "content-length"
+
+
+class LanguageServer:
+    """Language Server Protocol server that keeps documents open in an editor tokenized
+    and publishes problems with their cards after every change"""
+
+    def __init__(self, reader: BinaryIO, writer: BinaryIO, default_deck: str):
+        """
+        Args:
+            reader: stream from which messages of the client are read, e.g. standard input
+            writer: stream to which messages to the client are written, e.g. standard output
+            default_deck: deck of sections without "Deck:" line, none if empty
+        """
+        self._reader = reader
+        self._writer = writer
+        self._default_deck = default_deck
+        self._documents: Dict[str, LiveDocument] = {}
+        self._initialized = False
+        self._shut_down = False
+        self._handlers: Dict[str, Callable[[dict], Any]] = {
+            "initialize": self._initialize,
+            "shutdown": self._shutdown,
+            "textDocument/didOpen": self._did_open,
+            "textDocument/didChange": self._did_change,
+            "textDocument/didClose": self._did_close,
+        }
+
+    def run(self) -> int:
+        """Handle messages until the client asks the server to exit.
+
+        Returns:
+            Exit code: 0 if the server was shut down before exiting, 1 otherwise
+        """
+        while True:
+            try:
+                message = self._read_message()
+            except ValueError as e:
+                self._send_error(None, PARSE_ERROR, str(e))
+                continue
+            if message is None:
+                log.debug("Client closed the stream without exiting")
+                return 1
+            if message.get("method") == "exit":
+                return 0 if self._shut_down else 1
+            self._handle(message)
+
+    def _handle(self, message: dict) -> None:
+        """Call the handler of the request or notification and send the result of the request"""
+        method = message.get("method")
+        if method is None:
+            # Responses to requests of the server, which makes none
+            return
+        is_request = "id" in message
+        if not self._initialized and method != "initialize":
+            if is_request:
+                self._send_error(
+                    message["id"], SERVER_NOT_INITIALIZED, "server isn't initialized"
+                )
+            return
+        handler = self._handlers.get(method)
+        if handler is None:
+            # Notifications that aren't handled, e.g. "initialized", are ignored
+            if is_request:
+                self._send_error(
+                    message["id"], METHOD_NOT_FOUND, f"unknown method {method}"
+                )
+            return
+
+        try:
+            result = handler(message.get("params") or {})
+        except Exception as e:
+            log.exception(f"Failed to handle {method}")
+            if is_request:
+                self._send_error(message["id"], INTERNAL_ERROR, str(e))
+            return
+        if is_request:
+            self._send({"jsonrpc": "2.0", "id": message["id"], "result": result})
+
+    def _initialize(self, params: dict) -> dict:
+        self._initialized = True
+        return {
+            "capabilities": {
+                "textDocumentSync": {"openClose": True, "change": _INCREMENTAL_SYNC}
+            },
+            "serverInfo": {"name": "inka2", "version": __version__},
+        }
+
+    def _shutdown(self, params: dict) -> None:
+        self._shut_down = True
+        self._documents.clear()
+
+    def _did_open(self, params: dict) -> None:
+        text_document = params["textDocument"]
+        document = LiveDocument(text_document["text"], self._default_deck)
+        self._documents[text_document["uri"]] = document
+        self._publish_diagnostics(
+            text_document["uri"], document, text_document.get("version")
+        )
+
+    def _did_change(self, params: dict) -> None:
+        text_document = params["textDocument"]
+        uri = text_document["uri"]
+        document = self._documents[uri]
+        for change in params["contentChanges"]:
+            if "range" in change:
+                start, end = change["range"]["start"], change["range"]["end"]
+                document.edit(
+                    document.get_offset(start["line"], start["character"]),
+                    document.get_offset(end["line"], end["character"]),
+                    change["text"],
+                )
+            else:
+                document = LiveDocument(change["text"], self._default_deck)
+        self._documents[uri] = document
+        self._publish_diagnostics(uri, document, text_document.get("version"))
+
+    def _did_close(self, params: dict) -> None:
+        uri = params["textDocument"]["uri"]
+        self._documents.pop(uri, None)
+        # Problems of closed documents are cleared in the editor
+        self._send_notification(
+            "textDocument/publishDiagnostics", {"uri": uri, "diagnostics": []}
+        )
+
+    def _publish_diagnostics(
+        self, uri: str, document: LiveDocument, version: Optional[int]
+    ) -> None:
+        diagnostics = []
+        for diagnostic in document.get_diagnostics():
+            start_line, start_character = document.get_position(diagnostic.start)
+            end_line, end_character = document.get_position(diagnostic.end)
+            diagnostics.append(
+                {
+                    "range": {
+                        "start": {"line": start_line, "character": start_character},
+                        "end": {"line": end_line, "character": end_character},
+                    },
+                    "severity": diagnostic.severity,
+                    "source": "inka2",
+                    "message": diagnostic.message,
+                }
+            )
+        params: Dict[str, Any] = {"uri": uri, "diagnostics": diagnostics}
+        if version is not None:
+            params["version"] = version
+        self._send_notification("textDocument/publishDiagnostics", params)
+
+    def _read_message(self) -> Optional[dict]:
+        """Read the next message, which is JSON content after "Content-Length" header.
+
+        Returns:
+            Message or None if the stream was closed
+        Raises:
+            ValueError: if the header or the content is incorrect
+        """
+        length = None
+        while True:
+            line = self._reader.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                break
+            name, _, value = line.decode("ascii").partition(":")
+            if name.strip().lower() == _CONTENT_LENGTH:
+                length = int(value)
+        if length is None:
+            raise ValueError("message without Content-Length header")
+
+        content = self._reader.read(length)
+        if len(content) < length:
+            return None
+        message = json.loads(content)
+        if not isinstance(message, dict):
+            raise ValueError("message isn't a JSON object")
+        return message
+
+    def _send_notification(self, method: str, params: dict) -> None:
+        self._send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    def _send_error(self, message_id: Any, code: int, message: str) -> None:
+        self._send(
+            {
+                "jsonrpc": "2.0",
+                "id": message_id,
+                "error": {"code": code, "message": message},
+            }
+        )
+
+    def _send(self, message: dict) -> None:
+        content = json.dumps(message, separators=(",", ":")).encode("utf-8")
+        self._writer.write(b"Content-Length: %d\r\n\r\n" % len(content) + content)
+        self._writer.flush()
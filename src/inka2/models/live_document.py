@@ -0,0 +1,404 @@
+import re
+from bisect import bisect_right
+from typing import Dict, List, NamedTuple, Set, Tuple
+
+from ..mistune_plugins.mathjax3 import BLOCK_MATH, INLINE_MATH
+from .converter import BLOCK_CODE_REGEX, INLINE_CODE_REGEX
+from .parser import Parser
+from .tokenizer import (
+    SECTION_DELIMITER,
+    NoteToken,
+    SectionToken,
+    find_sections,
+    tokenize_section,
+)
+
+# Severities of diagnostics, the same numbers as in the Language Server Protocol
+ERROR = 1
+WARNING = 2
+
+_newline_regex = re.compile(r"\r\n?")
+# Code and math are redacted in the same order as the converter does,
+# so braces in them aren't cloze deletions
+_redacted_regexes = [
+    BLOCK_CODE_REGEX,
+    INLINE_CODE_REGEX,
+    re.compile(BLOCK_MATH),
+    re.compile(INLINE_MATH),
+]
+_brace_regex = re.compile(r"[{}]")
+_empty_cloze_regex = re.compile(r"{{c\d+::}}|{c?\d+::}|{}")
+
+
+class Diagnostic(NamedTuple):
+    """Problem with cards found in the text"""
+
+    # Indexes of characters the problem is about
+    start: int
+    end: int
+    message: str
+    severity: int
+
+
+class _Section(NamedTuple):
+    """Section tokenized on its own, so indexes in the token and the diagnostics
+    are relative to the start of the section and don't change when text before it does"""
+
+    token: SectionToken
+    diagnostics: List[Diagnostic]
+    # ID, start and end of every correct ID comment
+    ids: List[Tuple[int, int, int]]
+
+
+class _Offsets:
+    """Sorted indexes of characters in the text, e.g. of line starts. Indexes after an edit
+    are moved lazily: the list keeps one pending shift of all indexes from some position on,
+    so edits close to each other update only indexes between them, not the whole list."""
+
+    def __init__(self, values: List[int]):
+        self._values = values
+        # Values from this position on must be moved by the shift
+        self._shift_from = len(values)
+        self._shift = 0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __getitem__(self, index: int) -> int:
+        if index >= self._shift_from:
+            return self._values[index] + self._shift
+        return self._values[index]
+
+    def bisect(self, value: int) -> int:
+        """Get the number of indexes that are lower than or equal to the value"""
+        position = bisect_right(self._values, value, 0, self._shift_from)
+        if position < self._shift_from:
+            return position
+        return bisect_right(self._values, value - self._shift, self._shift_from)
+
+    def replace(self, first: int, last: int, values: List[int], delta: int) -> None:
+        """Replace indexes from position first to last with new values
+        and move the indexes after them by delta"""
+        # Values between the replaced ones and the pending shift are updated,
+        # so a single shift is left, for the values after the new ones
+        shift_from, shift = self._shift_from, self._shift
+        if shift_from < first:
+            self._values[shift_from:first] = [
+                value + shift for value in self._values[shift_from:first]
+            ]
+        elif shift_from > last:
+            self._values[last:shift_from] = [
+                value - shift for value in self._values[last:shift_from]
+            ]
+        self._values[first:last] = values
+        self._shift_from = first + len(values)
+        self._shift = shift + delta
+
+
+class LiveDocument:
+    """Text of a file open in an editor, kept tokenized while it is being edited.
+    Edits tokenize again only the sections whose contents they changed."""
+
+    def __init__(self, text: str, default_deck: str):
+        """
+        Args:
+            text: contents of the file
+            default_deck: deck of sections without "Deck:" line, none if empty
+        """
+        self._default_deck = default_deck
+        self._text = ""
+        self._line_starts = _Offsets([0])
+        self._sections: List[_Section] = []
+        self._section_starts = _Offsets([])
+        # Number of ID comments with each ID and IDs that are used more than once
+        self._id_counts: Dict[int, int] = {}
+        self._duplicate_ids: Set[int] = set()
+        # Number of sections tokenized by the last edit
+        self.tokenized_sections = 0
+        self.edit(0, 0, text)
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def edit(self, start: int, end: int, text: str) -> None:
+        """Replace characters from start to end with the text"""
+        text = _newline_regex.sub("\n", text)
+        delta = len(text) - (end - start)
+        self._text = self._text[:start] + text + self._text[end:]
+        self._update_line_starts(start, end, text)
+
+        # Sections are kept up to the last one whose closing delimiter line, with the newline
+        # after it, is before the edit. Delimiters are searched from there, so "---" lines
+        # added or removed by the edit split or join the sections around it.
+        first = self._section_starts.bisect(start)
+        while (
+            first > 0
+            and self._get_section_end(first - 1) + len(SECTION_DELIMITER) >= start
+        ):
+            first -= 1
+        position = (
+            self._get_section_end(first - 1) + len(SECTION_DELIMITER)
+            if first > 0
+            else 0
+        )
+
+        # The search stops at the first section that is the same as before the edit,
+        # everything after it is the same too
+        last = self._section_starts.bisect(end - 1)
+        sections: List[_Section] = []
+        starts: List[int] = []
+        for section_start, section_end in find_sections(self._text, position):
+            while (
+                last < len(self._sections)
+                and self._section_starts[last] + delta < section_start
+            ):
+                last += 1
+            if (
+                last < len(self._sections)
+                and self._section_starts[last] + delta == section_start
+                and self._get_section_end(last) + delta == section_end
+            ):
+                break
+            sections.append(self._tokenize(section_start, section_end))
+            starts.append(section_start)
+        else:
+            last = len(self._sections)
+
+        for section in self._sections[first:last]:
+            self._count_ids(section, -1)
+        for section in sections:
+            self._count_ids(section, 1)
+        self._sections[first:last] = sections
+        self._section_starts.replace(first, last, starts, delta)
+        self.tokenized_sections = len(sections)
+
+    def get_offset(self, line: int, character: int) -> int:
+        """Get the index of the character in the text from its position in the editor
+
+        Args:
+            line: number of the line counted from 0
+            character: UTF-16 code units before the character in its line
+        """
+        if line >= len(self._line_starts):
+            return len(self._text)
+        line_start = self._line_starts[line]
+        line_end = (
+            self._line_starts[line + 1] - 1
+            if line + 1 < len(self._line_starts)
+            else len(self._text)
+        )
+        text = self._text[line_start:line_end]
+        if not text.isascii():
+            encoded = text.encode("utf-16-le")[: character * 2]
+            character = len(encoded.decode("utf-16-le", errors="ignore"))
+        return line_start + min(character, len(text))
+
+    def get_position(self, offset: int) -> Tuple[int, int]:
+        """Get line and UTF-16 character in the editor, both counted from 0,
+        from the index of the character in the text"""
+        line = self._line_starts.bisect(offset) - 1
+        text = self._text[self._line_starts[line] : offset]
+        if text.isascii():
+            return line, len(text)
+        return line, len(text.encode("utf-16-le")) // 2
+
+    def get_diagnostics(self) -> List[Diagnostic]:
+        """Get problems with cards of the whole text: notes the parser skips,
+        incorrect clozes, IDs used by more than one note and incorrect section fields"""
+        diagnostics: List[Diagnostic] = []
+        # Start and end of every ID comment with an ID that is used more than once
+        duplicates: Dict[int, List[Tuple[int, int]]] = {}
+        for index, section in enumerate(self._sections):
+            if not section.diagnostics and not (self._duplicate_ids and section.ids):
+                continue
+            section_start = self._section_starts[index]
+            for diagnostic in section.diagnostics:
+                diagnostics.append(
+                    diagnostic._replace(
+                        start=diagnostic.start + section_start,
+                        end=diagnostic.end + section_start,
+                    )
+                )
+            for anki_id, id_start, id_end in section.ids:
+                if anki_id in self._duplicate_ids:
+                    duplicates.setdefault(anki_id, []).append(
+                        (id_start + section_start, id_end + section_start)
+                    )
+
+        for anki_id, comments in duplicates.items():
+            for start, end in comments:
+                other_lines = ", ".join(
+                    str(self.get_position(other)[0] + 1)
+                    for other, _ in comments
+                    if other != start
+                )
+                message = f"duplicate ID {anki_id}, also used on line {other_lines}"
+                diagnostics.append(Diagnostic(start, end, message, ERROR))
+        diagnostics.sort()
+        return diagnostics
+
+    def _get_section_end(self, index: int) -> int:
+        return self._section_starts[index] + len(self._sections[index].token.text)
+
+    def _update_line_starts(self, start: int, end: int, text: str) -> None:
+        """Update indexes of the line starts after characters from start to end
+        were replaced with the text"""
+        # Lines starting inside the replaced characters are gone, those after them move
+        first = self._line_starts.bisect(start)
+        last = self._line_starts.bisect(end)
+        added = [start + match.end() for match in re.finditer("\n", text)]
+        self._line_starts.replace(first, last, added, len(text) - (end - start))
+
+    def _count_ids(self, section: _Section, change: int) -> None:
+        """Add change to the counts of IDs of the section, e.g. -1 when it is removed"""
+        for anki_id, _, _ in section.ids:
+            count = self._id_counts.get(anki_id, 0) + change
+            if count > 0:
+                self._id_counts[anki_id] = count
+            else:
+                del self._id_counts[anki_id]
+            if count > 1:
+                self._duplicate_ids.add(anki_id)
+            else:
+                self._duplicate_ids.discard(anki_id)
+
+    def _tokenize(self, start: int, end: int) -> _Section:
+        """Tokenize the section text[start:end] and find its problems"""
+        token = tokenize_section(self._text[start:end])
+        diagnostics = self._check_fields(token)
+        ids: List[Tuple[int, int, int]] = []
+        for note in token.notes:
+            diagnostics.extend(_check_note(note))
+            if note.raw_id is not None:
+                anki_id = Parser._parse_id(note.raw_id)
+                if anki_id is not None:
+                    ids.append((anki_id, note.span.id_start, note.span.id_end))
+        return _Section(token, diagnostics, ids)
+
+    def _check_fields(self, token: SectionToken) -> List[Diagnostic]:
+        """Find problems with "Deck:" and "Tags:" lines that stop the section from being parsed"""
+        first_line = token.text.find("\n")
+        if first_line < 0:
+            first_line = len(token.text)
+        messages = []
+        if not token.deck_names and not self._default_deck:
+            messages.append("couldn't find deck name in section")
+        elif len(token.deck_names) > 1:
+            messages.append("more than one deck name field in section")
+        elif token.deck_names and not token.deck_names[0].strip():
+            messages.append("empty deck name field in section")
+        if len(token.tags) > 1:
+            messages.append("more than one tag field in section")
+        return [Diagnostic(0, first_line, message, ERROR) for message in messages]
+
+
+def _check_note(note: NoteToken) -> List[Diagnostic]:
+    """Find reasons for which the note is skipped or its cloze deletions are incorrect"""
+    span = note.span
+    diagnostics = []
+    if note.raw_id is not None and Parser._parse_id(note.raw_id) is None:
+        diagnostics.append(
+            Diagnostic(span.id_start, span.id_end, "incorrect ID", WARNING)
+        )
+
+    # Skipped notes are reported on their "1." line
+    body_start = span.id_end + 1 if span.id_start >= 0 else span.start
+    body_end = note.text.find("\n", body_start - span.start)
+    body_end = span.start + body_end if body_end >= 0 else span.end
+    if note.answer is not None:
+        if not Parser._get_token_question(note):
+            diagnostics.append(
+                Diagnostic(
+                    body_start, body_end, "empty question, card is skipped", WARNING
+                )
+            )
+        elif not Parser._clean_answer(note.answer):
+            diagnostics.append(
+                Diagnostic(
+                    span.answer_start,
+                    span.answer_end,
+                    "empty answer, card is skipped",
+                    WARNING,
+                )
+            )
+    elif note.question is None or not note.question.strip():
+        diagnostics.append(
+            Diagnostic(body_start, body_end, "empty question, card is skipped", WARNING)
+        )
+    elif "{" not in note.question:
+        diagnostics.append(
+            Diagnostic(
+                body_start,
+                body_end,
+                "card has neither an answer nor cloze deletions and is skipped",
+                WARNING,
+            )
+        )
+    else:
+        diagnostics.extend(
+            _check_clozes(note.question, span.question_start, note.has_braces)
+        )
+    return diagnostics
+
+
+def _check_clozes(question: str, offset: int, has_braces: bool) -> List[Diagnostic]:
+    """Find unmatched braces and empty cloze deletions outside code and math
+
+    Args:
+        question: text of the cloze note
+        offset: index of the question in the section
+        has_braces: whether the tokenizer found "{" followed by "}", i.e. the note is a cloze
+    """
+    # Redacted parts are replaced with spaces, so indexes stay the same
+    redacted = question
+    for regex in _redacted_regexes:
+        redacted = regex.sub(lambda match: " " * len(match.group()), redacted)
+
+    diagnostics = []
+    opened: List[int] = []
+    for brace in _brace_regex.finditer(redacted):
+        if brace.group() == "{":
+            opened.append(brace.start())
+        elif opened:
+            opened.pop()
+        else:
+            diagnostics.append(
+                Diagnostic(
+                    offset + brace.start(),
+                    offset + brace.end(),
+                    'unmatched "}"',
+                    ERROR,
+                )
+            )
+    for brace_start in opened:
+        diagnostics.append(
+            Diagnostic(
+                offset + brace_start,
+                offset + brace_start + 1,
+                "cloze deletion isn't closed"
+                if has_braces
+                else "cloze deletion isn't closed, card is skipped",
+                ERROR,
+            )
+        )
+    for empty in _empty_cloze_regex.finditer(redacted):
+        diagnostics.append(
+            Diagnostic(
+                offset + empty.start(),
+                offset + empty.end(),
+                "empty cloze deletion",
+                ERROR,
+            )
+        )
+    first_brace = redacted.find("{")
+    if has_braces and (first_brace < 0 or redacted.find("}", first_brace + 1) < 0):
+        diagnostics.append(
+            Diagnostic(
+                offset + len(question) - len(question.lstrip()),
+                offset + len(question.rstrip()),
+                "all cloze deletions are in code or math",
+                ERROR,
+            )
+        )
+    return diagnostics
@@ -4,12 +4,22 @@ import mistune  # type: ignore
 from rich.table import Column, Table
 
 from ..config import Config
+from ..tokenizer import NoteSpan
 from .note import Note
 
 
 class BasicNote(Note):
     """Front/Back note type"""
 
+    __slots__ = (
+        "raw_front_md",
+        "raw_back_md",
+        "updated_front_md",
+        "updated_back_md",
+        "front_html",
+        "back_html",
+    )
+
     def __init__(
         self,
         front_md: str,
@@ -17,8 +27,9 @@ class BasicNote(Note):
         tags: Iterable[str],
         deck_name: str,
         anki_id: Optional[int] = None,
+        span: Optional[NoteSpan] = None,
     ):
-        super().__init__(tags, deck_name, anki_id)
+        super().__init__(tags, deck_name, anki_id, span)
         self.raw_front_md = front_md
         self.raw_back_md = back_md
         self.updated_front_md = front_md  # With updated image links
@@ -43,6 +54,12 @@ class BasicNote(Note):
         self.updated_front_md = update_func(self.updated_front_md)
         self.updated_back_md = update_func(self.updated_back_md)
 
+    def drop_updated_fields(self) -> None:
+        """Replace *updated* fields with raw ones to free memory once html is produced.
+        Updated fields can't be used afterwards."""
+        self.updated_front_md = self.raw_front_md
+        self.updated_back_md = self.raw_back_md
+
     def get_raw_fields(self) -> List[str]:
         """Get list of all raw (as in file) fields of this note"""
         return [self.raw_front_md, self.raw_back_md]
@@ -58,6 +75,13 @@ class BasicNote(Note):
             cfg.get_option_value("anki", "back_field"): self.back_html,
         }
 
+    def get_updated_fields(self, cfg: Config) -> Dict[str, str]:
+        """Return dictionary with Anki field names as keys and *updated* markdown strings as values"""
+        return {
+            cfg.get_option_value("anki", "front_field"): self.updated_front_md,
+            cfg.get_option_value("anki", "back_field"): self.updated_back_md,
+        }
+
     @staticmethod
     def get_anki_note_type(cfg: Config) -> str:
         """Get name of Anki note type"""
@@ -4,20 +4,24 @@ import mistune  # type: ignore
 from rich.table import Column, Table
 
 from ..config import Config
+from ..tokenizer import NoteSpan
 from .note import Note
 
 
 class ClozeNote(Note):
     """Cloze note type"""
 
+    __slots__ = ("raw_text_md", "updated_text_md", "text_html")
+
     def __init__(
         self,
         text_md: str,
         tags: Iterable[str],
         deck_name: str,
         anki_id: Optional[int] = None,
+        span: Optional[NoteSpan] = None,
     ):
-        super().__init__(tags, deck_name, anki_id)
+        super().__init__(tags, deck_name, anki_id, span)
         self.raw_text_md = text_md
         self.updated_text_md = text_md  # With updated image links and cloze deletions
         self.text_html = ""
@@ -37,6 +41,11 @@ class ClozeNote(Note):
         """Updates values of *updated* fields using provided function"""
         self.updated_text_md = update_func(self.updated_text_md)
 
+    def drop_updated_fields(self) -> None:
+        """Replace *updated* fields with raw ones to free memory once html is produced.
+        Updated fields can't be used afterwards."""
+        self.updated_text_md = self.raw_text_md
+
     def get_raw_fields(self) -> List[str]:
         """Get list of all raw (as in file) fields of this note"""
         return [self.raw_text_md]
@@ -51,6 +60,12 @@ class ClozeNote(Note):
             cfg.get_option_value("anki", "cloze_field"): self.text_html,
         }
 
+    def get_updated_fields(self, cfg: Config) -> Dict[str, str]:
+        """Return dictionary with Anki field names as keys and *updated* markdown strings as values"""
+        return {
+            cfg.get_option_value("anki", "cloze_field"): self.updated_text_md,
+        }
+
     @staticmethod
     def get_anki_note_type(cfg: Config) -> str:
         """Get name of Anki note type"""
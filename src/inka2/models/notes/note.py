@@ -1,3 +1,5 @@
+import hashlib
+import json
 from abc import ABC, abstractmethod
 from typing import Any, Callable, Dict, Iterable, List, Optional
 
@@ -5,17 +7,26 @@ import mistune  # type: ignore
 from rich.table import Table
 
 from inka2.models.config import Config
+from inka2.models.tokenizer import NoteSpan
 
 
 class Note(ABC):
-    """Base class for all other note types"""
+    """Base class for all other note types. Notes are slotted,
+    as a run can keep hundreds of thousands of them in memory."""
+
+    __slots__ = ("tags", "deck_name", "anki_id", "span", "changed", "to_delete")
 
     def __init__(
-        self, tags: Iterable[str], deck_name: str, anki_id: Optional[int] = None
+        self,
+        tags: Iterable[str],
+        deck_name: str,
+        anki_id: Optional[int] = None,
+        span: Optional[NoteSpan] = None,
     ):
         self.tags = tags
         self.deck_name = deck_name
         self.anki_id = anki_id
+        self.span = span  # Location in the file the note was parsed from
         self.changed = False  # Card was marked as changed in Anki
         self.to_delete = False  # Card was marked to be deleted in Anki
 
@@ -37,6 +48,12 @@ class Note(ABC):
         """Updates values of *updated* fields using provided function"""
         pass
 
+    @abstractmethod
+    def drop_updated_fields(self) -> None:
+        """Replace *updated* fields with raw ones to free memory once html is produced.
+        Updated fields can't be used afterwards."""
+        pass
+
     @abstractmethod
     def get_raw_fields(self) -> List[str]:
         """Get list of all raw (as in file) fields of this note"""
@@ -52,12 +69,31 @@ class Note(ABC):
         """Return dictionary with Anki field names as keys and html strings as values"""
         pass
 
+    @abstractmethod
+    def get_updated_fields(self, cfg: Config) -> Dict[str, str]:
+        """Return dictionary with Anki field names as keys and *updated* markdown strings as values"""
+        pass
+
     @staticmethod
     @abstractmethod
     def get_anki_note_type(cfg: Config) -> str:
         """Get name of Anki note type"""
         pass
 
+    def get_fingerprint(self, cfg: Config) -> str:
+        """Digest of everything that defines the note in Anki: note type, fields, tags and deck.
+        Rendered html is fully determined by updated markdown fields and html escaping option."""
+        data = json.dumps(
+            [
+                self.get_anki_note_type(cfg),
+                self.get_updated_fields(cfg),
+                list(self.tags),
+                self.deck_name,
+                cfg.get_option_value_or_default("defaults", "escape_html", "False"),
+            ]
+        )
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
     @staticmethod
     def create_anki_search_query(text: str) -> str:
         """Create Anki search query from the supplied text"""
@@ -79,4 +115,6 @@ class Note(ABC):
         if not isinstance(other, self.__class__):
             return False
 
-        return self.tags == other.tags and self.deck_name == other.deck_name
+        return (
+            tuple(self.tags) == tuple(other.tags) and self.deck_name == other.deck_name
+        )
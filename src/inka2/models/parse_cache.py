@@ -0,0 +1,104 @@
+import hashlib
+import json
+import sys
+import zlib
+from pathlib import Path
+from typing import List, Optional, Union
+
+from ..helpers import parse_str_to_bool
+from .config import Config
+from .document import Document
+from .notes.basic_note import BasicNote
+from .notes.cloze_note import ClozeNote
+from .notes.note import Note
+from .parser import PARSER_VERSION, intern_tags
+from .state_store import StateStore
+from .tokenizer import NoteSpan
+
+BASIC_NOTE = "basic"
+CLOZE_NOTE = "cloze"
+
+
+class ParseCache:
+    """Class for keeping notes parsed from files in the state database, so the same
+    contents aren't parsed again. Notes are stored under the digest of the contents
+    together with everything else they depend on."""
+
+    def __init__(self, store: StateStore, config: Config, max_size: int):
+        """
+        Args:
+            store: state database in which notes are kept
+            config: config whose options are used by the parser
+            max_size: max number of bytes all stored notes take, the least recently used
+                are removed when it is exceeded
+        """
+        self._store = store
+        self._config = config
+        self._max_size = max_size
+
+    def get_key(
+        self, file_path: Union[str, Path], default_deck: str, document: Document
+    ) -> str:
+        """Get the key of the document's notes: digest of its contents, version of the parser
+        and options that change notes. Path of the file is a part of notes only with filenames."""
+        add_filename = parse_str_to_bool(
+            self._config.get_option_value("defaults", "add_filename")
+        )
+        data = json.dumps(
+            [
+                document.digest,
+                PARSER_VERSION,
+                default_deck,
+                str(file_path) if add_filename else None,
+            ]
+        )
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get_notes(self, key: str) -> Optional[List[Note]]:
+        """Get notes stored under the key or None if they weren't stored"""
+        data = self._store.get_parsed_notes(key)
+        return load_notes(data) if data is not None else None
+
+    def update_notes(self, key: str, notes: Union[List[Note], bytes]) -> None:
+        """Store all notes parsed from the document, or notes already serialized
+        with dump_notes(). Committed together with file hashes."""
+        data = notes if isinstance(notes, bytes) else dump_notes(notes)
+        self._store.update_parsed_notes(key, data, self._max_size)
+
+
+def dump_notes(notes: List[Note]) -> bytes:
+    """Serialize notes into the compact form in which they are cached"""
+    data = json.dumps([_dump_note(note) for note in notes])
+    return zlib.compress(data.encode("utf-8"))
+
+
+def load_notes(data: bytes) -> Optional[List[Note]]:
+    """Create notes serialized with dump_notes(). Returns None if the data is damaged."""
+    try:
+        entries = json.loads(zlib.decompress(data))
+    except (zlib.error, ValueError):
+        return None
+    return [_load_note(entry) for entry in entries]
+
+
+def _dump_note(note: Note) -> list:
+    """Get a list with the note type, raw fields, tags, deck, ID and span of the note"""
+    note_type = CLOZE_NOTE if isinstance(note, ClozeNote) else BASIC_NOTE
+    return [
+        note_type,
+        note.get_raw_fields(),
+        list(note.tags),
+        note.deck_name,
+        note.anki_id,
+        list(note.span) if note.span else None,
+    ]
+
+
+def _load_note(entry: list) -> Note:
+    """Create the note from the list made by _dump_note()"""
+    note_type, fields, tags, deck_name, anki_id, span = entry
+    tags, deck_name = intern_tags(tags), sys.intern(deck_name)
+    span = NoteSpan(*span) if span else None
+    if note_type == CLOZE_NOTE:
+        return ClozeNote(fields[0], tags, deck_name, anki_id, span)
+    return BasicNote(fields[0], fields[1], tags, deck_name, anki_id, span)
@@ -1,49 +1,56 @@
+import mmap
+import os
 import re
+import sys
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from ..helpers import parse_str_to_bool
 from ..mistune_plugins.mathjax3 import BLOCK_MATH
 from .config import Config
+from .document import Document, decode_text
 from .notes.basic_note import BasicNote
 from .notes.cloze_note import ClozeNote
 from .notes.note import Note
+from .tokenizer import (
+    NoteSpan,
+    NoteToken,
+    SectionToken,
+    count_text,
+    find_byte_sections,
+    tokenize_notes,
+    tokenize_section,
+    tokenize_sections,
+)
+
+# Increased whenever the same text gives different notes, so notes cached by previous versions
+# aren't used
+PARSER_VERSION = 1
+
+# Tags of parsed sections, so notes with the same tags share a single tuple.
+# Cleared when it gets this large, so long-running watch and serve don't keep
+# tags of notes that are gone.
+MAX_INTERNED_TAGS = 10000
+_interned_tags: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def intern_tags(tags: Iterable[str]) -> Tuple[str, ...]:
+    """Get the shared tuple of these tags"""
+    key = tuple(map(sys.intern, tags))
+    if key not in _interned_tags and len(_interned_tags) >= MAX_INTERNED_TAGS:
+        # Notes keep their tuples, only tags parsed later aren't shared with them
+        _interned_tags.clear()
+    return _interned_tags.setdefault(key, key)
 
 
 class Parser:
     """Class for getting notes and various information about them from the text file"""
 
-    _section_regex = re.compile(
-        r"^---\n" r"(.+?)" r"^---$",  # start of section  # contents  # end of section
-        re.MULTILINE | re.DOTALL,
-    )
-    _deck_name_regex = re.compile(r"(?<=^Deck:)(.*?)$", re.MULTILINE)
-    _tags_regex = re.compile(r"(?<=^Tags:)(.*?)$", re.MULTILINE)
-    _all_notes_regex = re.compile(
-        r"(?:^<!--ID:\S+-->\n)?"  # optional ID
-        r"^\d+\.[\s\S]*?"  # card contents (optionally contains answer)
-        r"(?=<!--ID:\S+-->|^\d+\.|\Z|^---$)",  # card ends before ID, start of next card, end of string, end of section
-        re.MULTILINE,
-    )
-    _basic_note_regex = re.compile(
-        r"(?:^<!--ID:\S+-->\n)?"
-        r"^\d+\.[\s\S]+?"
-        r"(?:^>.*?(?:\n|$))+",  # optional ID  # card question  # card answer
-        re.MULTILINE,
-    )
-    _cloze_note_regex = re.compile(
-        r"(?:^<!--ID:\S+-->\n)?"  # optional ID
-        r"^\d+\.[\s\S]*?{[\s\S]*?}[\s\S]*?"  # contents that must have '{' and '}' symbols
-        r"(?=<!--ID:\S+-->|^\d+\.|\Z|^---$)",  # card ends before ID, start of next card, end of string, end of section
-        re.MULTILINE,
-    )
+    # Patterns have no repetitions that can overlap, so searching with them takes linear time.
+    # Notes are found by the tokenizer, which is linear as well.
+    _note_start_regex = re.compile(r"^\d+\.", re.MULTILINE)
+    _answer_start_regex = re.compile(r"^>", re.MULTILINE)
     _id_regex = re.compile(r"^<!--ID:(\S+)-->$", re.MULTILINE)
-    _question_regex = re.compile(
-        r"^\d+\."
-        r"([\s\S]+?)"
-        r"(?=^>|\Z)",  # question start  # contents  # answer start or end of string
-        re.MULTILINE,
-    )
     _answer_regex = re.compile(r"(?:^>.*?(?:\n|$))+", re.MULTILINE)
 
     def __init__(
@@ -56,120 +63,237 @@ class Parser:
         self._file_path = file_path
         self._default_deck = default_deck
 
-    def collect_notes(self) -> List[Note]:
-        """Get all notes from the file which path was passed to the Parser"""
-        with open(self._file_path, mode="rt", encoding="utf-8") as f:
-            file_string = f.read()
-
-        question_sections = self._get_sections(file_string)
+    def collect_notes(
+        self,
+        section_filter: Optional[Callable[[str], bool]] = None,
+        document: Optional[Document] = None,
+    ) -> List[Note]:
+        """Get all notes from the file which path was passed to the Parser
+
+        Args:
+            section_filter: if passed, only sections for which it returns True are parsed
+            document: already read contents of the file. If not passed, the file is read.
+        """
+        if document:
+            file_string = document.text
+        else:
+            with open(self._file_path, mode="rt", encoding="utf-8") as f:
+                file_string = f.read()
+
+        # Notes of skipped sections aren't searched for
+        sections = tokenize_sections(file_string, with_notes=section_filter is None)
 
         notes = []
-        for section in question_sections:
+        for section in sections:
+            if section_filter:
+                if not section_filter(section.text):
+                    continue
+                section = tokenize_section(
+                    file_string, section.start, section.end, section.line
+                )
             notes.extend(self._get_notes_from_section(section))
 
         return notes
 
-    def _get_notes_from_section(self, section: str) -> List[Note]:
-        """Get all Notes from the section string"""
-        tags = self._get_tags(section)
-        deck_name = self._get_deck_name(section)
-
-        note_strings = self.get_note_strings(section)
+    def iter_notes(
+        self, section_filter: Optional[Callable[[str], bool]] = None
+    ) -> Iterator[Note]:
+        """Lazily get notes from the file which path was passed to the Parser, section by section.
+        The file is memory-mapped and only the current section is decoded, so memory
+        doesn't grow with the size of the file. Notes are the same as from collect_notes().
+        `inka2 collect` doesn't use it: writing IDs and cloze deletions back to the file and
+        hashing its sections need the whole text, so collect reads it with collect_notes().
+
+        Args:
+            section_filter: if passed, only sections for which it returns True are parsed
+        """
+        with open(self._file_path, mode="rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return  # Empty file can't be mapped
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                # End of the previous section in data and its index and line in the text
+                position, offset, line = 0, 0, 1
+                for start, end in find_byte_sections(data):
+                    characters, newlines = count_text(data, position, start)
+                    offset += characters
+                    line += newlines
+                    text = decode_text(data[start:end])
+                    position = end
+
+                    if section_filter is None or section_filter(text):
+                        section = tokenize_section(text, line=line)
+                        for note in self._get_notes_from_section(section):
+                            # Spans point into the whole text, not into the section
+                            if note.span is not None:
+                                note.span = note.span.shift(0, offset)
+                            yield note
+
+                    offset += len(text)
+                    line += text.count("\n")
+
+    def _get_notes_from_section(self, section: Union[str, SectionToken]) -> List[Note]:
+        """Get all Notes from the section string or from the already tokenized section"""
+        if isinstance(section, str):
+            section = tokenize_section(section)
+        # All notes of the section share the same tags and deck name objects
+        tags = intern_tags(self._get_tags(section))
+        deck_name = sys.intern(self._get_deck_name(section))
+        # Option is read once for the section, not for every note
+        add_filename = parse_str_to_bool(
+            self._config.get_option_value("defaults", "add_filename")
+        )
 
         # Create note objects
         notes: List[Note] = []
-        for string in note_strings:
-            anki_id = self.get_id(string)
+        for token in section.notes:
+            anki_id = self._parse_id(token.raw_id)
 
-            # we check in this order because is_cloze_note_str can match front/back note if it contains curly braces
-            if self._is_basic_note_str(string):
-                question = self.get_question(string)
-                answer = self._get_cleaned_answer(string)
+            # we check in this order because front/back notes can contain curly braces too
+            if token.answer is not None:
+                question = self._get_token_question(token)
+                answer = self._clean_answer(token.answer)
                 if not question or not answer:
                     continue
 
                 notes.append(
                     BasicNote(
                         front_md=question,
-                        back_md=self._add_filename_to_text(answer),
+                        back_md=self._add_filename_to_text(answer, add_filename),
                         tags=tags,
                         deck_name=deck_name,
                         anki_id=anki_id,
+                        span=self._get_token_span(token),
                     )
                 )
-            elif self._is_cloze_note_str(string):
-                text = self.get_question(string)
+            elif token.has_braces:
+                text = self._get_token_question(token)
                 if not text:
                     continue
 
                 notes.append(
                     ClozeNote(
-                        text_md=self._add_filename_to_text(text),
+                        text_md=self._add_filename_to_text(text, add_filename),
                         tags=tags,
                         deck_name=deck_name,
                         anki_id=anki_id,
+                        span=self._get_token_span(token),
                     )
                 )
         return notes
 
     # wrapper to add string to end of text
-    def _add_filename_to_text(self, text: str) -> str:
-        """Add filename to the end of the text"""
+    def _add_filename_to_text(self, text: str, add_filename: bool) -> str:
+        """Add filename to the end of the text if add_filename option is set"""
+        if not add_filename:
+            return text
         path_string = (
             f"""<span style="font-size: 9pt;">File: {self._file_path}</span>"""
         )
-        if not parse_str_to_bool(
-            self._config.get_option_value("defaults", "add_filename")
-        ):
-            return text
         return f"{text}\n\n{path_string}"
 
-    def _get_deck_name(self, section: str) -> str:
+    def _get_location(self, section: SectionToken) -> str:
+        """Get "file:line" of the start of the section for error messages"""
+        return f"{self._file_path}:{section.line}"
+
+    def _get_deck_name(self, section: Union[str, SectionToken]) -> str:
         """Get deck name specified for this section"""
-        matches = re.findall(Parser._deck_name_regex, section)
+        if isinstance(section, str):
+            section = tokenize_section(section)
+        matches = section.deck_names
 
         # If no deck name
         if not matches:
             if not self._default_deck:
-                raise ValueError(f"couldn't find deck name in section:\n{section}")
+                raise ValueError(
+                    f"{self._get_location(section)}: "
+                    f"couldn't find deck name in section:\n{section.text}"
+                )
 
             return self._default_deck
 
         if len(matches) > 1:
-            raise ValueError(f"more than one deck name field in section:\n{section}")
+            raise ValueError(
+                f"{self._get_location(section)}: "
+                f"more than one deck name field in section:\n{section.text}"
+            )
 
         deck_name = matches[0].strip()
         if not deck_name:
-            raise ValueError(f"empty deck name field in section:\n{section}")
+            raise ValueError(
+                f"{self._get_location(section)}: "
+                f"empty deck name field in section:\n{section.text}"
+            )
 
         return deck_name
 
+    @classmethod
+    def get_sections(cls, file_contents: str) -> List[str]:
+        """Get all sections (groups of notes) from the file string"""
+        return [
+            section.text
+            for section in tokenize_sections(file_contents, with_notes=False)
+        ]
+
     @classmethod
     def get_note_strings(cls, section: str) -> List[str]:
         """Get all strings of notes from section"""
-        return re.findall(cls._all_notes_regex, section)
+        return [note.text for note in tokenize_notes(section)]
 
     @classmethod
     def get_id(cls, text: str) -> Optional[int]:
         """Get note's ID from text. Returns None if id wasn't found or if it is incorrect."""
         id_match = re.search(cls._id_regex, text)
         if id_match:
-            try:
-                return int(id_match.group(1))
-            except ValueError:
-                return None
+            return cls._parse_id(id_match.group(1))
 
         return None
 
+    @classmethod
+    def get_ids(cls, text: str) -> List[int]:
+        """Get IDs from all ID lines of the text, including lines that don't belong to notes"""
+        ids = (cls._parse_id(match.group(1)) for match in cls._id_regex.finditer(text))
+        return [anki_id for anki_id in ids if anki_id is not None]
+
+    @staticmethod
+    def _parse_id(raw_id: Optional[str]) -> Optional[int]:
+        """Get note's ID from the contents of ID comment. Returns None if it is incorrect."""
+        if raw_id is None:
+            return None
+        try:
+            return int(raw_id)
+        except ValueError:
+            return None
+
     @classmethod
     def get_question(cls, text: str) -> Optional[str]:
         """Get clean question string from text
         (without digit followed by period and trailing whitespace)"""
-        question_match = re.search(cls._question_regex, text)
-        if question_match:
-            return question_match.group(1).strip()
+        # Question is everything from the first "1." up to a line starting with ">"
+        note_start = cls._note_start_regex.search(text)
+        if not note_start or note_start.end() == len(text):
+            return None
 
-        return None
+        answer_start = cls._answer_start_regex.search(text, note_start.end())
+        question_end = answer_start.start() if answer_start else len(text)
+        return text[note_start.end() : question_end].strip()
+
+    @staticmethod
+    def _get_token_question(token: NoteToken) -> Optional[str]:
+        """Get clean question string from the note, same as get_question() of its text"""
+        return token.question.strip() if token.question is not None else None
+
+    @staticmethod
+    def _get_token_span(token: NoteToken) -> NoteSpan:
+        """Get location of the note in which the question is narrowed to the clean question"""
+        span, question = token.span, token.question
+        if not question:
+            return span
+        leading = len(question) - len(question.lstrip())
+        trailing = len(question) - len(question.rstrip())
+        return span._replace(
+            question_start=span.question_start + leading,
+            question_end=span.question_end - trailing,
+        )
 
     @classmethod
     def get_answer(cls, text: str) -> Optional[str]:
@@ -179,44 +303,40 @@ class Parser:
             return answer_match.group()
         return None
 
-    @classmethod
-    def _get_sections(cls, file_contents: str) -> List[str]:
-        """Get all sections (groups of notes) from the file string"""
-        return re.findall(cls._section_regex, file_contents)
-
-    @classmethod
-    def _get_tags(cls, section: str) -> List[str]:
+    def _get_tags(self, section: Union[str, SectionToken]) -> List[str]:
         """Get tags specified for this section"""
-        matches = re.findall(cls._tags_regex, section)
+        if isinstance(section, str):
+            section = tokenize_section(section)
+        matches = section.tags
         if not matches:
             return []
 
         if len(matches) > 1:
-            raise ValueError(f"more than one tag field in section:\n{section}")
+            raise ValueError(
+                f"{self._get_location(section)}: "
+                f"more than one tag field in section:\n{section.text}"
+            )
 
         tags = matches[0].strip().split()
         return tags
 
     @classmethod
     def _is_basic_note_str(cls, string: str) -> bool:
-        """Check if note string contains basic note type"""
-        match = re.search(cls._basic_note_regex, string)
-        if not match:
+        """Check if note string contains basic note type, i.e. a line starting with ">" after "1."."""
+        note_start = cls._note_start_regex.search(string)
+        if not note_start:
             return False
-        return True
+        return cls._answer_start_regex.search(string, note_start.end()) is not None
 
     @classmethod
     def _is_cloze_note_str(cls, string: str) -> bool:
-        """Check if note string contains cloze note type. Matches basic note type if it contains curly braces"""
-        match = re.search(cls._cloze_note_regex, string)
-        if not match:
+        """Check if note string contains cloze note type: "1." followed by "{" and then "}".
+        Matches basic note type if it contains curly braces"""
+        note_start = cls._note_start_regex.search(string)
+        if not note_start:
             return False
-        return True
-
-    @classmethod
-    def _get_cloze_note_strings(cls, section: str) -> List[str]:
-        """Get all strings from section with only question and an (optional) ID"""
-        return re.findall(cls._cloze_note_regex, section)
+        brace = string.find("{", note_start.end())
+        return brace >= 0 and string.find("}", brace + 1) >= 0
 
     @classmethod
     def _get_cleaned_answer(cls, text: str) -> Optional[str]:
@@ -226,6 +346,11 @@ class Parser:
         if not answer:
             return None
 
+        return cls._clean_answer(answer)
+
+    @staticmethod
+    def _clean_answer(answer: str) -> str:
+        """Remove '>' and trailing whitespace from lines of the answer"""
         lines = answer.splitlines()
         cleaned_lines = []
         # Remove '>' and whitespace after it
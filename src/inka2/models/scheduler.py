@@ -0,0 +1,102 @@
+import os
+from typing import Collection, Dict, Iterator, List, Optional, Tuple
+
+from .hasher import FileHash, StatSignature
+from .state_store import StateStore
+
+ORDER_BY_PATH = "path"
+ORDER_BY_SIZE = "size"
+ORDER_BY_MTIME = "mtime"
+ORDERS = (ORDER_BY_PATH, ORDER_BY_SIZE, ORDER_BY_MTIME)
+
+
+class Scheduler:
+    """Class for choosing the order in which files are processed"""
+
+    def __init__(self, order: str = ORDER_BY_PATH, store: Optional[StateStore] = None):
+        """
+        Args:
+            order: "path" - alphabetically, "size" - longest to process first,
+                "mtime" - most recently modified first. Ties are always ordered by path.
+            store: state database in which processing times of files are kept
+        Raises:
+            ValueError: if order is unknown
+        """
+        if order not in ORDERS:
+            raise ValueError(f'unknown order "{order}"')
+
+        self._order = order
+        self._store = store
+
+    def schedule(
+        self, files: Dict[str, Optional[FileHash]], first: Collection[str] = ()
+    ) -> List[Tuple[str, Optional[FileHash]]]:
+        """Order files and their hashes. Stat signatures from hashes are used when they are known.
+
+        Args:
+            files: files and their hashes
+            first: files that go before all others, e.g. those left by an interrupted run
+        """
+        keys: Dict[str, float]
+        if self._order == ORDER_BY_PATH:
+            keys = dict.fromkeys(files, 0.0)
+        elif self._order == ORDER_BY_MTIME:
+            keys = {
+                path: -signature[0] for path, signature in self._get_signatures(files)
+            }
+        else:
+            sizes = {
+                path: signature[1] for path, signature in self._get_signatures(files)
+            }
+            estimates = self._estimate_durations(sizes) or sizes
+            keys = {path: -estimate for path, estimate in estimates.items()}
+
+        return sorted(
+            files.items(),
+            key=lambda item: (item[0] not in first, keys[item[0]], item[0]),
+        )
+
+    def record(self, path: str, seconds: float) -> None:
+        """Remember how long the file took to process, to improve estimates of the next runs"""
+        if self._store:
+            self._store.update_file_duration(path, seconds)
+
+    def estimate(self, files: Dict[str, Optional[FileHash]]) -> Optional[float]:
+        """Estimate seconds needed to process the files.
+        Returns None if no processing times were recorded yet."""
+        estimates = self._estimate_durations(
+            {path: signature[1] for path, signature in self._get_signatures(files)}
+        )
+        return sum(estimates.values()) if estimates is not None else None
+
+    def _estimate_durations(self, sizes: Dict[str, int]) -> Optional[Dict[str, float]]:
+        """Estimate processing time of files by their recorded durations. Durations of files
+        processed for the first time are estimated by their size. Returns None if nothing is recorded."""
+        durations = self._store.get_file_durations(sizes) if self._store else {}
+        known_size = sum(sizes[path] for path in durations)
+        if not durations or not known_size:
+            return None
+
+        seconds_per_byte = sum(durations.values()) / known_size
+        return {
+            path: durations.get(path, size * seconds_per_byte)
+            for path, size in sizes.items()
+        }
+
+    @classmethod
+    def _get_signatures(
+        cls, files: Dict[str, Optional[FileHash]]
+    ) -> Iterator[Tuple[str, StatSignature]]:
+        for path, file_hash in files.items():
+            yield path, file_hash.signature if file_hash else cls._get_signature(path)
+
+    @staticmethod
+    def _get_signature(path: str) -> StatSignature:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return 0, 0, 0  # The error will surface when the file is processed
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def __repr__(self):
+        return f"{type(self).__name__}(order={self._order!r})"
@@ -0,0 +1,425 @@
+import json
+import os
+import sqlite3
+from pathlib import PurePath
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from ..exceptions import StateStoreError, StateStoreLockedError
+from .file_lock import FileLock
+
+# Every entry upgrades the database from the previous version to this one
+_MIGRATIONS: Dict[int, Tuple[str, ...]] = {
+    1: (
+        """CREATE TABLE meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )""",
+        """CREATE TABLE files (
+            path TEXT PRIMARY KEY,
+            digest TEXT NOT NULL,
+            mtime_ns INTEGER,
+            size INTEGER,
+            ino INTEGER
+        )""",
+        """CREATE TABLE notes (
+            anki_id INTEGER PRIMARY KEY,
+            file_path TEXT NOT NULL,
+            fingerprint TEXT
+        )""",
+        "CREATE INDEX notes_file_path_idx ON notes (file_path)",
+    ),
+    # Digests of previous versions were calculated with MD5
+    2: ("ALTER TABLE files ADD COLUMN algorithm TEXT NOT NULL DEFAULT 'md5'",),
+    3: (
+        """CREATE TABLE sections (
+            file_path TEXT NOT NULL,
+            digest TEXT NOT NULL
+        )""",
+        "CREATE INDEX sections_file_path_idx ON sections (file_path)",
+    ),
+    4: (
+        """CREATE TABLE directories (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            files TEXT NOT NULL,
+            subdirectories TEXT NOT NULL,
+            has_ignore_file INTEGER NOT NULL
+        )""",
+    ),
+    # Seconds it took to process the file last time
+    5: ("ALTER TABLE files ADD COLUMN duration REAL",),
+    # Changed files left for the next run when the time budget ran out
+    6: (
+        """CREATE TABLE pending (
+            position INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE
+        )""",
+    ),
+    # Serialized notes of parsed contents, used_at orders them from the least recently used
+    7: (
+        """CREATE TABLE parsed_notes (
+            key TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            used_at INTEGER NOT NULL
+        )""",
+        "CREATE INDEX parsed_notes_used_at_idx ON parsed_notes (used_at)",
+    ),
+}
+SCHEMA_VERSION = max(_MIGRATIONS)
+
+HASHES_JSON_IMPORTED_KEY = "hashes_json_imported"
+LEGACY_HASH_ALGORITHM = "md5"
+
+
+class FileState(NamedTuple):
+    """State of the file at the time of the last sync"""
+
+    digest: str
+    mtime_ns: Optional[int]
+    size: Optional[int]
+    ino: Optional[int]
+    algorithm: str
+
+    @property
+    def signature(self) -> Optional[Tuple[int, int, int]]:
+        if self.mtime_ns is None or self.size is None or self.ino is None:
+            return None
+        return self.mtime_ns, self.size, self.ino
+
+
+class DirectoryState(NamedTuple):
+    """Listing of the directory at the time it had this modification time"""
+
+    mtime_ns: int
+    # Names of files with searched extensions and whether they are symlinks
+    files: List[Tuple[str, bool]]
+    # Names of subdirectories and whether they are symlinks
+    subdirectories: List[Tuple[str, bool]]
+    has_ignore_file: bool
+
+
+class StateStore:
+    """Class for working with the SQLite database that keeps state between runs"""
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike],
+        root: Optional[str] = None,
+        lock: bool = False,
+    ):
+        """
+        Args:
+            path: path to the database file
+            root: if passed, paths of files inside this directory are stored relative to it
+            lock: if True, the database is locked until it is closed, so other processes can't use it
+        Raises:
+            StateStoreLockedError: if lock is requested and the database is used by another process
+        """
+        self._path = path
+        self._root = os.path.realpath(root) if root else None
+        self._lock = FileLock(f"{path}.lock") if lock else None
+        if self._lock and not self._lock.acquire():
+            raise StateStoreLockedError(
+                f'state database "{path}" is used by another inka2 process'
+            )
+
+        try:
+            self._connection = sqlite3.connect(path)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._migrate()
+        except (sqlite3.Error, StateStoreError):
+            if self._lock:
+                self._lock.release()
+            raise
+
+    @property
+    def schema_version(self) -> int:
+        return self._connection.execute("PRAGMA user_version").fetchone()[0]
+
+    def get_file(self, path: str) -> Optional[FileState]:
+        """Get state of the file or None if file wasn't synced yet"""
+        row = self._connection.execute(
+            "SELECT digest, mtime_ns, size, ino, algorithm FROM files WHERE path = ?",
+            (self._key(path),),
+        ).fetchone()
+        if row is None:
+            return None
+        return FileState(*row)
+
+    def update_file(
+        self,
+        path: str,
+        digest: str,
+        algorithm: str,
+        signature: Optional[Tuple[int, int, int]] = None,
+    ) -> None:
+        """Insert or update state of the file"""
+        mtime_ns, size, ino = signature if signature else (None, None, None)
+        self._connection.execute(
+            "INSERT INTO files (path, digest, mtime_ns, size, ino, algorithm) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (path) DO UPDATE SET digest = excluded.digest, "
+            "mtime_ns = excluded.mtime_ns, size = excluded.size, ino = excluded.ino, "
+            "algorithm = excluded.algorithm",
+            (self._key(path), digest, mtime_ns, size, ino, algorithm),
+        )
+
+    def get_file_durations(self, paths: Iterable[str]) -> Dict[str, float]:
+        """Get recorded processing times of files that have them"""
+        durations = {}
+        for path in paths:
+            row = self._connection.execute(
+                "SELECT duration FROM files WHERE path = ?", (self._key(path),)
+            ).fetchone()
+            if row and row[0] is not None:
+                durations[path] = row[0]
+        return durations
+
+    def update_file_duration(self, path: str, seconds: float) -> None:
+        """Record processing time of the file. Files that weren't synced yet are skipped."""
+        self._connection.execute(
+            "UPDATE files SET duration = ? WHERE path = ?", (seconds, self._key(path))
+        )
+
+    def delete_files(self) -> None:
+        """Forget state of all files, their sections and notes, listings of directories
+        and files left for the next run"""
+        self._connection.execute("DELETE FROM files")
+        self._connection.execute("DELETE FROM pending")
+        self._connection.execute("DELETE FROM directories")
+        self._connection.execute("DELETE FROM sections")
+        self._connection.execute("DELETE FROM notes")
+
+    def get_section_digests(self, file_path: str) -> Set[str]:
+        """Get digests of all sections of the file at the time of the last sync"""
+        rows = self._connection.execute(
+            "SELECT digest FROM sections WHERE file_path = ?", (self._key(file_path),)
+        )
+        return {row[0] for row in rows}
+
+    def update_section_digests(self, file_path: str, digests: Iterable[str]) -> None:
+        """Replace digests of sections of the file"""
+        file_path = self._key(file_path)
+        self._connection.execute(
+            "DELETE FROM sections WHERE file_path = ?", (file_path,)
+        )
+        self._connection.executemany(
+            "INSERT INTO sections (file_path, digest) VALUES (?, ?)",
+            ((file_path, digest) for digest in digests),
+        )
+
+    def get_note_fingerprints(self, anki_ids: Iterable[int]) -> Dict[int, str]:
+        """Get fingerprints of notes with these IDs that were synced before"""
+        fingerprints = {}
+        for anki_id in anki_ids:
+            row = self._connection.execute(
+                "SELECT fingerprint FROM notes WHERE anki_id = ?", (anki_id,)
+            ).fetchone()
+            if row and row[0]:
+                fingerprints[anki_id] = row[0]
+        return fingerprints
+
+    def update_note_fingerprint(
+        self, anki_id: int, file_path: str, fingerprint: str
+    ) -> None:
+        """Insert or update fingerprint of the note that was synced with Anki"""
+        self._connection.execute(
+            "INSERT INTO notes (anki_id, file_path, fingerprint) VALUES (?, ?, ?) "
+            "ON CONFLICT (anki_id) DO UPDATE SET file_path = excluded.file_path, "
+            "fingerprint = excluded.fingerprint",
+            (anki_id, self._key(file_path), fingerprint),
+        )
+
+    def get_directory(self, path: str) -> Optional[DirectoryState]:
+        """Get cached listing of the directory or None if it wasn't cached"""
+        row = self._connection.execute(
+            "SELECT mtime_ns, files, subdirectories, has_ignore_file "
+            "FROM directories WHERE path = ?",
+            (self._key(path),),
+        ).fetchone()
+        if row is None:
+            return None
+
+        mtime_ns, files, subdirectories, has_ignore_file = row
+        return DirectoryState(
+            mtime_ns,
+            [(name, is_symlink) for name, is_symlink in json.loads(files)],
+            [(name, is_symlink) for name, is_symlink in json.loads(subdirectories)],
+            bool(has_ignore_file),
+        )
+
+    def update_directory(self, path: str, state: DirectoryState) -> None:
+        """Insert or update cached listing of the directory"""
+        self._connection.execute(
+            "INSERT INTO directories (path, mtime_ns, files, subdirectories, has_ignore_file) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (path) DO UPDATE SET mtime_ns = excluded.mtime_ns, "
+            "files = excluded.files, subdirectories = excluded.subdirectories, "
+            "has_ignore_file = excluded.has_ignore_file",
+            (
+                self._key(path),
+                state.mtime_ns,
+                json.dumps(state.files),
+                json.dumps(state.subdirectories),
+                state.has_ignore_file,
+            ),
+        )
+
+    def delete_directories(self, paths: Iterable[str]) -> None:
+        """Forget cached listings of the directories and all directories inside them"""
+        for path in map(self._key, paths):
+            self._connection.execute(
+                "DELETE FROM directories WHERE path = ? OR substr(path, 1, ?) = ?",
+                (path, len(path) + 1, f"{path}/"),
+            )
+
+    def get_pending_files(self) -> List[str]:
+        """Get files left by the previous run in the order they were queued"""
+        rows = self._connection.execute("SELECT path FROM pending ORDER BY position")
+        return [self._full_path(key) for (key,) in rows]
+
+    def set_pending_files(self, paths: Iterable[str]) -> None:
+        """Replace files left for the next run"""
+        self._connection.execute("DELETE FROM pending")
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO pending (path) VALUES (?)",
+            ((self._key(path),) for path in paths),
+        )
+
+    def get_parsed_notes(self, key: str) -> Optional[bytes]:
+        """Get serialized notes stored under the key and mark them as the most recently used"""
+        row = self._connection.execute(
+            "SELECT data FROM parsed_notes WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._connection.execute(
+            "UPDATE parsed_notes SET used_at = "
+            "(SELECT MAX(used_at) + 1 FROM parsed_notes) WHERE key = ?",
+            (key,),
+        )
+        return row[0]
+
+    def update_parsed_notes(self, key: str, data: bytes, max_size: int) -> None:
+        """Insert or replace serialized notes, then remove the least recently used ones
+        until all of them take at most max_size bytes. Data larger than max_size isn't stored."""
+        if len(data) > max_size:
+            return
+        self._connection.execute(
+            "INSERT INTO parsed_notes (key, data, size, used_at) "
+            "VALUES (?, ?, ?, (SELECT COALESCE(MAX(used_at), 0) + 1 FROM parsed_notes)) "
+            "ON CONFLICT (key) DO UPDATE SET data = excluded.data, "
+            "size = excluded.size, used_at = excluded.used_at",
+            (key, data, len(data)),
+        )
+        total = self._connection.execute(
+            "SELECT SUM(size) FROM parsed_notes"
+        ).fetchone()[0]
+        if total <= max_size:
+            return
+
+        evicted = []
+        rows = self._connection.execute(
+            "SELECT key, size FROM parsed_notes ORDER BY used_at"
+        )
+        for evicted_key, size in rows:
+            if total <= max_size:
+                break
+            evicted.append((evicted_key,))
+            total -= size
+        self._connection.executemany("DELETE FROM parsed_notes WHERE key = ?", evicted)
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._connection.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        self._connection.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def import_hashes_json(self, json_path: Union[str, os.PathLike]) -> int:
+        """One-time import of hashes from the datafile used by previous versions.
+        If the store has a root, only files inside it are imported.
+        Returns number of imported entries."""
+        if self.get_meta(HASHES_JSON_IMPORTED_KEY) is not None:
+            return 0
+
+        try:
+            with open(json_path, mode="rt", encoding="utf-8") as f:
+                hashes = json.load(f)
+        except FileNotFoundError:
+            hashes = {}
+
+        if self._root is not None:
+            hashes = {
+                path: entry for path, entry in hashes.items() if self._contains(path)
+            }
+        for path, entry in hashes.items():
+            # Entries are either plain digests or digests followed by stat signature
+            if isinstance(entry, list):
+                self.update_file(
+                    path, entry[0], LEGACY_HASH_ALGORITHM, tuple(entry[1:4])
+                )
+            else:
+                self.update_file(path, entry, LEGACY_HASH_ALGORITHM)
+
+        self.set_meta(HASHES_JSON_IMPORTED_KEY, str(json_path))
+        self.commit()
+        return len(hashes)
+
+    def commit(self) -> None:
+        """Make all changes since the last commit persistent"""
+        self._connection.commit()
+
+    def close(self) -> None:
+        """Commit pending changes, close the database and release its lock"""
+        try:
+            self.commit()
+            self._connection.close()
+        finally:
+            if self._lock:
+                self._lock.release()
+
+    def _contains(self, path: str) -> bool:
+        """Check if the path is inside the root of the store"""
+        if self._root is None:
+            return False
+        return os.path.abspath(path).startswith(os.path.join(self._root, ""))
+
+    def _key(self, path: str) -> str:
+        """Get the path under which the file is stored: relative to the root if it is inside it.
+        Paths are expected to be resolved already, so no system calls are made here."""
+        if not self._contains(path):
+            return path
+        return PurePath(os.path.relpath(os.path.abspath(path), self._root)).as_posix()
+
+    def _full_path(self, key: str) -> str:
+        """Get the path of the file from the key it is stored under"""
+        if self._root is None or os.path.isabs(key):
+            return key
+        return os.path.normpath(os.path.join(self._root, key))
+
+    def _migrate(self) -> None:
+        """Bring database schema up to date"""
+        version = self.schema_version
+        if version > SCHEMA_VERSION:
+            raise StateStoreError(
+                f'state database "{self._path}" was created by a newer version of inka2'
+            )
+
+        for target_version in range(version + 1, SCHEMA_VERSION + 1):
+            with self._connection:
+                self._connection.execute("BEGIN")
+                for statement in _MIGRATIONS[target_version]:
+                    self._connection.execute(statement)
+                self._connection.execute(f"PRAGMA user_version = {target_version}")
+
+    def __repr__(self):
+        return f"{type(self).__name__}(path={self._path!r})"
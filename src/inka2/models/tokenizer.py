@@ -0,0 +1,373 @@
+import re
+from mmap import mmap
+from typing import Iterator, List, NamedTuple, Optional, Tuple, Union
+
+SECTION_DELIMITER = "---"
+DECK_PREFIX = "Deck:"
+TAGS_PREFIX = "Tags:"
+ID_PREFIX = "<!--ID:"
+ID_SUFFIX = "-->"
+ANSWER_PREFIX = ">"
+
+# Lines that start and end sections. The pattern has no repetitions, so it can't backtrack.
+_delimiter_regex = re.compile(r"^---$", re.MULTILINE)
+# Delimiter lines in raw contents of files, in which lines can also end with "\r\n" or "\r"
+_byte_delimiter_regex = re.compile(rb"(?:^|(?<=\r))---(?=[\r\n]|\Z)", re.MULTILINE)
+# UTF-8 bytes that continue a character
+_continuation_bytes = bytes(range(0x80, 0xC0))
+# Size of chunks in which raw contents are counted
+_COUNT_CHUNK_SIZE = 1024 * 1024
+_whitespace_regex = re.compile(r"\s")
+_id_line_regex = re.compile(r"<!--ID:\S+-->")
+# Lines that can start or end a note or its answer. Other lines are skipped, unless they
+# end an answer, and are searched only for braces and fields of the section.
+_significant_line_regex = re.compile(r"^(?:[\d>]|---$|[^\n]*?<!--ID:)", re.MULTILINE)
+# Consecutive answer lines that end with a newline
+_answer_lines_regex = re.compile(r"(?:>[^\n]*\n)+")
+# "Deck:" and "Tags:" lines
+_field_regex = re.compile(r"^(Deck:|Tags:)([^\n]*)", re.MULTILINE)
+
+
+class NoteSpan(NamedTuple):
+    """Location of the note and its parts in the text. Start and end are indexes of characters
+    in the whole text, both are -1 if the note has no such part."""
+
+    # Number of the line the note starts on, counted from 1
+    line: int
+    # Whole note, including the ID line before it
+    start: int
+    end: int
+    # ID comment without the newline after it
+    id_start: int
+    id_end: int
+    question_start: int
+    question_end: int
+    # Lines starting with ">"
+    answer_start: int
+    answer_end: int
+
+    def shift(self, offset: int, delta: int, lines: int = 0) -> "NoteSpan":
+        """Get the span after the text was changed at offset, e.g. by inserting delta characters
+        with lines newlines. Indexes from offset onwards move by delta and so does the line
+        of the note if it starts there."""
+        line = self.line + lines if self.start >= offset else self.line
+        return NoteSpan(
+            line, *(index + delta if index >= offset else index for index in self[1:])
+        )
+
+
+class NoteToken(NamedTuple):
+    """Note found in the text, before its fields are cleaned"""
+
+    # Whole note, including the ID line before it
+    text: str
+    # Contents of the ID comment or None if the note has no ID line
+    raw_id: Optional[str]
+    # Everything after "1." up to the answer, None if there is nothing after "1."
+    question: Optional[str]
+    # Consecutive lines starting with ">" or None if there are no such lines
+    answer: Optional[str]
+    # Whether "{" is followed by "}" somewhere after "1."
+    has_braces: bool
+    # Where the note and the parts above are in the text
+    span: NoteSpan
+
+
+class SectionToken(NamedTuple):
+    """Text between two "---" lines with the fields and notes found in it"""
+
+    text: str
+    # Indexes of the contents in the whole text and number of their first line
+    start: int
+    end: int
+    line: int
+    # Values of all "Deck:" and "Tags:" lines
+    deck_names: List[str]
+    tags: List[str]
+    notes: List[NoteToken]
+
+
+def find_id(text: str, start: int = 0, end: Optional[int] = None) -> int:
+    """Find the first ID comment in text[start:end], which must not contain newlines.
+    Returns its index or -1.
+
+    Characters between "<!--ID:" and "-->" can't be whitespace, so every run of non-whitespace
+    characters is checked once, which keeps the search linear.
+    """
+    if end is None:
+        end = len(text)
+    candidate = text.find(ID_PREFIX, start, end)
+    while candidate >= 0:
+        whitespace = _whitespace_regex.search(text, candidate, end)
+        run_end = whitespace.start() if whitespace else end
+        if text.find(ID_SUFFIX, candidate + len(ID_PREFIX) + 1, run_end) >= 0:
+            return candidate
+        candidate = text.find(ID_PREFIX, run_end, end)
+    return -1
+
+
+def get_body_start(text: str, start: int = 0, end: Optional[int] = None) -> int:
+    """Get index after "1." if the line text[start:end] starts like a note, otherwise -1"""
+    if end is None:
+        end = len(text)
+    index = start
+    while index < end and text[index].isdecimal():
+        index += 1
+    if start < index < end and text[index] == ".":
+        return index + 1
+    return -1
+
+
+def find_sections(text: str, position: int = 0) -> Iterator[Tuple[int, int]]:
+    """Lazily find start and end indexes of contents of sections
+
+    Args:
+        text: contents of the file
+        position: index from which delimiters are searched, it must not be inside a section
+    """
+    content_start = -1
+    for match in _delimiter_regex.finditer(text, position):
+        if content_start < 0:
+            # Contents start on the next line, so the delimiter must end with a newline
+            if match.end() < len(text):
+                content_start = match.end() + 1
+        elif match.start() > content_start:
+            # Contents always end with the newline before the delimiter
+            yield content_start, match.start()
+            content_start = -1
+
+
+def find_byte_sections(data: Union[bytes, mmap]) -> Iterator[Tuple[int, int]]:
+    """Lazily find start and end indexes of contents of sections in raw contents of the file.
+    Sections are the same as find_sections() finds in the decoded text.
+
+    Args:
+        data: UTF-8 encoded contents, e.g. a memory map of the file
+    """
+    content_start = -1
+    position = 0
+    # Memory map can't be closed while finditer() holds it, so it is searched step by step
+    while match := _byte_delimiter_regex.search(data, position):
+        position = match.end()
+        if content_start < 0:
+            newline = data[match.end() : match.end() + 2]
+            if newline:
+                content_start = match.end() + (2 if newline == b"\r\n" else 1)
+        elif match.start() > content_start:
+            yield content_start, match.start()
+            content_start = -1
+
+
+def count_text(data: Union[bytes, mmap], start: int, end: int) -> Tuple[int, int]:
+    """Count characters and newlines in data[start:end] after decoding and translating newlines.
+    The part must not start or end inside a CRLF newline. It is read in chunks,
+    so memory doesn't depend on its size.
+
+    Args:
+        data: UTF-8 encoded contents, e.g. a memory map of the file
+    """
+    characters = newlines = 0
+    ends_with_cr = False
+    for chunk_start in range(start, end, _COUNT_CHUNK_SIZE):
+        chunk = data[chunk_start : min(chunk_start + _COUNT_CHUNK_SIZE, end)]
+        # "\r\n" is a single newline, even if it is split between chunks
+        crlf = chunk.count(b"\r\n") + (ends_with_cr and chunk[:1] == b"\n")
+        characters += len(chunk.translate(None, _continuation_bytes)) - crlf
+        newlines += chunk.count(b"\n") + chunk.count(b"\r") - crlf
+        ends_with_cr = chunk[-1:] == b"\r"
+    return characters, newlines
+
+
+def tokenize_sections(text: str, with_notes: bool = True) -> Iterator[SectionToken]:
+    """Lazily find sections in the text. A section starts with "---" line and ends
+    with the next "---" line after at least one line of contents.
+
+    Args:
+        text: contents of the file
+        with_notes: if False, fields and notes aren't searched for and the sections have none
+    """
+    # Lines are counted only between sections, so the text is scanned once
+    position, line = 0, 1
+    for start, end in find_sections(text):
+        line += text.count("\n", position, start)
+        position = start
+        deck_names: List[str] = []
+        tags: List[str] = []
+        notes = (
+            _tokenize(text, start, end, line, deck_names, tags) if with_notes else []
+        )
+        yield SectionToken(text[start:end], start, end, line, deck_names, tags, notes)
+
+
+def tokenize_section(
+    text: str, start: int = 0, end: Optional[int] = None, line: int = 1
+) -> SectionToken:
+    """Get fields and notes of the section from its contents text[start:end]
+
+    Args:
+        text: contents of the section or of the whole file
+        start: index of the first character of the section
+        end: index after the last character of the section, the end of the text if None
+        line: number of the line on which the section starts
+    """
+    if end is None:
+        end = len(text)
+    deck_names: List[str] = []
+    tags: List[str] = []
+    notes = _tokenize(text, start, end, line, deck_names, tags)
+    return SectionToken(text[start:end], start, end, line, deck_names, tags, notes)
+
+
+def tokenize_notes(text: str) -> List[NoteToken]:
+    """Find all notes in the text"""
+    return _tokenize(text, 0, len(text), 1, [], [])
+
+
+def _tokenize(
+    text: str,
+    start: int,
+    end: int,
+    line_number: int,
+    deck_names: List[str],
+    tags: List[str],
+) -> List[NoteToken]:
+    """Find notes in text[start:end], which starts on line line_number, in a single pass
+    over its lines, adding values of "Deck:" and "Tags:" lines to the lists.
+
+    A note starts with a line like "1. Question", optionally preceded by an ID line,
+    and ends before the next such line, an ID comment, a "---" line or the end of the text.
+    The question is everything after "1." up to the first line starting with ">",
+    the answer is that line and lines starting with ">" right after it.
+    """
+    # Fields can be on any line of the section, including lines of notes
+    for field in _field_regex.finditer(text, start, end):
+        (deck_names if field.group(1) == DECK_PREFIX else tags).append(field.group(2))
+
+    notes: List[NoteToken] = []
+    # Current note starts at note_start, or there is no note if it is -1
+    note_start = body_start = answer_start = answer_end = -1
+    answer_ended = False
+    note_line = id_start = id_end = -1
+    # Start of the previous line if it can be the ID line of a note
+    id_line_start = -1
+    # The loop runs for every significant line, so lookups are done once before it
+    find, startswith = text.find, text.startswith
+    search_significant = _significant_line_regex.search
+    match_answer_lines = _answer_lines_regex.match
+    match_id_line = _id_line_regex.fullmatch
+
+    def finish(note_end: int) -> None:
+        question_end = answer_start if answer_start >= 0 else note_end
+        has_question = question_end > body_start
+        # Braces are searched once in the whole note instead of in each of its lines
+        brace = find("{", body_start, note_end)
+        notes.append(
+            NoteToken(
+                text[note_start:note_end],
+                text[id_start + len(ID_PREFIX) : id_end - len(ID_SUFFIX)]
+                if id_start >= 0
+                else None,
+                text[body_start:question_end] if has_question else None,
+                text[answer_start:answer_end] if answer_start >= 0 else None,
+                brace >= 0 and find("}", brace + 1, note_end) >= 0,
+                NoteSpan(
+                    note_line,
+                    note_start,
+                    note_end,
+                    id_start,
+                    id_end,
+                    body_start if has_question else -1,
+                    question_end if has_question else -1,
+                    answer_start,
+                    answer_end,
+                ),
+            )
+        )
+
+    line_start = start
+    while True:
+        line_end = find("\n", line_start, end)
+        has_newline = line_end >= 0
+        if not has_newline:
+            line_end = end
+        first = text[line_start] if line_start < line_end else ""
+
+        # Start of an ID comment inside the line
+        line_id = find(ID_PREFIX, line_start, line_end)
+        if line_id >= 0:
+            line_id = find_id(text, line_id, line_end)
+        body = get_body_start(text, line_start, line_end) if first.isdecimal() else -1
+
+        if note_start >= 0 and (
+            body >= 0
+            or line_id == line_start
+            or (
+                line_end - line_start == len(SECTION_DELIMITER)
+                and startswith(SECTION_DELIMITER, line_start)
+            )
+        ):
+            finish(line_start)
+            note_start = -1
+
+        if note_start < 0 and body >= 0:
+            if id_line_start >= 0:
+                note_start = id_start = id_line_start
+                id_end = line_start - 1
+                note_line = line_number - 1
+            else:
+                note_start = line_start
+                id_start = id_end = -1
+                note_line = line_number
+            body_start = body
+            answer_start = answer_end = -1
+            answer_ended = False
+        elif note_start >= 0:
+            if first == ANSWER_PREFIX and not answer_ended:
+                if answer_start < 0:
+                    answer_start = line_start
+                answer_end = line_id if line_id >= 0 else line_end + has_newline
+            elif answer_start >= 0:
+                answer_ended = True
+
+        if note_start >= 0 and line_id >= 0:
+            # Rest of the line doesn't belong to any note
+            finish(line_id)
+            note_start = -1
+
+        id_line_start = (
+            line_start
+            if has_newline
+            and first == "<"
+            and match_id_line(text, line_start, line_end)
+            else -1
+        )
+        if not has_newline:
+            break
+        line_start = line_end + 1
+        line_number += 1
+
+        if note_start >= 0 and answer_start >= 0 and not answer_ended:
+            # Following answer lines without ID comments only extend the answer
+            lines = match_answer_lines(text, line_start, end)
+            if lines:
+                if find(ID_PREFIX, line_start, lines.end()) >= 0:
+                    continue
+                line_number += text.count("\n", line_start, lines.end())
+                answer_end = line_start = lines.end()
+                id_line_start = -1
+            if line_start < end and text[line_start] == ANSWER_PREFIX:
+                # Last line of the text, which has no newline
+                continue
+            # Line after the answer ends it, whether it is significant or not
+            answer_ended = True
+        significant = search_significant(text, line_start, end)
+        if not significant:
+            break
+        if significant.start() > line_start:
+            line_number += text.count("\n", line_start, significant.start())
+            line_start = significant.start()
+            id_line_start = -1
+
+    if note_start >= 0:
+        finish(end)
+    return notes
@@ -1,27 +1,59 @@
 import re
+from bisect import bisect_right
 from pathlib import Path
-from typing import Iterable, List, Optional, Union
+from typing import Iterable, List, Optional, Tuple, Union
 
 from ..helpers import print_sub_warning
+from .document import Document
 from .notes.basic_note import BasicNote
 from .notes.cloze_note import ClozeNote
 from .notes.note import Note
 from .parser import Parser
+from .tokenizer import ID_PREFIX, ID_SUFFIX, NoteSpan
+
+# Replacement of content[start:end] with text
+Edit = Tuple[int, int, str]
 
 
 class Writer:
     """Class for editing file with notes"""
 
-    def __init__(self, file_path: Union[str, Path], notes: Iterable[Note]):
+    def __init__(
+        self,
+        file_path: Union[str, Path],
+        notes: Iterable[Note],
+        document: Optional[Document] = None,
+    ):
+        """
+        Args:
+            file_path: path to the file with notes
+            notes: notes from the file
+            document: already read contents of the file. If passed, the file is
+                neither read nor written directly, all changes go through the document.
+        """
         self._file_path = file_path
         self._notes = notes
-
-        with open(self._file_path, mode="rt", encoding="utf-8") as f:
-            self._file_content = f.read()
-        self._note_strings = Parser.get_note_strings(self._file_content)
+        self._document = document
+
+        if document:
+            self._file_content = document.text
+        else:
+            with open(self._file_path, mode="rt", encoding="utf-8") as f:
+                self._file_content = f.read()
+        self._saved_content = self._file_content
+        # Spans of the notes point into this content. The writer moves them with its own edits,
+        # if the content is replaced in any other way, notes are searched for in the text.
+        self._spanned_content = self._file_content
+        # Found only when notes have to be searched for in the text
+        self._note_strings: Optional[List[str]] = None
 
     def update_note_ids(self):
         """Update lines with IDs of the notes from the file"""
+        if self._has_spans(self._notes):
+            self._update_note_ids_at_spans()
+            self._save()
+            return
+
         for note in self._notes:
             # Find note's question in file string
             note_question = note.get_raw_question_field()
@@ -92,13 +124,28 @@ class Writer:
 
     def update_fields_of_basic_notes(self):
         """Update question and answer fields in notes in file"""
-        for note in self._notes:
-            if not isinstance(note, BasicNote):
-                continue
-
-            if not note.changed:
-                continue
-
+        changed_notes = [
+            note for note in self._notes if isinstance(note, BasicNote) and note.changed
+        ]
+        if self._has_spans(changed_notes):
+            edits: List[Edit] = []
+            for note in changed_notes:
+                span = note.span
+                answer = self._file_content[span.answer_start : span.answer_end]
+                lines = note.raw_back_md.splitlines()
+                edits += [
+                    (span.question_start, span.question_end, note.raw_front_md),
+                    (
+                        span.answer_start,
+                        span.answer_start + len(answer.rstrip()),
+                        "\n".join(map(lambda line: f"> {line}", lines)),
+                    ),
+                ]
+            self._edit(edits)
+            self._save()
+            return
+
+        for note in changed_notes:
             # Find string with this note by its ID
             note_string = self._get_note_string_by_id(note.anki_id)
 
@@ -121,10 +168,15 @@ class Writer:
 
     def delete_notes(self):
         """Delete notes marked for deletion from the file"""
-        for note in self._notes:
-            if not note.to_delete:
-                continue
-
+        deleted_notes = [note for note in self._notes if note.to_delete]
+        if self._has_spans(deleted_notes):
+            self._edit([(note.span.start, note.span.end, "") for note in deleted_notes])
+            for note in deleted_notes:
+                note.span = None
+            self._save()
+            return
+
+        for note in deleted_notes:
             # Find string with this note by its ID
             note_string = self._get_note_string_by_id(note.anki_id)
 
@@ -133,27 +185,137 @@ class Writer:
 
         self._save()
 
-    def update_cloze_notes(self):
-        """Updates all cloze notes with the values from updated_text_md field"""
+    @property
+    def text(self) -> str:
+        """Contents of the file with all changes made by the writer, even unsaved ones"""
+        return self._file_content
+
+    def update_cloze_notes(self, save=True):
+        """Updates all cloze notes with the values from updated_text_md field
+
+        Args:
+            save: if False, the file isn't written and the changed contents are only in text
+        """
+        cloze_notes = [note for note in self._notes if isinstance(note, ClozeNote)]
+        if self._has_spans(cloze_notes):
+            edits: List[Edit] = []
+            for note in cloze_notes:
+                start, end = note.span.question_start, note.span.question_end
+                # Text with the filename added to it isn't in the file
+                if self._file_content[start:end] == note.raw_text_md:
+                    edits.append((start, end, note.updated_text_md))
+                note.raw_text_md = note.updated_text_md  # update info about raw text
+            self._edit(edits)
+        else:
+            for note in cloze_notes:
+                self._file_content = self._file_content.replace(
+                    note.raw_text_md, note.updated_text_md, 1
+                )
+                note.raw_text_md = note.updated_text_md  # update info about raw text
+
+        if save:
+            self._save()
+
+    def _update_note_ids_at_spans(self):
+        """Update lines with IDs of the notes at their spans"""
+        edits: List[Edit] = []
+        added: List[Note] = []
+        removed: List[Note] = []
         for note in self._notes:
-            if not isinstance(note, ClozeNote):
+            span = note.span
+            existing_id = (
+                Parser.get_id(self._file_content[span.id_start : span.id_end])
+                if span.id_start >= 0
+                else None
+            )
+            # Skip if ID hasn't changed
+            if existing_id == note.anki_id:
                 continue
 
-            self._file_content = self._file_content.replace(
-                note.raw_text_md, note.updated_text_md, 1
+            id_string = f"{ID_PREFIX}{note.anki_id}{ID_SUFFIX}" if note.anki_id else ""
+            if span.id_start < 0:
+                # Add line with ID before the note
+                edits.append((span.start, span.start, f"{id_string}\n"))
+                added.append(note)
+            elif id_string:
+                edits.append((span.id_start, span.id_end, id_string))
+            else:
+                # Delete line with ID if note object has no ID
+                edits.append((span.id_start, span.id_end + 1, ""))
+                removed.append(note)
+        self._edit(edits)
+
+        for note in added:
+            # The note starts with the inserted ID line now
+            span = note.span
+            id_end = span.start + len(ID_PREFIX + ID_SUFFIX) + len(str(note.anki_id))
+            note.span = span._replace(id_start=span.start, id_end=id_end)
+        for note in removed:
+            note.span = note.span._replace(id_start=-1, id_end=-1)
+
+    def _has_spans(self, notes: Iterable[Note]) -> bool:
+        """Check if spans of all notes point into the current content"""
+        return self._file_content is self._spanned_content and all(
+            note.span is not None for note in notes
+        )
+
+    def _edit(self, edits: List[Edit]) -> None:
+        """Make non-overlapping edits in a single pass over the content
+        and move spans of all notes to the same places of the new content."""
+        if not edits:
+            return
+        edits.sort(key=lambda edit: (edit[0], edit[1]))
+
+        pieces = []
+        # Indexes from which the edits move the text and total changes of length
+        # and line count up to each of them. Text inserted at an index goes after it,
+        # e.g. an ID line inserted at the start of a note belongs to that note.
+        ends, deltas, line_deltas = [], [], []
+        position = delta = line_delta = 0
+        for start, end, text in edits:
+            pieces += [self._file_content[position:start], text]
+            position = end
+            delta += len(text) - (end - start)
+            line_delta += text.count("\n") - self._file_content.count("\n", start, end)
+            ends.append(end if end > start else end + 1)
+            deltas.append(delta)
+            line_deltas.append(line_delta)
+        pieces.append(self._file_content[position:])
+
+        def move(index: int) -> int:
+            edit_count = bisect_right(ends, index)
+            return (
+                index + deltas[edit_count - 1] if index >= 0 and edit_count else index
             )
-            note.raw_text_md = note.updated_text_md  # update info about raw text
 
-        self._save()
+        for note in self._notes:
+            span = note.span
+            if span is None:
+                continue
+            edit_count = bisect_right(ends, span.start)
+            line = span.line + line_deltas[edit_count - 1] if edit_count else span.line
+            note.span = NoteSpan(line, *map(move, span[1:]))
+
+        self._file_content = "".join(pieces)
+        self._spanned_content = self._file_content
 
     def _save(self):
         """Save file state into the file system"""
-        with open(self._file_path, mode="wt", encoding="utf-8") as f:
-            f.write(self._file_content)
-        self._note_strings = Parser.get_note_strings(self._file_content)
+        if self._file_content == self._saved_content:
+            return
+
+        if self._document:
+            self._document.write(self._file_content)
+        else:
+            with open(self._file_path, mode="wt", encoding="utf-8") as f:
+                f.write(self._file_content)
+        self._saved_content = self._file_content
+        self._note_strings = None
 
     def _get_note_string_by_id(self, note_id: int) -> Optional[str]:
         """Gets note string from the file by its ID. If note wasn't found returns None"""
+        if self._note_strings is None:
+            self._note_strings = Parser.get_note_strings(self._saved_content)
         for string in self._note_strings:
             if string.find(str(note_id)) != -1:
                 return string
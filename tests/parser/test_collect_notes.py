@@ -0,0 +1,77 @@
+import re
+
+import pytest
+
+from inka2.models.parser import Parser
+
+
+def test_collect_notes_with_section_filter(config, tmp_path):
+    path = tmp_path / "file.md"
+    path.write_text(
+        "---\n"
+        "1. First question\n"
+        "> First answer\n"
+        "---\n"
+        "\n"
+        "---\n"
+        "1. Second question\n"
+        "> Second answer\n"
+        "---\n",
+        encoding="utf-8",
+    )
+    parser = Parser(config, path, "Default")
+
+    notes = parser.collect_notes(lambda section: "Second" in section)
+
+    assert len(notes) == 1
+    assert notes[0].raw_front_md == "Second question"
+
+
+def test_collect_notes_without_section_filter(config, tmp_path):
+    path = tmp_path / "file.md"
+    path.write_text(
+        "---\n1. First question\n> First answer\n---\n"
+        "---\n1. Second question\n> Second answer\n---\n",
+        encoding="utf-8",
+    )
+
+    notes = Parser(config, path, "Default").collect_notes()
+
+    assert [note.raw_front_md for note in notes] == [
+        "First question",
+        "Second question",
+    ]
+
+
+def test_collect_notes_records_spans(config, tmp_path):
+    path = tmp_path / "file.md"
+    text = (
+        "---\n1. First question\n> First answer\n---\n"
+        "\n"
+        "---\n<!--ID:123-->\n2.  Second {question}\n\n---\n"
+    )
+    path.write_text(text, encoding="utf-8")
+
+    first, second = Parser(config, path, "Default").collect_notes(lambda section: True)
+
+    assert first.span.line == 2
+    assert text[first.span.question_start : first.span.question_end] == (
+        "First question"
+    )
+    assert text[first.span.answer_start : first.span.answer_end] == "> First answer\n"
+    assert second.span.line == 7
+    assert text[second.span.id_start : second.span.id_end] == "<!--ID:123-->"
+    assert text[second.span.question_start : second.span.question_end] == (
+        "Second {question}"
+    )
+
+
+def test_collect_notes_reports_line_of_wrong_section(config, tmp_path):
+    path = tmp_path / "file.md"
+    path.write_text(
+        "---\n1. Q\n> A\n---\n\n---\nDeck: A\nDeck: B\n1. Q\n> A\n---\n",
+        encoding="utf-8",
+    )
+
+    with pytest.raises(ValueError, match=f"^{re.escape(str(path))}:7: more than one"):
+        Parser(config, path, "Default").collect_notes()
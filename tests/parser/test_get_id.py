@@ -48,3 +48,16 @@ test_cases = {
 @pytest.mark.parametrize("text, expected", test_cases.items())
 def test_get_id(fake_parser, text, expected):
     assert fake_parser.get_id(text) == expected
+
+
+def test_get_ids_finds_all_id_lines(fake_parser):
+    text = (
+        "<!--ID:1111-->\n"
+        "1. First question\n"
+        "> Answer\n"
+        "<!--ID:bad-->\n"
+        "Text with <!--ID:3333--> inside\n"
+        "<!--ID:2222-->\n"
+    )
+
+    assert fake_parser.get_ids(text) == [1111, 2222]
@@ -268,3 +268,15 @@ def test_get_notes_from_section(fake_parser, section, expected):
     cards = fake_parser._get_notes_from_section(section)
 
     assert cards == expected
+
+
+def test_notes_from_sections_share_tags_and_deck_name(fake_parser):
+    section = "Deck: Abraham\nTags: one two\n1. First\n> A\n2. Second\n> B\n"
+    other_section = "Deck: Abraham\nTags: one two\n1. Third\n> C\n"
+
+    notes = fake_parser._get_notes_from_section(section)
+    notes += fake_parser._get_notes_from_section(other_section)
+
+    assert notes[0].tags == ("one", "two")
+    assert all(note.tags is notes[0].tags for note in notes)
+    assert all(note.deck_name is notes[0].deck_name for note in notes)
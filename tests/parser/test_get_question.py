@@ -152,6 +152,10 @@ test_cases = {
     ),
     # no question
     "Some text": None,
+    "Some text\n1.": None,
+    ("1. Some question?\n" "2. Another question?\n" "> Answer"): (
+        "Some question?\n2. Another question?"
+    ),
 }
 
 
@@ -0,0 +1,20 @@
+from inka2.models import parser
+from inka2.models.parser import intern_tags
+
+
+def test_intern_tags_returns_shared_tuple():
+    tags = intern_tags(["one", "two"])
+
+    assert intern_tags(iter(["one", "two"])) is tags
+    assert tags == ("one", "two")
+
+
+def test_intern_tags_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(parser, "MAX_INTERNED_TAGS", 3)
+    monkeypatch.setattr(parser, "_interned_tags", {})
+
+    for index in range(10):
+        intern_tags([f"tag{index}"])
+
+    assert len(parser._interned_tags) <= 3
+    assert intern_tags(["tag9"]) is intern_tags(["tag9"])
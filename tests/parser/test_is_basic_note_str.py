@@ -59,6 +59,10 @@ test_cases = {
     ("3. Some question?\n" "\n"): False,
     # not basic and not cloze with ID
     ("<!--ID:1112809025074-->\n" "3. Some question?\n" "\n"): False,
+    # answer before the question
+    ("> Answer\n" "1. Some question?\n"): False,
+    # long numbered list without answers
+    ("1. Some question?\n" * 10000): False,
     # empty
     "": False,
 }
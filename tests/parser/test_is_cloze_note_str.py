@@ -59,6 +59,12 @@ test_cases = {
     ("<!--ID:1112809025074-->\n" "3. Some question?\n" "\n"): False,
     # basic with curly braces
     ("1. Some {question}?\n" "\n" "> Answer"): True,
+    # braces before the question
+    ("{Some} text\n" "1. Some question?\n"): False,
+    # closing brace before opening one
+    ("1. Some } question {\n" "\n"): False,
+    # many unmatched braces
+    ("1. Some {\n" * 10000): False,
     # empty
     "": False,
 }
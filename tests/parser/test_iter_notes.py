@@ -0,0 +1,62 @@
+import pytest
+
+from inka2.models.parser import Parser
+
+TEXT = (
+    "Text before sections ü\n"
+    "---\n"
+    "Deck: Äbraham\n"
+    "1. First question\n"
+    "> First answer\n"
+    "<!--ID:123-->\n"
+    "2. Some {cloze} ✓\n"
+    "---\n"
+    "\n"
+    "Text between sections\n"
+    "\n"
+    "---\n"
+    "1. Second question\n"
+    "> Second answer\n"
+    "---\n"
+)
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+def test_iter_notes_finds_same_notes_as_collect_notes(config, tmp_path, newline):
+    path = tmp_path / "file.md"
+    path.write_bytes(TEXT.replace("\n", newline).encode("utf-8"))
+    parser = Parser(config, path, "Default")
+
+    notes = list(parser.iter_notes())
+
+    expected = parser.collect_notes()
+    assert len(notes) == 3
+    assert notes == expected
+    assert [note.span for note in notes] == [note.span for note in expected]
+
+
+def test_iter_notes_with_section_filter(config, tmp_path):
+    path = tmp_path / "file.md"
+    path.write_text(TEXT, encoding="utf-8")
+    parser = Parser(config, path, "Default")
+
+    notes = list(parser.iter_notes(lambda section: "Second" in section))
+
+    assert [note.raw_front_md for note in notes] == ["Second question"]
+    assert notes[0].span == parser.collect_notes()[2].span
+
+
+def test_iter_notes_is_lazy(config, tmp_path):
+    path = tmp_path / "file.md"
+    path.write_text(TEXT, encoding="utf-8")
+    notes = Parser(config, path, "Default").iter_notes()
+
+    assert next(notes).raw_front_md == "First question"
+    notes.close()
+
+
+def test_iter_notes_of_empty_file(config, tmp_path):
+    path = tmp_path / "file.md"
+    path.write_bytes(b"")
+
+    assert list(Parser(config, path, "Default").iter_notes()) == []
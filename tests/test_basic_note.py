@@ -34,6 +34,21 @@ def test_update_fields_with_when_function_passed(basic_note):
     assert basic_note.updated_back_md == new_text
 
 
+def test_drop_updated_fields(basic_note):
+    basic_note.update_fields_with(lambda text: "new text")
+
+    basic_note.drop_updated_fields()
+
+    assert basic_note.updated_front_md is basic_note.raw_front_md
+    assert basic_note.updated_back_md is basic_note.raw_back_md
+
+
+def test_note_has_no_dict(basic_note):
+    assert not hasattr(basic_note, "__dict__")
+    with pytest.raises(AttributeError):
+        basic_note.unknown_field = "text"
+
+
 def test_get_raw_fields(basic_note):
     fields = basic_note.get_raw_fields()
 
@@ -58,6 +73,44 @@ def test_get_html_fields(basic_note, config):
     assert basic_note.get_html_fields(config) == expected
 
 
+def test_get_updated_fields(basic_note, config):
+    config.update_option_value("anki", "front_field", "myFront")
+    config.update_option_value("anki", "back_field", "myBack")
+    basic_note.updated_front_md = "updated front"
+    expected = {"myFront": "updated front", "myBack": "back content"}
+
+    assert basic_note.get_updated_fields(config) == expected
+
+
+def test_get_fingerprint_when_note_same(basic_note, config):
+    same_note = BasicNote(
+        "front content", "back content", ["tag1", "tag2"], "deck name"
+    )
+
+    assert basic_note.get_fingerprint(config) == same_note.get_fingerprint(config)
+
+
+@pytest.mark.parametrize(
+    "other_note",
+    [
+        BasicNote("other front", "back content", ["tag1", "tag2"], "deck name"),
+        BasicNote("front content", "other back", ["tag1", "tag2"], "deck name"),
+        BasicNote("front content", "back content", ["tag1"], "deck name"),
+        BasicNote("front content", "back content", ["tag1", "tag2"], "other deck"),
+        ClozeNote("front content", ["tag1", "tag2"], "deck name"),
+    ],
+)
+def test_get_fingerprint_when_note_different(basic_note, config, other_note):
+    assert basic_note.get_fingerprint(config) != other_note.get_fingerprint(config)
+
+
+def test_get_fingerprint_when_note_type_changed(basic_note, config):
+    fingerprint = basic_note.get_fingerprint(config)
+    config.update_option_value("anki", "basic_type", "my super type")
+
+    assert basic_note.get_fingerprint(config) != fingerprint
+
+
 def test_get_anki_note_type(basic_note, config):
     expected = "my super type"
     config.update_option_value("anki", "basic_type", expected)
@@ -72,6 +125,12 @@ def test_eq_when_same():
     assert first_note == second_note
 
 
+def test_eq_when_tags_are_tuple():
+    assert BasicNote("front", "back", ["tag1"], "deck") == BasicNote(
+        "front", "back", ("tag1",), "deck"
+    )
+
+
 @pytest.mark.parametrize(
     "second_note",
     (
@@ -1,7 +1,26 @@
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
 import pytest
 from click.testing import CliRunner
 
-from inka2.cli import ROOT_DIR, cli, get_notes_from_file
+from inka2.cli import (
+    CONFIG,
+    ROOT_DIR,
+    cli,
+    create_notes_from_file,
+    get_files_changed_in_git,
+    get_state_path,
+    get_vault_root,
+    prepare_files_ahead,
+    submit_file,
+)
+from inka2.models.hasher import Hasher
+from inka2.models.parse_cache import ParseCache
+from inka2.models.parser import Parser
+from inka2.models.state_store import StateStore
 
 # Collection of manual test cases
 
@@ -23,12 +42,6 @@ def test_duplicate_question_string_should_fail():
     assert result.exit_code == 1
 
 
-@pytest.mark.integration
-def test_get_notes_from_file():
-    notes = get_notes_from_file(f"{ROOT_DIR}/./tests/resources/test_inka_data.md")  # noqa
-    _ = None
-
-
 @pytest.mark.integration
 def test_interactive_create_notes_from_files():
     """ creates anki card in default location "User 1"
@@ -39,3 +52,321 @@ def test_interactive_create_notes_from_files():
     result = runner.invoke(cli, ["-v", "collect", UNDER_TEST])
     assert result.exit_code == 0
     print(result.output)
+
+
+@pytest.fixture
+def cards_file(tmp_path) -> str:
+    path = tmp_path / "cards.md"
+    path.write_text(
+        "---\n"
+        "1. First question\n"
+        "> First answer\n"
+        "---\n"
+        "\n"
+        "---\n"
+        "1. Second question\n"
+        "> Second answer\n"
+        "---\n",
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+@pytest.fixture
+def hasher(tmp_path) -> Hasher:
+    return Hasher(StateStore(tmp_path / "state.db"))
+
+
+def test_create_notes_from_file_processes_only_changed_sections(
+    cards_file, hasher, anki_api_mock, anki_media_mock
+):
+    anki_api_mock.add_note.side_effect = [1111111111, 2222222222]
+    create_notes_from_file(cards_file, False, anki_api_mock, anki_media_mock, hasher)
+    with open(cards_file, mode="rt", encoding="utf-8") as f:
+        content = f.read()
+    with open(cards_file, mode="wt", encoding="utf-8") as f:
+        f.write(content.replace("Second answer", "Changed answer"))
+
+    create_notes_from_file(cards_file, False, anki_api_mock, anki_media_mock, hasher)
+
+    assert anki_api_mock.add_note.call_count == 2
+    assert anki_api_mock.update_note.call_count == 1
+    updated_note = anki_api_mock.update_note.call_args.args[0]
+    assert updated_note.raw_back_md == "Changed answer"
+    assert updated_note.anki_id == 2222222222
+    with open(cards_file, mode="rt", encoding="utf-8") as f:
+        assert "<!--ID:1111111111-->\n1. First question" in f.read()
+
+
+def test_create_notes_from_file_does_not_change_working_directory(
+    cards_file, hasher, anki_api_mock, anki_media_mock
+):
+    cwd = os.getcwd()
+    anki_api_mock.add_note.side_effect = [1111111111, 2222222222]
+
+    create_notes_from_file(cards_file, False, anki_api_mock, anki_media_mock, hasher)
+
+    assert os.getcwd() == cwd
+
+
+def test_create_notes_from_file_skips_unchanged_notes(
+    tmp_path, hasher, anki_api_mock, anki_media_mock
+):
+    path = tmp_path / "cards.md"
+    path.write_text(
+        "---\n"
+        "<!--ID:1111111111-->\n"
+        "1. First question\n"
+        "> First answer\n"
+        "<!--ID:2222222222-->\n"
+        "2. Second question\n"
+        "> Second answer\n"
+        "---\n",
+        encoding="utf-8",
+    )
+    create_notes_from_file(str(path), False, anki_api_mock, anki_media_mock, hasher)
+    path.write_text(
+        path.read_text(encoding="utf-8").replace("Second answer", "Changed answer"),
+        encoding="utf-8",
+    )
+
+    create_notes_from_file(str(path), False, anki_api_mock, anki_media_mock, hasher)
+
+    assert anki_api_mock.update_note.call_count == 3
+    updated_note = anki_api_mock.update_note.call_args.args[0]
+    assert updated_note.raw_back_md == "Changed answer"
+
+
+def test_fingerprints_cover_image_links_sent_to_anki(
+    tmp_path, hasher, anki_api_mock, anki_media_mock
+):
+    path = tmp_path / "cards.md"
+    path.write_text(
+        "---\n<!--ID:1111111111-->\n1. Question\n> ![pic](images/pic.png)\n---\n",
+        encoding="utf-8",
+    )
+    create_notes_from_file(str(path), False, anki_api_mock, anki_media_mock, hasher)
+    # Anki gets only the file name, which is the same
+    path.write_text(
+        path.read_text(encoding="utf-8").replace("images/", "media/"),
+        encoding="utf-8",
+    )
+
+    create_notes_from_file(str(path), False, anki_api_mock, anki_media_mock, hasher)
+
+    assert anki_api_mock.update_note.call_count == 1
+    assert "pic.png" in anki_api_mock.update_note.call_args.args[0].back_html
+
+
+@pytest.fixture
+def no_default_folder(monkeypatch):
+    monkeypatch.setattr(
+        CONFIG,
+        "get_option_value",
+        lambda section, key: "" if (section, key) == ("defaults", "folder") else None,
+    )
+
+
+def test_get_vault_root_is_common_folder_of_paths(tmp_path, no_default_folder):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    (tmp_path / "b" / "cards.md").touch()
+
+    root = get_vault_root([str(tmp_path / "a"), str(tmp_path / "b" / "cards.md")])
+
+    assert root == os.path.realpath(tmp_path)
+
+
+def test_get_vault_root_is_git_repository(tmp_path, no_default_folder):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / "notes").mkdir()
+    (tmp_path / "notes" / "cards.md").touch()
+
+    root = get_vault_root([str(tmp_path / "notes" / "cards.md")])
+
+    assert root == os.path.realpath(tmp_path)
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="requires git")
+def test_get_files_changed_in_git_when_synced_commit_is_gone(tmp_path):
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q"]
+        + ["--allow-empty", "-m", "initial"],
+        cwd=tmp_path,
+        check=True,
+    )
+    store = StateStore(str(tmp_path / "state.db"))
+
+    tracker, head, is_changed = get_files_changed_in_git(
+        {str(tmp_path)}, "0" * 40, store
+    )
+
+    assert tracker is not None
+    assert head == tracker.get_head()
+    assert is_changed is None
+    store.close()
+
+
+def test_get_vault_root_is_default_folder(tmp_path, monkeypatch):
+    (tmp_path / "notes").mkdir()
+    monkeypatch.setattr(CONFIG, "get_option_value", lambda section, key: str(tmp_path))
+
+    root = get_vault_root([str(tmp_path / "notes")])
+
+    assert root == os.path.realpath(tmp_path)
+
+
+def test_get_state_path_differs_by_vault_and_profile(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    paths = {
+        get_state_path("/notes", "User 1"),
+        get_state_path("/notes", "User 2"),
+        get_state_path("/other/notes", "User 1"),
+    }
+
+    assert len(paths) == 3
+    assert get_state_path("/notes", "User 1") in paths
+
+
+def test_collect_list_files_does_not_need_anki(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        CONFIG, "get_option_value_or_default", lambda section, key, default: default
+    )
+    (tmp_path / "drafts").mkdir()
+    (tmp_path / "cards.md").touch()
+    (tmp_path / "drafts" / "draft.md").touch()
+
+    result = CliRunner().invoke(
+        cli, ["collect", "-r", "--exclude", "drafts/", "--list-files", str(tmp_path)]
+    )
+
+    assert result.exit_code == 0
+    assert "cards.md" in result.output
+    assert "draft.md" not in result.output
+    assert "pruned 1" in result.output
+
+
+@pytest.mark.parametrize(
+    "args", [["--time-budget", "soon"], ["--time-budget", "20s", "--full-sync"]]
+)
+def test_collect_rejects_wrong_time_budget(tmp_path, args):
+    result = CliRunner().invoke(cli, ["collect", *args, str(tmp_path)])
+
+    assert result.exit_code == 2
+    assert "--time-budget" in result.output
+
+
+def test_full_sync_loads_notes_of_unchanged_file_from_parse_cache(
+    tmp_path, hasher, anki_api_mock, anki_media_mock, mocker
+):
+    path = tmp_path / "cards.md"
+    path.write_text(
+        "---\n<!--ID:1111111111-->\n1. Question\n> Answer\n---\n", encoding="utf-8"
+    )
+    parse_cache = ParseCache(StateStore(tmp_path / "cache.db"), CONFIG, 1024 * 1024)
+    create_notes_from_file(
+        str(path), True, anki_api_mock, anki_media_mock, hasher, parse_cache=parse_cache
+    )
+    collect_notes = mocker.spy(Parser, "collect_notes")
+
+    create_notes_from_file(
+        str(path), True, anki_api_mock, anki_media_mock, hasher, parse_cache=parse_cache
+    )
+
+    assert collect_notes.call_count == 0
+    assert anki_api_mock.update_note.call_count == 2
+    assert anki_api_mock.update_note.call_args.args[0].raw_back_md == "Answer"
+
+
+# worker processes
+def test_notes_prepared_by_worker_process_are_synced(
+    cards_file, hasher, anki_api_mock, anki_media_mock
+):
+    anki_api_mock.add_note.side_effect = [1111111111, 2222222222]
+    with ProcessPoolExecutor(1) as executor:
+        prepared = submit_file(executor, cards_file, False, hasher)
+        create_notes_from_file(
+            cards_file,
+            False,
+            anki_api_mock,
+            anki_media_mock,
+            hasher,
+            prepared=prepared,
+        )
+
+    added_note = anki_api_mock.add_note.call_args.args[0]
+    assert added_note.back_html == "<p>Second answer</p>"
+    with open(cards_file, mode="rt", encoding="utf-8") as f:
+        assert "<!--ID:2222222222-->\n1. Second question" in f.read()
+    assert not hasher.has_changed(cards_file, hasher.hash_file(cards_file))
+
+
+def test_cloze_deletions_converted_by_worker_are_written_by_main_process(
+    tmp_path, hasher, anki_api_mock, anki_media_mock
+):
+    path = tmp_path / "cards.md"
+    text = "---\n1. Some {cloze} here\n---\n"
+    path.write_text(text, encoding="utf-8")
+    anki_api_mock.add_note.return_value = 1111111111
+    with ProcessPoolExecutor(1) as executor:
+        prepared = submit_file(executor, str(path), False, hasher)
+        prepared.result()
+        assert path.read_text(encoding="utf-8") == text
+
+        create_notes_from_file(
+            str(path),
+            False,
+            anki_api_mock,
+            anki_media_mock,
+            hasher,
+            prepared=prepared,
+        )
+
+    assert path.read_text(encoding="utf-8") == (
+        "---\n<!--ID:1111111111-->\n1. Some {{c1::cloze}} here\n---\n"
+    )
+    assert not hasher.has_changed(str(path), hasher.hash_file(str(path)))
+
+
+def test_prepare_files_ahead_keeps_order_and_errors(cards_file, tmp_path, hasher):
+    missing = str(tmp_path / "missing.md")
+    with ProcessPoolExecutor(2) as executor:
+        prepared = list(
+            prepare_files_ahead(
+                [(cards_file, None), (missing, None)], executor, 1, False, hasher
+            )
+        )
+
+        assert [file for file, _, _ in prepared] == [cards_file, missing]
+        assert len(prepared[0][2].result().notes) == 2
+        with pytest.raises(FileNotFoundError):
+            prepared[1][2].result()
+
+
+def test_unchanged_file_is_not_submitted(cards_file, hasher):
+    hasher.update_hash(cards_file, hasher.hash_file(cards_file))
+    with ProcessPoolExecutor(1) as executor:
+        assert submit_file(executor, cards_file, False, hasher).result() is None
+
+
+# serve
+def test_serve_requires_stdio():
+    result = CliRunner().invoke(cli, ["serve"])
+
+    assert result.exit_code == 2
+    assert "--stdio" in result.output
+
+
+def test_serve_exits_after_shutdown():
+    messages = [
+        b'{"jsonrpc":"2.0","id":1,"method":"initialize","params":{}}',
+        b'{"jsonrpc":"2.0","id":2,"method":"shutdown"}',
+        b'{"jsonrpc":"2.0","method":"exit"}',
+    ]
+    stdin = b"".join(b"Content-Length: %d\r\n\r\n%s" % (len(m), m) for m in messages)
+
+    result = CliRunner().invoke(cli, ["serve", "--stdio"], input=stdin)
+
+    assert result.exit_code == 0
+    assert b'"id":2,"result":null' in result.stdout_bytes
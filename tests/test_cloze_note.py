@@ -32,6 +32,18 @@ def test_update_fields_with_when_function_passed(cloze_note):
     assert cloze_note.updated_text_md == new_text
 
 
+def test_drop_updated_fields(cloze_note):
+    cloze_note.update_fields_with(lambda text: "new text")
+
+    cloze_note.drop_updated_fields()
+
+    assert cloze_note.updated_text_md is cloze_note.raw_text_md
+
+
+def test_note_has_no_dict(cloze_note):
+    assert not hasattr(cloze_note, "__dict__")
+
+
 def test_get_raw_fields(cloze_note):
     fields = cloze_note.get_raw_fields()
 
@@ -55,6 +67,13 @@ def test_get_html_fields(cloze_note, config):
     assert cloze_note.get_html_fields(config) == expected
 
 
+def test_get_updated_fields(cloze_note, config):
+    config.update_option_value("anki", "cloze_field", "myFront")
+    cloze_note.updated_text_md = "updated text"
+
+    assert cloze_note.get_updated_fields(config) == {"myFront": "updated text"}
+
+
 def test_get_anki_note_type(cloze_note, config):
     expected = "my super type"
     config.update_option_value("anki", "cloze_type", expected)
@@ -16,6 +16,9 @@ def default_config_string():
         "folder = \n"
         "escape_html = False\n"
         "add_filename = False\n"
+        "hash_algorithm = blake2b\n"
+        "include = \n"
+        "exclude = .git/\n"
         "\n"
         "[anki]\n"
         "path = \n"
@@ -0,0 +1,61 @@
+import hashlib
+import os
+
+import pytest
+
+from inka2.models.document import Document
+
+
+@pytest.fixture
+def file(tmp_path) -> str:
+    path = tmp_path / "file.md"
+    path.write_bytes(b"first\r\nsecond\n")
+    return str(path)
+
+
+@pytest.fixture
+def document(file) -> Document:
+    return Document.load(file, "md5")
+
+
+def test_load_reads_content_and_signature(document, file):
+    stat = os.stat(file)
+
+    assert document.content == b"first\r\nsecond\n"
+    assert document.signature == (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def test_text_has_translated_newlines():
+    document = Document("file.md", b"one\r\ntwo\rthree\n", "md5")
+
+    assert document.text == "one\ntwo\nthree\n"
+
+
+def test_digest_is_calculated_from_raw_content(document):
+    assert document.digest == hashlib.md5(b"first\r\nsecond\n").hexdigest()
+
+
+def test_write_saves_text_and_updates_digest(document, file):
+    document.write("new text\n")
+
+    with open(file, mode="rb") as f:
+        content = f.read()
+    assert content == f"new text{os.linesep}".encode("utf-8")
+    assert document.text == "new text\n"
+    assert document.digest == hashlib.md5(content).hexdigest()
+
+
+def test_write_forgets_signature(document):
+    document.write("new text\n")
+
+    assert document.signature is None
+
+
+def test_write_skips_unchanged_text(document, file):
+    signature = document.signature
+
+    document.write("first\nsecond\n")
+
+    with open(file, mode="rb") as f:
+        assert f.read() == b"first\r\nsecond\n"
+    assert document.signature == signature
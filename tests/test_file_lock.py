@@ -0,0 +1,32 @@
+from inka2.models.file_lock import FileLock
+
+
+def test_acquire_and_release(tmp_path):
+    lock = FileLock(tmp_path / "file.lock")
+
+    assert lock.acquire()
+    assert lock.is_locked
+
+    lock.release()
+    assert not lock.is_locked
+
+
+def test_acquire_fails_when_lock_is_held(tmp_path):
+    first = FileLock(tmp_path / "file.lock")
+    second = FileLock(tmp_path / "file.lock")
+    first.acquire()
+
+    assert not second.acquire()
+    assert not second.is_locked
+
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_acquire_is_reentrant(tmp_path):
+    lock = FileLock(tmp_path / "file.lock")
+    lock.acquire()
+
+    assert lock.acquire()
+    lock.release()
@@ -0,0 +1,283 @@
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+
+from inka2.models.file_walker import FileWalker
+from inka2.models.hasher import RACY_WINDOW_NS
+from inka2.models.ignore_rules import IgnoreRules
+from inka2.models.state_store import StateStore
+
+
+@pytest.fixture
+def vault(tmp_path) -> str:
+    """Folder with Markdown files on different levels"""
+    (tmp_path / "sub" / "deeper").mkdir(parents=True)
+    (tmp_path / "a.md").touch()
+    (tmp_path / "b.txt").touch()
+    (tmp_path / "sub" / "c.markdown").touch()
+    (tmp_path / "sub" / "deeper" / "d.md").touch()
+    return os.path.realpath(tmp_path)
+
+
+def test_walk_finds_files_only_in_directory(vault):
+    walker = FileWalker([".md", ".markdown"])
+
+    assert list(walker.walk([vault])) == [os.path.join(vault, "a.md")]
+
+
+def test_walk_recursive_finds_files_in_subdirectories(vault):
+    walker = FileWalker([".md", ".markdown"], recursive=True)
+
+    files = set(walker.walk([vault]))
+
+    assert files == {
+        os.path.join(vault, "a.md"),
+        os.path.join(vault, "sub", "c.markdown"),
+        os.path.join(vault, "sub", "deeper", "d.md"),
+    }
+    assert walker.files_found == 3
+
+
+def test_walk_yields_paths_to_files_regardless_of_extension(vault):
+    walker = FileWalker([".md"])
+
+    files = list(walker.walk([os.path.join(vault, "b.txt")]))
+
+    assert files == [os.path.join(vault, "b.txt")]
+
+
+def test_walk_yields_each_file_once(vault):
+    walker = FileWalker([".md"], recursive=True)
+
+    files = list(walker.walk([vault, os.path.join(vault, "sub"), vault + "/a.md"]))
+
+    assert len(files) == len(set(files)) == 2
+
+
+def test_walk_does_not_change_working_directory(vault):
+    cwd = os.getcwd()
+    walker = FileWalker([".md"], recursive=True)
+
+    for _ in walker.walk([vault]):
+        assert os.getcwd() == cwd
+
+
+def test_walk_is_lazy(vault):
+    walker = FileWalker([".md"], recursive=True)
+
+    next(walker.walk([vault]))
+
+    assert walker.files_found == 1
+
+
+def test_walk_resolves_symlinks(vault):
+    os.symlink(os.path.join(vault, "a.md"), os.path.join(vault, "sub", "link.md"))
+    walker = FileWalker([".md"], recursive=True)
+
+    files = list(walker.walk([os.path.join(vault, "sub")]))
+
+    assert sorted(files) == [
+        os.path.join(vault, "a.md"),
+        os.path.join(vault, "sub", "deeper", "d.md"),
+    ]
+
+
+def test_walk_survives_symlink_loop(vault):
+    os.symlink(vault, os.path.join(vault, "sub", "deeper", "loop"))
+    walker = FileWalker([".md"], recursive=True)
+
+    files = list(walker.walk([vault]))
+
+    assert sorted(files) == [
+        os.path.join(vault, "a.md"),
+        os.path.join(vault, "sub", "deeper", "d.md"),
+    ]
+
+
+def test_walk_applies_file_filter(vault):
+    walker = FileWalker(
+        [".md"], recursive=True, file_filter=lambda path: path.endswith("d.md")
+    )
+
+    files = list(walker.walk([vault]))
+
+    assert files == [os.path.join(vault, "sub", "deeper", "d.md")]
+    assert walker.files_found == 2
+    assert walker.files_yielded == 1
+
+
+def test_walk_records_unreadable_directory(vault, monkeypatch):
+    def scandir(path):
+        raise PermissionError(13, "Permission denied", path)
+
+    monkeypatch.setattr(os, "scandir", scandir)
+    walker = FileWalker([".md"])
+
+    assert list(walker.walk([vault])) == []
+    assert walker.errors[0].filename == vault
+
+
+# patterns
+def test_walk_prunes_directories_from_inkaignore(vault, monkeypatch):
+    (Path(vault) / ".inkaignore").write_text("deeper/\n", encoding="utf-8")
+    scanned = []
+    scandir = os.scandir
+
+    def scandir_spy(path):
+        scanned.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", scandir_spy)
+    walker = FileWalker([".md", ".markdown"], recursive=True)
+
+    files = set(walker.walk([vault]))
+
+    assert os.path.join(vault, "sub", "deeper", "d.md") not in files
+    assert os.path.join(vault, "sub", "deeper") not in scanned
+    assert walker.entries_pruned == 1
+
+
+def test_nested_inkaignore_takes_precedence(vault):
+    (Path(vault) / ".inkaignore").write_text("*.md\n", encoding="utf-8")
+    (Path(vault) / "sub" / ".inkaignore").write_text("!d.md\n", encoding="utf-8")
+    walker = FileWalker([".md"], recursive=True)
+
+    assert list(walker.walk([vault])) == [os.path.join(vault, "sub", "deeper", "d.md")]
+
+
+def test_exclude_takes_precedence_over_inkaignore(vault):
+    (Path(vault) / ".inkaignore").write_text("!a.md\n", encoding="utf-8")
+    walker = FileWalker([".md"], recursive=True, exclude=IgnoreRules(["a.md"]))
+
+    assert list(walker.walk([vault])) == [os.path.join(vault, "sub", "deeper", "d.md")]
+
+
+def test_include_limits_files(vault):
+    walker = FileWalker(
+        [".md", ".markdown"], recursive=True, include=IgnoreRules(["sub/**/*.md"])
+    )
+
+    assert list(walker.walk([vault])) == [os.path.join(vault, "sub", "deeper", "d.md")]
+    assert walker.entries_pruned == 2
+
+
+def test_include_directory_selects_files_inside_it(vault):
+    walker = FileWalker(
+        [".md", ".markdown"], recursive=True, include=IgnoreRules(["sub/"])
+    )
+
+    assert set(walker.walk([vault])) == {
+        os.path.join(vault, "sub", "c.markdown"),
+        os.path.join(vault, "sub", "deeper", "d.md"),
+    }
+
+
+def test_patterns_do_not_apply_to_paths_of_files(vault):
+    walker = FileWalker([".md"], exclude=IgnoreRules(["*.md"]))
+
+    assert list(walker.walk([os.path.join(vault, "a.md")])) == [
+        os.path.join(vault, "a.md")
+    ]
+
+
+# select
+def test_select_applies_rules_of_the_last_walk(vault):
+    (Path(vault) / "sub" / ".inkaignore").write_text("new.md\n", encoding="utf-8")
+    walker = FileWalker([".md"], recursive=True, exclude=IgnoreRules(["old.md"]))
+    list(walker.walk([vault, os.path.join(vault, "b.txt")]))
+
+    selected = walker.select(
+        [
+            os.path.join(vault, "new.md"),
+            os.path.join(vault, "old.md"),
+            os.path.join(vault, "c.txt"),
+            os.path.join(vault, "b.txt"),
+            os.path.join(vault, "sub", "new.md"),
+            os.path.join(vault, "sub", "deeper", "new.md"),
+        ]
+    )
+
+    assert selected == [
+        os.path.join(vault, "new.md"),
+        os.path.join(vault, "b.txt"),
+    ]
+
+
+def test_select_needs_walk_for_directories_created_after_it(vault):
+    walker = FileWalker([".md"], recursive=True)
+    list(walker.walk([vault]))
+    (Path(vault) / "new").mkdir()
+
+    assert walker.select([os.path.join(vault, "new", "e.md")]) is None
+    assert walker.select([]) == []
+
+
+# cache
+@pytest.fixture
+def store(tmp_path_factory) -> StateStore:
+    store = StateStore(tmp_path_factory.mktemp("state") / "state.db")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def old_vault(vault) -> str:
+    """Vault whose directories were modified long enough ago to be cached"""
+    for directory in (vault, f"{vault}/sub", f"{vault}/sub/deeper"):
+        os.utime(directory, ns=(0, time.time_ns() - 10 * RACY_WINDOW_NS))
+    return vault
+
+
+def test_walk_reuses_listings_of_unchanged_directories(old_vault, store):
+    expected = set(FileWalker([".md"], recursive=True, cache=store).walk([old_vault]))
+    walker = FileWalker([".md"], recursive=True, cache=store)
+
+    files = set(walker.walk([old_vault]))
+
+    assert files == expected
+    assert walker.directories_scanned == 0
+    assert walker.directories_cached == 3
+
+
+def test_walk_scans_changed_directories(old_vault, store):
+    list(FileWalker([".md"], recursive=True, cache=store).walk([old_vault]))
+    (Path(old_vault) / "sub" / "new.md").touch()
+    walker = FileWalker([".md"], recursive=True, cache=store)
+
+    files = set(walker.walk([old_vault]))
+
+    assert os.path.join(old_vault, "sub", "new.md") in files
+    assert walker.directories_scanned == 1
+    assert walker.directories_cached == 2
+
+
+def test_walk_does_not_cache_recently_modified_directories(vault, store):
+    list(FileWalker([".md"], recursive=True, cache=store).walk([vault]))
+
+    assert store.get_directory(vault) is None
+
+
+def test_walk_forgets_removed_directories(old_vault, store):
+    list(FileWalker([".md"], recursive=True, cache=store).walk([old_vault]))
+    shutil.rmtree(os.path.join(old_vault, "sub"))
+
+    list(FileWalker([".md"], recursive=True, cache=store).walk([old_vault]))
+
+    assert store.get_directory(os.path.join(old_vault, "sub")) is None
+    assert store.get_directory(os.path.join(old_vault, "sub", "deeper")) is None
+
+
+def test_walk_rereads_inkaignore_of_cached_directory(old_vault, store):
+    ignore_file = Path(old_vault) / ".inkaignore"
+    ignore_file.write_text("a.md\n", encoding="utf-8")
+    os.utime(old_vault, ns=(0, time.time_ns() - 10 * RACY_WINDOW_NS))
+    list(FileWalker([".md"], recursive=True, cache=store).walk([old_vault]))
+    ignore_file.write_text("deeper/\n", encoding="utf-8")
+    os.utime(old_vault, ns=(0, time.time_ns() - 10 * RACY_WINDOW_NS))
+
+    files = list(FileWalker([".md"], recursive=True, cache=store).walk([old_vault]))
+
+    assert files == [os.path.join(old_vault, "a.md")]
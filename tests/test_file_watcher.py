@@ -0,0 +1,114 @@
+import os
+from typing import List, Optional, Set
+
+import pytest
+
+from inka2.models.file_watcher import (
+    FileWatcher,
+    InotifyWatcher,
+    PollingWatcher,
+    is_inotify_supported,
+)
+
+inotify_only = pytest.mark.skipif(
+    not is_inotify_supported(), reason="inotify is available only on Linux"
+)
+
+
+class FakeWatcher(FileWatcher):
+    """Watcher that returns prepared changes"""
+
+    def __init__(self, changes: List[Optional[Set[str]]]):
+        self.changes = changes
+        self.timeouts: List[Optional[float]] = []
+
+    def read_changes(self, timeout: Optional[float]) -> Optional[Set[str]]:
+        self.timeouts.append(timeout)
+        return self.changes.pop(0)
+
+
+@pytest.fixture
+def directory(tmp_path) -> str:
+    return os.path.realpath(tmp_path)
+
+
+# wait_for_changes
+def test_wait_for_changes_coalesces_burst():
+    watcher = FakeWatcher([set(), {"a.md"}, {"b.md"}, {"a.md"}, set()])
+
+    assert watcher.wait_for_changes(0.5) == {"a.md", "b.md"}
+    assert watcher.timeouts == [None, None, 0.5, 0.5, 0.5]
+
+
+def test_wait_for_changes_returns_none_when_events_are_lost():
+    watcher = FakeWatcher([{"a.md"}, None])
+
+    assert watcher.wait_for_changes(0.5) is None
+
+
+# InotifyWatcher
+@inotify_only
+def test_inotify_reports_saved_files(directory):
+    watcher = InotifyWatcher([directory], [".md"], recursive=False)
+    with open(os.path.join(directory, "a.md"), mode="wt") as f:
+        f.write("text")
+    with open(os.path.join(directory, "b.txt"), mode="wt") as f:
+        f.write("text")
+
+    changes = watcher.read_changes(1.0)
+    watcher.close()
+
+    assert changes == {os.path.join(directory, "a.md")}
+
+
+@inotify_only
+def test_inotify_reports_renamed_files(directory):
+    watcher = InotifyWatcher([directory], [".md"], recursive=False)
+    with open(os.path.join(directory, "a.md~"), mode="wt") as f:
+        f.write("text")
+    watcher.read_changes(1.0)
+    os.rename(os.path.join(directory, "a.md~"), os.path.join(directory, "a.md"))
+
+    changes = watcher.read_changes(1.0)
+    watcher.close()
+
+    assert changes == {os.path.join(directory, "a.md")}
+
+
+@inotify_only
+def test_inotify_watches_new_directories(directory):
+    watcher = InotifyWatcher([directory], [".md"], recursive=True)
+    os.mkdir(os.path.join(directory, "sub"))
+    watcher.read_changes(1.0)
+    with open(os.path.join(directory, "sub", "a.md"), mode="wt") as f:
+        f.write("text")
+
+    changes = watcher.read_changes(1.0)
+    watcher.close()
+
+    assert changes == {os.path.join(directory, "sub", "a.md")}
+
+
+@inotify_only
+def test_inotify_returns_nothing_after_timeout(directory):
+    watcher = InotifyWatcher([directory], [".md"], recursive=False)
+
+    assert watcher.read_changes(0.01) == set()
+    watcher.close()
+
+
+# PollingWatcher
+def test_polling_reports_new_and_modified_files(directory):
+    first, second = os.path.join(directory, "a.md"), os.path.join(directory, "b.md")
+    with open(first, mode="wt") as f:
+        f.write("text")
+    files = [first]
+    watcher = PollingWatcher(lambda: files, interval=0.01)
+    with open(first, mode="at") as f:
+        f.write(" more text")
+    with open(second, mode="wt") as f:
+        f.write("text")
+    files.append(second)
+
+    assert watcher.read_changes(0) == {first, second}
+    assert watcher.read_changes(0) == set()
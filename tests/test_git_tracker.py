@@ -0,0 +1,103 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from inka2.exceptions import GitError
+from inka2.models.git_tracker import GitTracker
+from inka2.models.state_store import StateStore
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="requires git")
+
+
+def git(repo, *args) -> str:
+    return subprocess.run(
+        [
+            "git",
+            "-c",
+            "user.name=test",
+            "-c",
+            "user.email=test@example.com",
+            *args,
+        ],
+        cwd=repo,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+@pytest.fixture
+def repo(tmp_path) -> str:
+    path = tmp_path / "vault"
+    path.mkdir()
+    git(path, "init", "-q")
+    (path / "a.md").write_text("a", encoding="utf-8")
+    (path / "b.md").write_text("b", encoding="utf-8")
+    git(path, "add", ".")
+    git(path, "commit", "-q", "-m", "initial")
+    return os.path.realpath(path)
+
+
+@pytest.fixture
+def tracker(repo) -> GitTracker:
+    return GitTracker(repo)
+
+
+def test_tracker_when_directory_is_not_repository(tmp_path):
+    with pytest.raises(GitError):
+        GitTracker(str(tmp_path))
+
+
+def test_root_when_created_from_subdirectory(repo):
+    os.mkdir(os.path.join(repo, "sub"))
+
+    assert GitTracker(os.path.join(repo, "sub")).root == repo
+
+
+def test_get_changed_files_when_nothing_changed(tracker):
+    assert tracker.get_changed_files(tracker.get_head()) == set()
+
+
+def test_get_changed_files_includes_commits_dirty_and_untracked_files(repo, tracker):
+    initial = tracker.get_head()
+    with open(os.path.join(repo, "a.md"), mode="at", encoding="utf-8") as f:
+        f.write("committed")
+    git(repo, "commit", "-q", "-am", "change a")
+    with open(os.path.join(repo, "b.md"), mode="at", encoding="utf-8") as f:
+        f.write("dirty")
+    with open(os.path.join(repo, "new file.md"), mode="wt", encoding="utf-8") as f:
+        f.write("untracked")
+
+    changed = tracker.get_changed_files(initial)
+
+    assert changed == {
+        os.path.join(repo, "a.md"),
+        os.path.join(repo, "b.md"),
+        os.path.join(repo, "new file.md"),
+    }
+
+
+@pytest.mark.skipif(os.name != "posix", reason="requires bytes file names")
+def test_get_changed_files_with_non_utf8_name(repo, tracker):
+    name = os.fsencode(repo) + b"/caf\xe9.md"
+    with open(name, mode="wb") as f:
+        f.write(b"untracked")
+
+    assert tracker.get_changed_files(tracker.get_head()) == {os.fsdecode(name)}
+
+
+def test_get_changed_files_when_ref_is_incorrect(tracker):
+    with pytest.raises(GitError):
+        tracker.get_changed_files("does-not-exist")
+
+
+def test_last_synced_commit(tracker, tmp_path):
+    store = StateStore(tmp_path / "state.db")
+
+    assert tracker.get_last_synced_commit(store) is None
+
+    tracker.set_last_synced_commit(store, tracker.get_head())
+
+    assert tracker.get_last_synced_commit(store) == tracker.get_head()
@@ -1,8 +1,10 @@
+import hashlib
 import os
 
 import pytest
 
-from inka2.models.hasher import Hasher
+from inka2.models.hasher import CHUNK_SIZE, FileHash, Hasher
+from inka2.models.state_store import StateStore
 
 
 @pytest.fixture
@@ -15,32 +17,48 @@ def test_file(tmp_path) -> str:
 
 
 @pytest.fixture
-def file_with_hashes(tmp_path) -> str:
-    path = str(tmp_path / "test_file_with_hashes.json")
-    with open(path, mode="wt", encoding="utf-8") as f:
-        f.write(
-            "{\n"
-            '"fake1.md": "724ae4e3bf11c04581daf1bb4de43161",\n'
-            '"fake2.md": "123ae4a4bf1ac04581daf1bb4de43161"\n'
-            "}"
-        )
+def store_path(tmp_path) -> str:
+    path = str(tmp_path / "state.db")
+    store = StateStore(path)
+    store.update_file("fake1.md", "724ae4e3bf11c04581daf1bb4de43161", "md5")
+    store.update_file("fake2.md", "123ae4a4bf1ac04581daf1bb4de43161", "md5")
+    store.close()
+    return path
 
-    yield path
-    os.remove(path)
+
+@pytest.fixture
+def store(store_path: str) -> StateStore:
+    store = StateStore(store_path)
+    yield store
+    store.close()
 
 
 @pytest.fixture
-def hasher(file_with_hashes: str) -> Hasher:
-    return Hasher(file_with_hashes)
+def hasher(store: StateStore) -> Hasher:
+    return Hasher(store, algorithm="md5")
 
 
 # calculate_hash
 def test_calculate_hash_when_file_exists(test_file):
     expected = "724ae4e3bf11c04581daf1bb4de43161"
 
+    assert Hasher.calculate_hash(test_file, "md5") == expected
+
+
+def test_calculate_hash_uses_blake2b_by_default(test_file):
+    expected = hashlib.blake2b(b"Hello, **WORLD**!").hexdigest()
+
     assert Hasher.calculate_hash(test_file) == expected
 
 
+def test_calculate_hash_of_file_larger_than_chunk(tmp_path):
+    path = tmp_path / "large.md"
+    content = os.urandom(CHUNK_SIZE * 2 + 10)
+    path.write_bytes(content)
+
+    assert Hasher.calculate_hash(str(path)) == hashlib.blake2b(content).hexdigest()
+
+
 def test_calculate_hash_when_file_does_not_exist_raises_error():
     with pytest.raises(FileNotFoundError):
         Hasher.calculate_hash("does_not_exist.json")
@@ -60,57 +78,256 @@ def test_has_changed_when_file_hash_does_not_exist_in_data_file(hasher):
 
 
 # update_hash
-def test_update_hash_when_file_hash_exists_in_data_file(hasher, file_with_hashes):
+def test_update_hash_when_file_hash_exists_in_data_file(hasher, store_path):
     new_hash = "111ae1e31111c04581daf1bb4de43161"
-    expected = (
-        "{"
-        f'"fake1.md": "{new_hash}", '
-        '"fake2.md": "123ae4a4bf1ac04581daf1bb4de43161"'
-        "}"
-    )
 
     hasher.update_hash("fake1.md", new_hash)
 
-    with open(file_with_hashes, mode="rt", encoding="utf-8") as f:
-        assert f.read() == expected
+    stored = StateStore(store_path)
+    assert stored.get_file("fake1.md").digest == new_hash
+    assert stored.get_file("fake2.md").digest == "123ae4a4bf1ac04581daf1bb4de43161"
 
 
-def test_update_hash_when_file_hash_does_not_exist_in_data_file(
-    hasher, file_with_hashes
-):
+def test_update_hash_when_file_hash_does_not_exist_in_data_file(hasher, store_path):
     filename = "my_file_path.md"
     new_hash = "111ae1e31111c04581daf1bb4de43161"
-    expected = (
-        "{"
-        '"fake1.md": "724ae4e3bf11c04581daf1bb4de43161", '
-        '"fake2.md": "123ae4a4bf1ac04581daf1bb4de43161", '
-        f'"{filename}": "{new_hash}"'
-        "}"
-    )
 
     hasher.update_hash(filename, new_hash)
 
-    with open(file_with_hashes, mode="rt", encoding="utf-8") as f:
-        assert f.read() == expected
+    stored = StateStore(store_path)
+    assert stored.get_file(filename).digest == new_hash
+    assert stored.get_file("fake1.md").digest == "724ae4e3bf11c04581daf1bb4de43161"
 
 
 # reset_hashes
-def test_reset_hashes_when_data_file_does_not_exist():
-    path = "some_random_path.json"
-    hasher = Hasher(path)
-    expected = "{}"
+def test_reset_hashes_when_data_file_does_not_exist(tmp_path):
+    hasher = Hasher(StateStore(tmp_path / "new.db"))
 
     hasher.reset_hashes()
 
-    with open(path, mode="rt", encoding="utf-8") as f:
-        assert f.read() == expected
-    os.remove(path)
+    assert StateStore(tmp_path / "new.db").get_file("fake1.md") is None
+
+
+def test_reset_hashes_when_data_file_contains_hashes(hasher, store_path):
+    hasher.reset_hashes()
+
+    stored = StateStore(store_path)
+    assert stored.get_file("fake1.md") is None
+    assert stored.get_file("fake2.md") is None
+
+
+# stat signature
+def test_is_unchanged_by_stat_when_signature_same(hasher, test_file):
+    signature = Hasher.get_stat_signature(test_file)
+    old_signature = (signature[0] - 10**10, signature[1], signature[2])
+    hasher.update_hash(test_file, Hasher.calculate_hash(test_file), old_signature)
+
+    assert hasher.is_unchanged_by_stat(test_file, old_signature)
+    assert hasher.stat_hits == 1
+
+
+def test_is_unchanged_by_stat_when_signature_different(hasher, test_file):
+    signature = Hasher.get_stat_signature(test_file)
+    old_signature = (signature[0] - 10**10, signature[1], signature[2])
+    hasher.update_hash(test_file, Hasher.calculate_hash(test_file), old_signature)
+
+    assert not hasher.is_unchanged_by_stat(test_file, (1, 2, 3))
+    assert hasher.stat_hits == 0
+
+
+def test_is_unchanged_by_stat_when_only_hash_stored(hasher):
+    assert not hasher.is_unchanged_by_stat("fake1.md", (1, 2, 3))
+
+
+def test_is_unchanged_by_stat_in_paranoid_mode(store, test_file):
+    hasher = Hasher(store, algorithm="md5", paranoid=True)
+    hasher.update_hash(test_file, Hasher.calculate_hash(test_file), (1, 2, 3))
+
+    assert not hasher.is_unchanged_by_stat(test_file, (1, 2, 3))
+
+
+def test_update_hash_does_not_store_racy_signature(hasher, test_file):
+    signature = Hasher.get_stat_signature(test_file)  # file was just created
+    hasher.update_hash(test_file, Hasher.calculate_hash(test_file), signature)
+
+    assert not hasher.is_unchanged_by_stat(test_file, signature)
+    assert not hasher.has_changed(test_file, Hasher.calculate_hash(test_file))
+
+
+def test_hash_file_counts_content_hashes(hasher, test_file):
+    hasher.hash_file(test_file)
+    hasher.hash_file(test_file)
+
+    assert hasher.content_hashes == 2
+
+
+# deferred saving
+def test_update_hash_with_batching_keeps_updates_uncommitted(store, store_path):
+    hasher = Hasher(store, flush_every=3)
+
+    hasher.update_hash("a.md", "1")
+    hasher.update_hash("b.md", "2")
+
+    assert StateStore(store_path).get_file("a.md") is None
+    assert not hasher.has_changed("a.md", "1")
+
+
+def test_update_hash_with_batching_saves_every_n_updates(store, store_path):
+    hasher = Hasher(store, flush_every=2)
+
+    hasher.update_hash("a.md", "1")
+    hasher.update_hash("b.md", "2")
+
+    assert not Hasher(StateStore(store_path)).has_changed("b.md", "2")
+
+
+def test_update_hash_with_batching_saves_after_interval(store, store_path):
+    hasher = Hasher(store, flush_every=100, flush_interval=0)
 
+    hasher.update_hash("a.md", "1")
 
-def test_reset_hashes_when_data_file_contains_hashes(hasher, file_with_hashes):
-    expected = "{}"
+    assert not Hasher(StateStore(store_path)).has_changed("a.md", "1")
+
+
+def test_flush_saves_pending_updates(store, store_path):
+    hasher = Hasher(store, flush_every=100)
+    hasher.update_hash("a.md", "1")
+
+    hasher.flush()
+
+    assert not Hasher(StateStore(store_path)).has_changed("a.md", "1")
+
+
+# algorithm
+def test_unknown_algorithm_raises_error(store):
+    with pytest.raises(ValueError):
+        Hasher(store, algorithm="unknown")
+
+
+@pytest.mark.parametrize("algorithm", ["shake_128", "shake_256"])
+def test_variable_length_algorithm_raises_error(store, algorithm):
+    with pytest.raises(ValueError, match="variable length"):
+        Hasher(store, algorithm=algorithm)
+
+
+def test_has_changed_compares_using_stored_algorithm(store, test_file):
+    store.update_file(test_file, "724ae4e3bf11c04581daf1bb4de43161", "md5")
+    hasher = Hasher(store)
+
+    assert not hasher.has_changed(test_file, Hasher.calculate_hash(test_file))
+
+
+def test_has_changed_compares_legacy_hash_of_text_with_translated_newlines(
+    store, tmp_path
+):
+    path = str(tmp_path / "crlf.md")
+    with open(path, mode="wb") as f:
+        f.write(b"---\r\n1. Question\r\n> Answer\r\n---\r\n")
+    # Previous versions read files in text mode
+    legacy_digest = hashlib.md5(b"---\n1. Question\n> Answer\n---\n").hexdigest()
+    store.update_file(path, legacy_digest, "md5")
+    hasher = Hasher(store)
+
+    assert not hasher.has_changed(path, Hasher.calculate_hash(path))
+
+
+def test_update_hash_replaces_stored_algorithm(store, test_file):
+    store.update_file(test_file, "724ae4e3bf11c04581daf1bb4de43161", "md5")
+    hasher = Hasher(store)
+
+    hasher.update_hash(test_file, Hasher.calculate_hash(test_file))
+
+    assert store.get_file(test_file).algorithm == "blake2b"
+
+
+# get_changed_files
+@pytest.fixture
+def md_files(tmp_path) -> list:
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"file{i}.md"
+        path.write_text(f"content {i}", encoding="utf-8")
+        os.utime(path, ns=(10**18, 10**18 + i))  # not racy
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_get_changed_files_when_files_are_new(hasher, md_files, jobs):
+    changed = hasher.get_changed_files(md_files, jobs)
+
+    assert list(changed) == md_files
+    assert changed[md_files[0]] == FileHash(
+        Hasher.calculate_hash(md_files[0], "md5"),
+        Hasher.get_stat_signature(md_files[0]),
+    )
+    assert hasher.content_hashes == 5
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_get_changed_files_skips_unchanged_files(hasher, md_files, jobs):
+    for path in md_files:
+        signature = Hasher.get_stat_signature(path)
+        hasher.update_hash(path, Hasher.calculate_hash(path, "md5"), signature)
+    with open(md_files[2], mode="at", encoding="utf-8") as f:
+        f.write(" changed")
+
+    changed = hasher.get_changed_files(md_files, jobs)
+
+    assert list(changed) == [md_files[2]]
+    assert hasher.stat_hits == 4
+    assert hasher.content_hashes == 1
+
+
+def test_get_changed_files_updates_signature_of_unchanged_file(hasher, md_files):
+    hasher.update_hash(md_files[0], Hasher.calculate_hash(md_files[0], "md5"))
+
+    changed = hasher.get_changed_files(md_files[:1])
+
+    assert changed == {}
+    assert hasher.is_unchanged_by_stat(
+        md_files[0], Hasher.get_stat_signature(md_files[0])
+    )
+
+
+def test_get_changed_files_when_file_does_not_exist(hasher):
+    assert hasher.get_changed_files(["does_not_exist.md"]) == {
+        "does_not_exist.md": None
+    }
+
+
+# section hashes
+def test_update_section_hashes(hasher):
+    hasher.update_section_hashes("a.md", ["First\n", "Second\n", "First\n"])
+
+    assert hasher.get_section_hashes("a.md") == {
+        hasher.hash_text("First\n"),
+        hasher.hash_text("Second\n"),
+    }
+
+
+def test_update_section_hashes_replaces_previous_hashes(hasher):
+    hasher.update_section_hashes("a.md", ["First\n"])
+    hasher.update_section_hashes("a.md", ["Second\n"])
+
+    assert hasher.get_section_hashes("a.md") == {hasher.hash_text("Second\n")}
+
+
+def test_reset_hashes_removes_section_hashes(hasher):
+    hasher.update_section_hashes("a.md", ["First\n"])
 
     hasher.reset_hashes()
 
-    with open(file_with_hashes, mode="rt", encoding="utf-8") as f:
-        assert f.read() == expected
+    assert hasher.get_section_hashes("a.md") == set()
+
+
+def test_read_document(hasher, tmp_path):
+    path = tmp_path / "file.md"
+    path.write_bytes(b"first\r\nsecond\n")
+
+    document = hasher.read_document(str(path))
+
+    assert document.digest == Hasher.calculate_hash(str(path), "md5")
+    assert document.text == "first\nsecond\n"
+    assert document.signature == Hasher.get_stat_signature(str(path))
+    assert hasher.content_hashes == 1
@@ -1,4 +1,6 @@
-from inka2.helpers import parse_str_to_bool
+import pytest
+
+from inka2.helpers import parse_duration, parse_str_to_bool
 
 
 def test_parse_str_to_bool():
@@ -43,3 +45,17 @@ def test_parse_str_to_bool():
     assert parse_str_to_bool("true") is True
     assert parse_str_to_bool("false") is False
     assert parse_str_to_bool("True ") is True
+
+
+@pytest.mark.parametrize(
+    "string, seconds",
+    [("20s", 20), ("1.5m", 90), ("2h", 7200), ("90", 90), (" 5S ", 5)],
+)
+def test_parse_duration(string, seconds):
+    assert parse_duration(string) == seconds
+
+
+@pytest.mark.parametrize("string", ["", "s", "abc", "0s", "-5", "inf", "nan"])
+def test_parse_duration_with_invalid_string_raises_error(string):
+    with pytest.raises(ValueError):
+        parse_duration(string)
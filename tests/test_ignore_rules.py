@@ -0,0 +1,70 @@
+import pytest
+
+from inka2.models.ignore_rules import IgnoreRules
+
+
+@pytest.mark.parametrize(
+    "pattern, path, is_dir, expected",
+    [
+        ("*.md", "a.md", False, True),
+        ("*.md", "sub/a.md", False, True),
+        ("*.md", "a.markdown", False, None),
+        ("draft?.md", "draft1.md", False, True),
+        ("draft[0-9].md", "draftx.md", False, None),
+        ("draft[!0-9].md", "draftx.md", False, True),
+        ("attachments/", "attachments", True, True),
+        ("attachments/", "attachments", False, None),
+        ("attachments/", "notes/attachments", True, True),
+        ("/archive", "archive", True, True),
+        ("/archive", "sub/archive", True, None),
+        ("notes/old", "notes/old", True, True),
+        ("notes/old", "sub/notes/old", True, None),
+        ("**/old", "a/b/old", True, True),
+        ("notes/**/old.md", "notes/old.md", False, True),
+        ("notes/**/old.md", "notes/a/b/old.md", False, True),
+        ("notes/**", "notes/a/b.md", False, True),
+        ("*.md", "sub/dir", True, None),
+        ("\\#hash.md", "#hash.md", False, True),
+    ],
+)
+def test_match(pattern, path, is_dir, expected):
+    assert IgnoreRules([pattern]).match(path, is_dir) is expected
+
+
+def test_last_matching_pattern_wins():
+    rules = IgnoreRules(["*.md", "!keep.md"])
+
+    assert rules.match("keep.md", False) is False
+    assert rules.match("other.md", False) is True
+
+
+@pytest.mark.parametrize(
+    "patterns, path, expected",
+    [
+        (["notes/"], "notes/a.md", True),
+        (["notes/"], "notes/sub/a.md", True),
+        (["notes/"], "other/a.md", None),
+        (["notes/"], "notes.md", None),
+        (["notes/", "!notes/drafts/"], "notes/drafts/a.md", False),
+        (["*.md", "!notes/"], "notes/a.md", True),
+    ],
+)
+def test_match_file_checks_directories_of_file(patterns, path, expected):
+    assert IgnoreRules(patterns).match_file(path) is expected
+
+
+def test_comments_and_blank_lines_are_skipped():
+    rules = IgnoreRules(["# comment", "", "   "])
+
+    assert not rules
+    assert rules.match("# comment", False) is None
+
+
+def test_from_file(tmp_path):
+    path = tmp_path / ".inkaignore"
+    path.write_text("drafts/\n*.tmp.md\n", encoding="utf-8")
+
+    rules = IgnoreRules.from_file(str(path))
+
+    assert rules.match("drafts", True)
+    assert rules.match("a.tmp.md", False)
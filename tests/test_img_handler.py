@@ -1,6 +1,7 @@
 import os
 
 import pytest
+from PIL import Image as Img
 
 from inka2.models import img_handler
 from inka2.models.notes.basic_note import BasicNote
@@ -242,3 +243,48 @@ def test_handle_images_copies_images_to_anki_media(
     img_handler.handle_images_in([card], anki_media)
 
     os.path.exists(path_to_anki_image)
+
+
+def test_handle_images_resolves_paths_relative_to_base_dir(anki_media, tmp_path):
+    (tmp_path / "images").mkdir()
+    Img.new("RGBA", size=(50, 50), color=(0, 155, 0)).save(
+        tmp_path / "images" / "relative.png", format="png"
+    )
+    card = BasicNote(
+        "Some text", "![img](images/relative.png)", tags=[], deck_name="deck"
+    )
+
+    img_handler.handle_images_in([card], anki_media, base_dir=tmp_path)
+
+    assert anki_media.exists("relative.png")
+    assert card.updated_back_md == "![img](relative.png)"
+    os.remove(os.path.join(anki_media._anki_media_path, "relative.png"))
+
+
+def test_get_abs_path_from_keeps_absolute_paths():
+    assert img_handler._get_abs_path_from("![](/images/a.png)", "/notes") == (
+        os.path.realpath("/images/a.png")
+    )
+
+
+def test_copy_images_in_does_not_change_notes(anki_media, tmp_path):
+    Img.new("RGBA", size=(50, 50), color=(0, 155, 0)).save(
+        tmp_path / "copied.png", format="png"
+    )
+    card = BasicNote("Some text", "![img](copied.png)", tags=[], deck_name="deck")
+
+    img_handler.copy_images_in([card], anki_media, base_dir=tmp_path)
+
+    assert anki_media.exists("copied.png")
+    assert card.updated_back_md == "![img](copied.png)"
+    os.remove(os.path.join(anki_media._anki_media_path, "copied.png"))
+
+
+def test_update_image_links_in_does_not_copy_images():
+    card = BasicNote(
+        "Some text", "![img](/path/to/non-existing.png)", tags=[], deck_name="deck"
+    )
+
+    img_handler.update_image_links_in([card])
+
+    assert card.updated_back_md == "![img](non-existing.png)"
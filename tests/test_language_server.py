@@ -0,0 +1,155 @@
+import io
+import json
+from typing import List
+
+from inka2.models.language_server import (
+    METHOD_NOT_FOUND,
+    PARSE_ERROR,
+    SERVER_NOT_INITIALIZED,
+    LanguageServer,
+)
+
+URI = "file:///notes.md"
+TEXT = "---\nDeck: A\n1. Question?\n> Answer\n---\n"
+
+
+def frame(message: dict) -> bytes:
+    content = json.dumps(message).encode("utf-8")
+    return b"Content-Length: %d\r\n\r\n" % len(content) + content
+
+
+def request(message_id: int, method: str, params=None) -> bytes:
+    return frame(
+        {"jsonrpc": "2.0", "id": message_id, "method": method, "params": params}
+    )
+
+
+def notification(method: str, params: dict) -> bytes:
+    return frame({"jsonrpc": "2.0", "method": method, "params": params})
+
+
+def run(*messages: bytes) -> tuple:
+    """Run the server on the messages. Returns exit code and messages it sent."""
+    writer = io.BytesIO()
+    server = LanguageServer(io.BytesIO(b"".join(messages)), writer, "Default")
+    code = server.run()
+
+    sent: List[dict] = []
+    data = writer.getvalue()
+    while data:
+        header, _, data = data.partition(b"\r\n\r\n")
+        length = int(header.split(b":")[1])
+        sent.append(json.loads(data[:length]))
+        data = data[length:]
+    return code, sent
+
+
+def open_document(text: str = TEXT) -> bytes:
+    return notification(
+        "textDocument/didOpen",
+        {
+            "textDocument": {
+                "uri": URI,
+                "languageId": "markdown",
+                "version": 1,
+                "text": text,
+            }
+        },
+    )
+
+
+def change(version: int, start: tuple, end: tuple, text: str) -> bytes:
+    return notification(
+        "textDocument/didChange",
+        {
+            "textDocument": {"uri": URI, "version": version},
+            "contentChanges": [
+                {
+                    "range": {
+                        "start": {"line": start[0], "character": start[1]},
+                        "end": {"line": end[0], "character": end[1]},
+                    },
+                    "text": text,
+                }
+            ],
+        },
+    )
+
+
+# lifecycle
+def test_run_initializes_and_exits_after_shutdown():
+    code, sent = run(
+        request(1, "initialize", {"capabilities": {}}),
+        notification("initialized", {}),
+        request(2, "shutdown"),
+        notification("exit", {}),
+    )
+
+    assert code == 0
+    assert sent[0]["id"] == 1
+    assert sent[0]["result"]["capabilities"]["textDocumentSync"]["change"] == 2
+    assert sent[1] == {"jsonrpc": "2.0", "id": 2, "result": None}
+
+
+def test_run_fails_without_shutdown():
+    assert run(request(1, "initialize", {}), notification("exit", {}))[0] == 1
+    assert run(request(1, "initialize", {}))[0] == 1
+
+
+def test_run_answers_errors():
+    _, sent = run(
+        request(1, "shutdown"),
+        request(2, "initialize", {}),
+        request(3, "textDocument/hover", {}),
+        b"Content-Length: 3\r\n\r\n{x}",
+    )
+
+    assert sent[0]["error"]["code"] == SERVER_NOT_INITIALIZED
+    assert sent[2]["error"]["code"] == METHOD_NOT_FOUND
+    assert sent[3]["error"]["code"] == PARSE_ERROR
+
+
+# diagnostics
+def test_changes_publish_diagnostics():
+    _, sent = run(
+        request(1, "initialize", {}),
+        open_document(),
+        change(2, (3, 0), (3, 8), ""),
+        change(3, (2, 3), (2, 12), "Some {cloze"),
+        notification("textDocument/didClose", {"textDocument": {"uri": URI}}),
+    )
+
+    published = [message["params"] for message in sent[1:]]
+    assert published[0] == {"uri": URI, "diagnostics": [], "version": 1}
+    assert published[1]["version"] == 2
+    assert [d["message"] for d in published[1]["diagnostics"]] == [
+        "card has neither an answer nor cloze deletions and is skipped"
+    ]
+    assert published[2]["diagnostics"] == [
+        {
+            "range": {
+                "start": {"line": 2, "character": 8},
+                "end": {"line": 2, "character": 9},
+            },
+            "severity": 1,
+            "source": "inka2",
+            "message": "cloze deletion isn't closed, card is skipped",
+        }
+    ]
+    assert published[3] == {"uri": URI, "diagnostics": []}
+
+
+def test_change_without_range_replaces_text():
+    _, sent = run(
+        request(1, "initialize", {}),
+        open_document(),
+        notification(
+            "textDocument/didChange",
+            {
+                "textDocument": {"uri": URI, "version": 2},
+                "contentChanges": [{"text": "---\n1. Q\n---\n"}],
+            },
+        ),
+    )
+
+    assert len(sent[2]["params"]["diagnostics"]) == 1
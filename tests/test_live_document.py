@@ -0,0 +1,177 @@
+import random
+
+import pytest
+
+from inka2.models.live_document import ERROR, WARNING, LiveDocument
+
+TEXT = """Some text
+
+---
+Deck: Abraham
+Tags: one two
+
+<!--ID:1-->
+1. Question?
+> Answer
+
+2. Some {cloze} here
+---
+
+---
+Deck: Other
+
+<!--ID:2-->
+1. Another question?
+> Another answer
+---
+"""
+
+LINES = [
+    "---",
+    "",
+    "Deck: A",
+    "Deck:",
+    "Tags: one",
+    "1. Question?",
+    "2. Some {cloze} here",
+    "3. {broken",
+    "4. `{code}`",
+    "5.",
+    "> Answer",
+    ">",
+    "text }",
+    "<!--ID:1-->",
+    "<!--ID:2-->",
+    "<!--ID:x-->",
+]
+
+
+def messages(document: LiveDocument) -> list:
+    return [
+        (document.text[d.start : d.end], d.message, d.severity)
+        for d in document.get_diagnostics()
+    ]
+
+
+# edit
+def test_edit_tokenizes_only_changed_section():
+    document = LiveDocument(TEXT, "Default")
+    start = TEXT.index("Another answer")
+
+    document.edit(start, start + len("Another"), "Some")
+
+    assert document.tokenized_sections == 1
+    assert document.text == TEXT.replace("Another answer", "Some answer")
+
+
+def test_edit_before_sections_keeps_them():
+    document = LiveDocument(TEXT, "Default")
+
+    document.edit(0, 0, "More\ntext\n")
+
+    assert document.tokenized_sections == 0
+    assert messages(document) == messages(LiveDocument(document.text, "Default"))
+
+
+def test_edit_with_delimiters_splits_section():
+    document = LiveDocument(TEXT, "Default")
+    cloze = TEXT.index("2. Some")
+
+    document.edit(cloze, cloze, "---\n---\n")
+
+    assert document.tokenized_sections == 2
+    assert messages(document) == messages(LiveDocument(document.text, "Default"))
+
+
+def test_edit_translates_newlines():
+    document = LiveDocument("---\r\n1. Q\r\n---\r\n", "Default")
+
+    assert document.text == "---\n1. Q\n---\n"
+    assert messages(document) == [
+        ("1. Q", "card has neither an answer nor cloze deletions and is skipped", 2)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_edits_give_the_same_result_as_new_document(seed):
+    rng = random.Random(seed)
+    text = "\n".join(rng.choice(LINES) for _ in range(30))
+    document = LiveDocument(text, "Default")
+
+    for _ in range(20):
+        start = rng.randint(0, len(document.text))
+        # Mostly nearby edits, as when typing, and sometimes large ones
+        size = len(text) if rng.random() < 0.2 else 20
+        end = rng.randint(start, min(start + size, len(document.text)))
+        inserted = "\n".join(rng.choice(LINES) for _ in range(rng.randint(0, 3)))
+        document.edit(start, end, inserted)
+        text = text[:start] + inserted + text[end:]
+
+        expected = LiveDocument(text, "Default")
+        assert document.text == text
+        assert document.get_diagnostics() == expected.get_diagnostics()
+        assert [s.token for s in document._sections] == [
+            s.token for s in expected._sections
+        ]
+        for offset in range(0, len(text) + 1, 7):
+            assert document.get_position(offset) == expected.get_position(offset)
+
+
+# positions
+def test_get_position_counts_utf16_units():
+    document = LiveDocument("a\n😀b\nc", "Default")
+
+    assert document.get_position(0) == (0, 0)
+    assert document.get_position(3) == (1, 2)
+    assert document.get_position(4) == (1, 3)
+    assert document.get_position(5) == (2, 0)
+    assert document.get_offset(1, 2) == 3
+    assert document.get_offset(1, 100) == 4
+    assert document.get_offset(5, 0) == len(document.text)
+
+
+# diagnostics
+def test_get_diagnostics_of_skipped_notes():
+    text = "---\n1. Only question\n\n2.\n> Answer\n\n3. Question\n>\n---\n"
+
+    assert messages(LiveDocument(text, "Default")) == [
+        (
+            "1. Only question",
+            "card has neither an answer nor cloze deletions and is skipped",
+            WARNING,
+        ),
+        ("2.", "empty question, card is skipped", WARNING),
+        (">\n", "empty answer, card is skipped", WARNING),
+    ]
+
+
+def test_get_diagnostics_of_clozes():
+    text = "---\n1. {a} {b\n2. {} c}\n3. `{code}` $x^{2}$\n4. {`}`}\n---\n"
+
+    assert messages(LiveDocument(text, "Default")) == [
+        ("{", "cloze deletion isn't closed", ERROR),
+        ("{}", "empty cloze deletion", ERROR),
+        ("}", 'unmatched "}"', ERROR),
+        ("`{code}` $x^{2}$", "all cloze deletions are in code or math", ERROR),
+    ]
+
+
+def test_get_diagnostics_of_ids():
+    text = "---\n<!--ID:1-->\n1. Q\n> A\n<!--ID:x-->\n2. Q\n> A\n---\n---\n<!--ID:1-->\n1. Q\n> A\n---\n"
+
+    assert messages(LiveDocument(text, "Default")) == [
+        ("<!--ID:1-->", "duplicate ID 1, also used on line 10", ERROR),
+        ("<!--ID:x-->", "incorrect ID", WARNING),
+        ("<!--ID:1-->", "duplicate ID 1, also used on line 2", ERROR),
+    ]
+
+
+def test_get_diagnostics_of_fields():
+    text = "---\nDeck: A\nDeck: B\nTags: a\nTags: b\n---\n---\nDeck: \n---\n---\nText\n---\n"
+
+    assert messages(LiveDocument(text, "")) == [
+        ("Deck: A", "more than one deck name field in section", ERROR),
+        ("Deck: A", "more than one tag field in section", ERROR),
+        ("Deck: ", "empty deck name field in section", ERROR),
+        ("Text", "couldn't find deck name in section", ERROR),
+    ]
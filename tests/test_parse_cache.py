@@ -0,0 +1,95 @@
+import pytest
+
+from inka2.models.document import Document
+from inka2.models.parse_cache import ParseCache, dump_notes, load_notes
+from inka2.models.parser import Parser
+from inka2.models.state_store import StateStore
+
+TEXT = (
+    "---\n"
+    "Deck: Abraham\n"
+    "Tags: one two\n"
+    "<!--ID:1234567890-->\n"
+    "1. First question\n"
+    "> First answer\n"
+    "2. Some {cloze}\n"
+    "---\n"
+)
+
+
+@pytest.fixture
+def store(tmp_path) -> StateStore:
+    store = StateStore(str(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def document(tmp_path) -> Document:
+    path = tmp_path / "file.md"
+    path.write_text(TEXT, encoding="utf-8")
+    return Document.load(path, "blake2b")
+
+
+def test_get_notes_when_not_cached(store, config, document):
+    cache = ParseCache(store, config, 1024)
+
+    assert cache.get_notes(cache.get_key(document.path, "Default", document)) is None
+
+
+def test_cached_notes_are_the_same_as_parsed(store, config, document):
+    cache = ParseCache(store, config, 1024)
+    notes = Parser(config, document.path, "Default").collect_notes(document=document)
+    key = cache.get_key(document.path, "Default", document)
+
+    cache.update_notes(key, notes)
+    cached = cache.get_notes(key)
+
+    assert len(cached) == 2
+    assert cached == notes
+    assert [type(note) for note in cached] == [type(note) for note in notes]
+    assert [note.anki_id for note in cached] == [1234567890, None]
+    assert [note.span for note in cached] == [note.span for note in notes]
+    assert cached[0].tags == ("one", "two")
+    assert cached[0].tags is cached[1].tags
+    assert cached[0].deck_name == "Abraham"
+
+
+def test_serialized_notes_can_be_cached(store, config, document):
+    cache = ParseCache(store, config, 1024)
+    notes = Parser(config, document.path, "Default").collect_notes(document=document)
+    key = cache.get_key(document.path, "Default", document)
+
+    cache.update_notes(key, dump_notes(notes))
+
+    assert cache.get_notes(key) == notes
+
+
+def test_load_notes_when_data_is_damaged():
+    assert load_notes(b"not compressed") is None
+
+
+def test_key_depends_on_contents_and_deck(store, config, document, tmp_path):
+    cache = ParseCache(store, config, 1024)
+    other_path = tmp_path / "other.md"
+    other_path.write_text(TEXT + "\n", encoding="utf-8")
+    other = Document.load(other_path, "blake2b")
+    same_path = tmp_path / "same.md"
+    same_path.write_text(TEXT, encoding="utf-8")
+    same = Document.load(same_path, "blake2b")
+
+    key = cache.get_key(document.path, "Default", document)
+
+    assert cache.get_key(other.path, "Default", other) != key
+    assert cache.get_key(document.path, "Other deck", document) != key
+    assert cache.get_key(same.path, "Default", same) == key
+
+
+def test_key_depends_on_path_when_filename_is_added(
+    store, config_add_filename, document, tmp_path
+):
+    cache = ParseCache(store, config_add_filename, 1024)
+
+    assert cache.get_key(document.path, "Default", document) != cache.get_key(
+        tmp_path / "same.md", "Default", document
+    )
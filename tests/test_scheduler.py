@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+from inka2.models.hasher import FileHash
+from inka2.models.scheduler import Scheduler
+from inka2.models.state_store import StateStore
+
+
+@pytest.fixture
+def store(tmp_path_factory) -> StateStore:
+    store = StateStore(str(tmp_path_factory.mktemp("state") / "state.db"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def files(tmp_path) -> dict:
+    """Files with sizes 10, 30, 20 modified in order c, a, b"""
+    paths = {}
+    for name, size, mtime in (("a.md", 10, 2), ("b.md", 30, 3), ("c.md", 20, 1)):
+        path = str(tmp_path / name)
+        with open(path, mode="wt", encoding="utf-8") as f:
+            f.write("x" * size)
+        os.utime(path, ns=(mtime * 10**9, mtime * 10**9))
+        paths[name] = path
+    return paths
+
+
+def names(scheduled) -> list:
+    return [os.path.basename(path) for path, _ in scheduled]
+
+
+def test_unknown_order_raises_error():
+    with pytest.raises(ValueError):
+        Scheduler("random")
+
+
+def test_schedule_by_path(files):
+    scheduled = Scheduler("path").schedule(
+        dict.fromkeys([files["c.md"], files["a.md"], files["b.md"]])
+    )
+
+    assert names(scheduled) == ["a.md", "b.md", "c.md"]
+
+
+def test_schedule_by_mtime(files):
+    scheduled = Scheduler("mtime").schedule(dict.fromkeys(files.values()))
+
+    assert names(scheduled) == ["b.md", "a.md", "c.md"]
+
+
+def test_schedule_by_size_without_durations(files):
+    scheduled = Scheduler("size").schedule(dict.fromkeys(files.values()))
+
+    assert names(scheduled) == ["b.md", "c.md", "a.md"]
+
+
+def test_schedule_uses_signatures_from_hashes(files):
+    file_hashes = {
+        files["a.md"]: FileHash("1", (5, 100, 0)),
+        files["b.md"]: None,
+        files["c.md"]: None,
+    }
+
+    scheduled = Scheduler("size").schedule(file_hashes)
+
+    assert names(scheduled) == ["a.md", "b.md", "c.md"]
+    assert scheduled[0] == (files["a.md"], file_hashes[files["a.md"]])
+
+
+def test_schedule_by_size_uses_recorded_durations(files, store):
+    for path in files.values():
+        store.update_file(path, "1", "blake2b")
+    scheduler = Scheduler("size", store)
+    # a.md is small but slow, c.md is estimated by its size from the known rate
+    scheduler.record(files["a.md"], 5.0)
+    scheduler.record(files["b.md"], 1.0)
+
+    scheduled = scheduler.schedule(dict.fromkeys(files.values()))
+
+    assert names(scheduled) == ["a.md", "c.md", "b.md"]
+
+
+def test_schedule_keeps_missing_files(files, tmp_path):
+    missing = str(tmp_path / "missing.md")
+
+    scheduled = Scheduler("size").schedule(dict.fromkeys([missing, files["a.md"]]))
+
+    assert names(scheduled) == ["a.md", "missing.md"]
+
+
+def test_schedule_puts_first_files_before_others(files):
+    scheduled = Scheduler("size").schedule(
+        dict.fromkeys(files.values()), first={files["a.md"], files["c.md"]}
+    )
+
+    assert names(scheduled) == ["c.md", "a.md", "b.md"]
+
+
+def test_estimate(files, store):
+    for path in files.values():
+        store.update_file(path, "1", "blake2b")
+    scheduler = Scheduler("size", store)
+
+    assert scheduler.estimate(dict.fromkeys(files.values())) is None
+
+    scheduler.record(files["a.md"], 1.0)
+
+    assert scheduler.estimate(dict.fromkeys(files.values())) == pytest.approx(6.0)
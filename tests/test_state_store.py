@@ -0,0 +1,291 @@
+import json
+import sqlite3
+
+import pytest
+
+from inka2.exceptions import StateStoreError, StateStoreLockedError
+from inka2.models.state_store import (
+    SCHEMA_VERSION,
+    DirectoryState,
+    FileState,
+    StateStore,
+)
+
+
+@pytest.fixture
+def store_path(tmp_path) -> str:
+    return str(tmp_path / "state.db")
+
+
+@pytest.fixture
+def store(store_path) -> StateStore:
+    store = StateStore(store_path)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def hashes_json(tmp_path) -> str:
+    path = str(tmp_path / "hashes.json")
+    with open(path, mode="wt", encoding="utf-8") as f:
+        json.dump(
+            {
+                "/notes/a.md": "724ae4e3bf11c04581daf1bb4de43161",
+                "/notes/b.md": ["123ae4a4bf1ac04581daf1bb4de43161", 10, 20, 30],
+            },
+            f,
+        )
+    return path
+
+
+def test_new_database_has_current_schema_version(store):
+    assert store.schema_version == SCHEMA_VERSION
+
+
+def test_new_database_uses_wal_mode(store, store_path):
+    connection = sqlite3.connect(store_path)
+
+    assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_database_from_newer_version_raises_error(store_path):
+    connection = sqlite3.connect(store_path)
+    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+    connection.close()
+
+    with pytest.raises(StateStoreError):
+        StateStore(store_path)
+
+
+def test_get_file_when_file_unknown(store):
+    assert store.get_file("a.md") is None
+
+
+def test_update_file_inserts_and_updates(store):
+    store.update_file("a.md", "1", "md5")
+    store.update_file("a.md", "2", "blake2b", (10, 20, 30))
+
+    assert store.get_file("a.md") == FileState("2", 10, 20, 30, "blake2b")
+    assert store.get_file("a.md").signature == (10, 20, 30)
+
+
+def test_uncommitted_changes_are_not_visible_after_crash(store, store_path):
+    store.update_file("a.md", "1", "md5")
+
+    assert StateStore(store_path).get_file("a.md") is None
+
+
+def test_meta(store):
+    store.set_meta("key", "1")
+    store.set_meta("key", "2")
+
+    assert store.get_meta("key") == "2"
+    assert store.get_meta("unknown") is None
+
+
+# root
+def test_paths_inside_root_are_stored_relative_to_it(tmp_path, store_path):
+    root = tmp_path / "vault"
+    store = StateStore(store_path, str(root))
+    store.update_file(str(root / "sub" / "a.md"), "1", "md5")
+    store.update_file("/outside/b.md", "2", "md5")
+    store.commit()
+
+    paths = {row[0] for row in store._connection.execute("SELECT path FROM files")}
+    assert paths == {"sub/a.md", "/outside/b.md"}
+    assert store.get_file(str(root / "sub" / "a.md")).digest == "1"
+    store.close()
+
+
+def test_relative_paths_survive_moving_the_root(tmp_path, store_path):
+    store = StateStore(store_path, str(tmp_path / "old"))
+    store.update_file(str(tmp_path / "old" / "a.md"), "1", "md5")
+    store.update_section_digests(str(tmp_path / "old" / "a.md"), ["s"])
+    store.close()
+
+    store = StateStore(store_path, str(tmp_path / "new"))
+
+    assert store.get_file(str(tmp_path / "new" / "a.md")).digest == "1"
+    assert store.get_section_digests(str(tmp_path / "new" / "a.md")) == {"s"}
+    store.close()
+
+
+# lock
+def test_locked_store_can_not_be_opened_by_another_process(store_path):
+    store = StateStore(store_path, lock=True)
+
+    with pytest.raises(StateStoreLockedError):
+        StateStore(store_path, lock=True)
+
+    store.close()
+    StateStore(store_path, lock=True).close()
+
+
+def test_unlocked_store_ignores_lock(store_path):
+    store = StateStore(store_path, lock=True)
+
+    StateStore(store_path).close()
+
+    store.close()
+
+
+# import_hashes_json
+def test_import_hashes_json(store, hashes_json):
+    imported = store.import_hashes_json(hashes_json)
+
+    assert imported == 2
+    assert store.get_file("/notes/a.md") == FileState(
+        "724ae4e3bf11c04581daf1bb4de43161", None, None, None, "md5"
+    )
+    assert store.get_file("/notes/b.md").signature == (10, 20, 30)
+
+
+def test_import_hashes_json_imports_only_files_inside_root(store_path, tmp_path):
+    json_path = tmp_path / "hashes.json"
+    json_path.write_text(json.dumps({"/notes/a.md": "1", "/other/b.md": "2"}))
+    store = StateStore(store_path, "/notes")
+
+    imported = store.import_hashes_json(json_path)
+
+    assert imported == 1
+    assert store.get_file("/notes/a.md").digest == "1"
+    assert store.get_file("/other/b.md") is None
+    store.close()
+
+
+def test_import_hashes_json_happens_only_once(store, hashes_json):
+    store.import_hashes_json(hashes_json)
+    store.update_file("/notes/a.md", "new", "blake2b")
+
+    imported = store.import_hashes_json(hashes_json)
+
+    assert imported == 0
+    assert store.get_file("/notes/a.md").digest == "new"
+
+
+def test_import_hashes_json_when_file_does_not_exist(store, tmp_path):
+    assert store.import_hashes_json(tmp_path / "missing.json") == 0
+
+
+def test_database_of_first_version_is_migrated(store_path):
+    connection = sqlite3.connect(store_path)
+    connection.execute(
+        "CREATE TABLE files (path TEXT PRIMARY KEY, digest TEXT NOT NULL, "
+        "mtime_ns INTEGER, size INTEGER, ino INTEGER)"
+    )
+    connection.execute("INSERT INTO files (path, digest) VALUES ('a.md', '1')")
+    connection.execute("PRAGMA user_version = 1")
+    connection.commit()
+    connection.close()
+
+    store = StateStore(store_path)
+
+    assert store.schema_version == SCHEMA_VERSION
+    assert store.get_file("a.md").algorithm == "md5"
+
+
+# note fingerprints
+def test_update_note_fingerprint(store):
+    store.update_note_fingerprint(1111, "a.md", "first")
+    store.update_note_fingerprint(2222, "a.md", "second")
+    store.update_note_fingerprint(1111, "b.md", "changed")
+
+    assert store.get_note_fingerprints([1111, 2222, 3333]) == {
+        1111: "changed",
+        2222: "second",
+    }
+
+
+# directories
+def test_update_directory(store):
+    state = DirectoryState(10, [("a.md", False)], [("sub", True)], True)
+
+    store.update_directory("/notes", state)
+
+    assert store.get_directory("/notes") == state
+    assert store.get_directory("/other") is None
+
+
+def test_delete_directories_removes_subtrees(store):
+    state = DirectoryState(10, [], [], False)
+    for path in ("/notes/sub", "/notes/sub/deeper", "/notes/sub2", "/notes"):
+        store.update_directory(path, state)
+
+    store.delete_directories(["/notes/sub"])
+
+    assert store.get_directory("/notes/sub") is None
+    assert store.get_directory("/notes/sub/deeper") is None
+    assert store.get_directory("/notes/sub2") == state
+    assert store.get_directory("/notes") == state
+
+
+# durations
+def test_update_file_duration(store):
+    store.update_file("a.md", "1", "blake2b")
+    store.update_file("b.md", "2", "blake2b")
+
+    store.update_file_duration("a.md", 1.5)
+    store.update_file_duration("unknown.md", 2.0)
+
+    assert store.get_file_durations(["a.md", "b.md", "unknown.md"]) == {"a.md": 1.5}
+
+
+def test_update_file_keeps_duration(store):
+    store.update_file("a.md", "1", "blake2b")
+    store.update_file_duration("a.md", 1.5)
+
+    store.update_file("a.md", "2", "blake2b")
+
+    assert store.get_file_durations(["a.md"]) == {"a.md": 1.5}
+
+
+# pending files
+def test_set_pending_files_replaces_queue(store):
+    store.set_pending_files(["b.md", "a.md", "b.md"])
+    assert store.get_pending_files() == ["b.md", "a.md"]
+
+    store.set_pending_files(["c.md"])
+    assert store.get_pending_files() == ["c.md"]
+
+
+def test_pending_files_inside_root_are_returned_as_full_paths(tmp_path, store_path):
+    root = tmp_path / "notes"
+    root.mkdir()
+    store = StateStore(store_path, root=str(root))
+    store.set_pending_files([str(root / "sub" / "a.md"), "/other/b.md"])
+    store.close()
+
+    store = StateStore(store_path, root=str(root))
+    assert store.get_pending_files() == [str(root / "sub" / "a.md"), "/other/b.md"]
+    store.close()
+
+
+# parsed notes
+def test_update_parsed_notes(store):
+    assert store.get_parsed_notes("a") is None
+
+    store.update_parsed_notes("a", b"first", 100)
+    store.update_parsed_notes("a", b"second", 100)
+
+    assert store.get_parsed_notes("a") == b"second"
+
+
+def test_update_parsed_notes_evicts_least_recently_used(store):
+    store.update_parsed_notes("a", b"1" * 40, 100)
+    store.update_parsed_notes("b", b"2" * 40, 100)
+    store.get_parsed_notes("a")
+
+    store.update_parsed_notes("c", b"3" * 40, 100)
+
+    assert store.get_parsed_notes("a") == b"1" * 40
+    assert store.get_parsed_notes("b") is None
+    assert store.get_parsed_notes("c") == b"3" * 40
+
+
+def test_update_parsed_notes_skips_data_larger_than_max_size(store):
+    store.update_parsed_notes("a", b"1" * 40, 100)
+
+    store.update_parsed_notes("b", b"2" * 101, 100)
+
+    assert store.get_parsed_notes("a") == b"1" * 40
+    assert store.get_parsed_notes("b") is None
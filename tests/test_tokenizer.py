@@ -0,0 +1,211 @@
+import random
+import re
+
+import pytest
+
+from inka2.models.document import decode_text
+from inka2.models.tokenizer import (
+    NoteSpan,
+    count_text,
+    find_byte_sections,
+    find_id,
+    find_sections,
+    get_body_start,
+    tokenize_notes,
+    tokenize_section,
+    tokenize_sections,
+)
+
+# Regular expressions the tokenizer replaced. Tokens must give the same results.
+SECTION_REGEX = re.compile(r"^---\n(.+?)^---$", re.MULTILINE | re.DOTALL)
+ALL_NOTES_REGEX = re.compile(
+    r"(?:^<!--ID:\S+-->\n)?^\d+\.[\s\S]*?(?=<!--ID:\S+-->|^\d+\.|\Z|^---$)",
+    re.MULTILINE,
+)
+ID_REGEX = re.compile(r"^<!--ID:(\S+)-->$", re.MULTILINE)
+QUESTION_REGEX = re.compile(r"^\d+\.([\s\S]+?)(?=^>|\Z)", re.MULTILINE)
+ANSWER_REGEX = re.compile(r"(?:^>.*?(?:\n|$))+", re.MULTILINE)
+CLOZE_REGEX = re.compile(
+    r"(?:^<!--ID:\S+-->\n)?^\d+\.[\s\S]*?{[\s\S]*?}[\s\S]*?(?=<!--ID:\S+-->|^\d+\.|\Z|^---$)",
+    re.MULTILINE,
+)
+DECK_REGEX = re.compile(r"(?<=^Deck:)(.*?)$", re.MULTILINE)
+TAGS_REGEX = re.compile(r"(?<=^Tags:)(.*?)$", re.MULTILINE)
+
+LINES = [
+    "---",
+    "---x",
+    "",
+    " ",
+    "1. Question?",
+    "12. Some {question} here",
+    "3.",
+    "4.{",
+    "٣. Arabic-Indic digit",
+    " 1. indented",
+    "1a. not a note",
+    "> Answer",
+    ">",
+    "> {answer}",
+    "text",
+    "{",
+    "}",
+    "x } y {",
+    "<!--ID:123-->",
+    "<!--ID:12a-->",
+    "<!--ID:-->",
+    "<!--ID:1-->-->",
+    "<!--ID:1 -->",
+    "text <!--ID:5--> more",
+    "1. Q <!--ID:6-->",
+    "1.<!--ID:7-->",
+    "> A <!--ID:8--> tail",
+    "<!--ID:<!--ID:9-->",
+    "Deck: Abraham",
+    "Deck:",
+    "Tags: one two",
+    "Some text; Deck: yolo",
+]
+
+
+def random_text(rng: random.Random) -> str:
+    text = "\n".join(rng.choice(LINES) for _ in range(rng.randint(0, 30)))
+    return text + "\n" if rng.random() < 0.5 else text
+
+
+@pytest.fixture(params=range(300))
+def text(request) -> str:
+    return random_text(random.Random(request.param))
+
+
+def test_get_body_start():
+    assert get_body_start("12. Q") == 3
+    assert get_body_start("1.") == 2
+    assert get_body_start(" 1. Q") == -1
+    assert get_body_start("1 Q") == -1
+    assert get_body_start("") == -1
+    assert get_body_start("text\n2. Q", 5) == 7
+
+
+def test_find_id():
+    assert find_id("<!--ID:1-->") == 0
+    assert find_id("text <!--ID:abc--> more") == 5
+    assert find_id("<!--ID: 1-->") == -1
+    assert find_id("<!--ID:-->") == -1
+    assert find_id("<!--ID:<!--ID:1-->") == 0
+    assert find_id("<!--ID:1 <!--ID:2-->") == 9
+    assert find_id("<!--ID:1--> <!--ID:2-->", 1) == 12
+    assert find_id("<!--ID:1-->", 0, 10) == -1
+
+
+def test_find_sections():
+    text = "---\n---\nA\n---\n---\nB\n---\n---\n"
+
+    assert [text[start:end] for start, end in find_sections(text)] == [
+        "---\nA\n",
+        "B\n",
+    ]
+
+
+def test_find_sections_from_position():
+    text = "---\nA\n---\n---\nB\n---\n"
+
+    assert list(find_sections(text, text.index("\n---\nB"))) == [(14, 16)]
+
+
+def test_count_text_counts_in_chunks(monkeypatch):
+    monkeypatch.setattr("inka2.models.tokenizer._COUNT_CHUNK_SIZE", 3)
+    data = "ab\r\nü\r\r\n✓\n".encode("utf-8")
+
+    assert count_text(data, 0, len(data)) == (8, 4)
+    assert count_text(data, 4, len(data)) == (5, 3)
+
+
+def test_tokenize_sections_without_notes():
+    sections = list(tokenize_sections("---\nDeck: A\n1. Q\n> A\n---", False))
+
+    assert [section.text for section in sections] == ["Deck: A\n1. Q\n> A\n"]
+    assert sections[0][1:4] == (4, 21, 2)
+    assert sections[0].deck_names == []
+    assert sections[0].notes == []
+
+
+def test_shift_moves_indexes_after_offset():
+    span = NoteSpan(3, 10, 40, -1, -1, 13, 20, 20, 40)
+
+    assert span.shift(20, 5, 1) == NoteSpan(3, 10, 45, -1, -1, 13, 25, 25, 45)
+    assert span.shift(10, -2, -1) == NoteSpan(2, 8, 38, -1, -1, 11, 18, 18, 38)
+    assert span.shift(41, 5, 1) == span
+
+
+# Comparison with regular expressions
+def test_sections_are_the_same_as_from_regex(text):
+    sections = list(tokenize_sections(text))
+
+    assert [section.text for section in sections] == SECTION_REGEX.findall(text)
+    for section in sections:
+        assert section.deck_names == DECK_REGEX.findall(section.text)
+        assert section.tags == TAGS_REGEX.findall(section.text)
+        assert section.text == text[section.start : section.end]
+        assert section.line == text.count("\n", 0, section.start) + 1
+        assert section.notes == (
+            tokenize_section(text, section.start, section.end, section.line).notes
+        )
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+def test_byte_sections_are_the_same_as_sections(text, newline):
+    data = text.replace("\n", newline).encode("utf-8")
+
+    sections = list(find_byte_sections(data))
+
+    assert [decode_text(data[start:end]) for start, end in sections] == [
+        text[start:end] for start, end in find_sections(text)
+    ]
+    for start, _ in sections:
+        characters, newlines = count_text(data, 0, start)
+        assert characters == len(decode_text(data[:start]))
+        assert newlines == decode_text(data[:start]).count("\n")
+
+
+def test_notes_are_the_same_as_from_regex(text):
+    notes = tokenize_notes(text)
+
+    assert [note.text for note in notes] == ALL_NOTES_REGEX.findall(text)
+    for note in notes:
+        id_match = ID_REGEX.search(note.text)
+        question_match = QUESTION_REGEX.search(note.text)
+        answer_match = ANSWER_REGEX.search(note.text)
+        assert note.raw_id == (id_match.group(1) if id_match else None)
+        assert note.question == (question_match.group(1) if question_match else None)
+        assert note.answer == (answer_match.group() if answer_match else None)
+        assert note.has_braces == bool(CLOZE_REGEX.search(note.text))
+
+
+def test_spans_point_to_parts_of_notes(text):
+    for section in tokenize_sections(text):
+        for note in section.notes:
+            span = note.span
+            assert text[span.start : span.end] == note.text
+            assert span.line == text.count("\n", 0, span.start) + 1
+            if note.raw_id is None:
+                assert span.id_start == span.id_end == -1
+            else:
+                assert text[span.id_start : span.id_end] == f"<!--ID:{note.raw_id}-->"
+            if note.question is None:
+                assert span.question_start == span.question_end == -1
+            else:
+                assert text[span.question_start : span.question_end] == note.question
+            if note.answer is None:
+                assert span.answer_start == span.answer_end == -1
+            else:
+                assert text[span.answer_start : span.answer_end] == note.answer
+
+
+def test_section_is_the_same_as_from_sections(text):
+    section = tokenize_section(text)
+
+    assert section.text == text
+    assert section.deck_names == DECK_REGEX.findall(text)
+    assert section.tags == TAGS_REGEX.findall(text)
+    assert section.notes == tokenize_notes(text)
@@ -1,3 +1,4 @@
+import os
 import random
 from pathlib import Path
 from typing import List, Union
@@ -5,6 +6,7 @@ from typing import List, Union
 import pytest
 
 from inka2.models.config import Config
+from inka2.models.document import Document
 from inka2.models.notes.basic_note import BasicNote
 from inka2.models.notes.cloze_note import ClozeNote
 from inka2.models.notes.note import Note
@@ -888,3 +890,57 @@ def test_find_all_occurrences_returns_correct_indices_case_sensitive(writer):
     result = writer.find_all_occurrences(note_question)
 
     assert result == expected
+
+
+def test_writer_with_document_writes_through_it(file, notes):
+    document = Document.load(file, "md5")
+    writer = Writer(file, notes, document)
+
+    writer.update_note_ids()
+
+    with open(file, mode="rt", encoding="utf-8") as f:
+        assert f.read() == document.text
+    assert document.signature is None
+
+
+def test_writer_does_not_write_unchanged_file(file, notes):
+    for note in notes:
+        note.anki_id = None
+    mtime_ns = os.stat(file).st_mtime_ns
+    writer = Writer(file, notes)
+
+    writer.update_note_ids()
+
+    assert os.stat(file).st_mtime_ns == mtime_ns
+
+
+# spans
+def test_spans_of_notes_follow_edits(config, file, notes):
+    notes[3].anki_id = None
+    writer = Writer(file, notes)
+
+    writer.update_cloze_notes()
+    writer.update_note_ids()
+    notes[0].to_delete = True
+    writer.delete_notes()
+
+    parsed_notes = Parser(config, file, "").collect_notes()
+    assert [note.span for note in notes[1:]] == [note.span for note in parsed_notes]
+
+
+def test_update_ids_uses_spans_of_notes_with_same_question(config, tmp_path):
+    path = tmp_path / "file.md"
+    path.write_text(
+        "---\nDeck: A\n1. Same question\n> First\n2. Same question\n> Second\n---",
+        encoding="utf-8",
+    )
+    notes = Parser(config, path, "").collect_notes()
+    notes[0].anki_id, notes[1].anki_id = 1, 2
+
+    Writer(path, notes).update_note_ids()
+
+    assert path.read_text(encoding="utf-8") == (
+        "---\nDeck: A\n"
+        "<!--ID:1-->\n1. Same question\n> First\n"
+        "<!--ID:2-->\n2. Same question\n> Second\n---"
+    )